@@ -0,0 +1,106 @@
+import asyncio
+
+
+class AckWindow:
+    """
+    Tracks outputs sent over a websocket until the client acknowledges them.
+
+    Up to `size` outputs can be awaiting acknowledgement at once, so streaming doesn't wait
+    for one round trip per token. An output that isn't acknowledged within `timeout` seconds
+    is re-sent (with the same id, so clients should ignore ids they've already seen),
+    up to `retries` times. After that it's handed to `on_failure`.
+    """
+
+    def __init__(self, transmit, size=32, timeout=1.0, retries=20, on_failure=None):
+        self.transmit = transmit  # async function that sends one output
+        self.size = size
+        self.timeout = timeout
+        self.retries = retries
+        self.on_failure = on_failure
+
+        self._slots = asyncio.Semaphore(size)
+        self._pending = {}  # id -> (output, future, task), oldest first
+
+        # Metrics
+        self.acknowledged = 0
+        self.retransmitted = 0
+        self.failed = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def send(self, id, output):
+        """
+        Sends an output, waiting first if the window is full.
+        Returns once it's sent; the acknowledgement is awaited in the background.
+        """
+        await self._slots.acquire()
+        future = asyncio.get_running_loop().create_future()
+        # Registered before sending, in case the acknowledgement beats us back
+        self._pending[id] = (output, future, None)
+        try:
+            await self.transmit(output)
+        except:
+            self._pending.pop(id, None)
+            self._slots.release()
+            raise
+        task = asyncio.ensure_future(self._await_ack(id, output, future))
+        self._pending[id] = (output, future, task)
+
+    def ack(self, id):
+        """
+        Marks an output as acknowledged. Returns False if it wasn't awaiting acknowledgement.
+        """
+        pending = self._pending.get(id)
+        if pending is None or pending[1].done():
+            return False
+        pending[1].set_result(True)
+        return True
+
+    async def join(self):
+        """
+        Waits until every sent output is acknowledged or has failed.
+        """
+        tasks = [task for _, _, task in self._pending.values() if task is not None]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        """
+        Stops waiting for acknowledgements. Returns the outputs that were never acknowledged,
+        oldest first, so they can be sent again later.
+        """
+        outputs = []
+        for output, future, task in list(self._pending.values()):
+            if not future.done():
+                outputs.append(output)
+            if task is not None:
+                task.cancel()
+        self._pending = {}
+        return outputs
+
+    async def _await_ack(self, id, output, future):
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), self.timeout)
+                    self.acknowledged += 1
+                    return
+                except asyncio.TimeoutError:
+                    pass
+
+                if attempt == self.retries:
+                    break
+                try:
+                    await self.transmit(output)
+                    self.retransmitted += 1
+                except:
+                    break
+
+            self.failed += 1
+            if self.on_failure is not None:
+                self.on_failure(output)
+        finally:
+            if self._pending.get(id, (None, future))[1] is future:
+                self._pending.pop(id, None)
+            self._slots.release()
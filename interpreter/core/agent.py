@@ -1,11 +1,18 @@
 from typing import List, Dict
 import json
+import os
 import time
+import weakref
 from .anthropic_client import anthropic_client
 from .openrouter_client import openrouter_client
+from .utils.history import BoundedDict, BoundedList, WatchedList
+
+# How many records each of an agent's histories keeps (older ones are dropped)
+MAX_HISTORY = int(os.getenv('INTERPRETER_AGENT_MAX_HISTORY', '100'))
 
 class Agent:
     def __init__(self, name: str, description: str = '', prompt: str = '', ai_model: str = 'claude-2', skills: List = None, parent=None):
+        self.indexes = weakref.WeakSet()  # AgentIndexes to tell when capabilities, role or managed agents change
         self.id = None  # Will be set when saved to the database
         self.name = name
         self.description = description
@@ -17,19 +24,50 @@ class Agent:
         self.state = {}
         self.parameters = {}
         self.environment = None
-        self.performance_history = []
+        self.performance_history = BoundedList(maxlen=MAX_HISTORY)
         self.capabilities = []
         self.current_task = None
         self.role = 'general'
         self.managed_agents = []
-        self.knowledge_base = {}
+        self.knowledge_base = BoundedDict(maxlen=MAX_HISTORY)  # key -> hash of the content in the KnowledgeStore
         self.persistent_knowledge_base = {}
-        self.task_history = []
+        self.task_history = BoundedList(maxlen=MAX_HISTORY)
         self.user_feedback = []
         self.preferences = {}
-        self.self_critiques = []
+        self.self_critiques = BoundedList(maxlen=MAX_HISTORY)
         self.agent_evaluations = {}
-        self.real_time_feedback = []
+        self.real_time_feedback = BoundedList(maxlen=MAX_HISTORY)
+
+    @property
+    def capabilities(self) -> List[str]:
+        return self._capabilities
+
+    @capabilities.setter
+    def capabilities(self, capabilities: List[str]):
+        self._capabilities = WatchedList(capabilities, on_change=self._changed)
+        self._changed()
+
+    @property
+    def role(self) -> str:
+        return self._role
+
+    @role.setter
+    def role(self, role: str):
+        self._role = role
+        self._changed()
+
+    @property
+    def managed_agents(self) -> List['Agent']:
+        return self._managed_agents
+
+    @managed_agents.setter
+    def managed_agents(self, managed_agents: List['Agent']):
+        self._managed_agents = WatchedList(managed_agents, on_change=self._changed)
+        self._changed()
+
+    def _changed(self):
+        for index in list(self.indexes):
+            index.invalidate()
 
     # ... (previous methods remain unchanged)
 
@@ -241,14 +279,14 @@ class Agent:
         agent.capabilities = data.get('capabilities', [])
         agent.current_task = data.get('current_task')
         agent.role = data.get('role', 'general')
-        agent.knowledge_base = data.get('knowledge_base', {})
+        agent.knowledge_base = BoundedDict(data.get('knowledge_base', {}), maxlen=MAX_HISTORY)
         agent.persistent_knowledge_base = data.get('persistent_knowledge_base', {})
-        agent.task_history = data.get('task_history', [])
+        agent.task_history = BoundedList(data.get('task_history', []), maxlen=MAX_HISTORY)
         agent.user_feedback = data.get('user_feedback', [])
         agent.preferences = data.get('preferences', {})
-        agent.self_critiques = data.get('self_critiques', [])
+        agent.self_critiques = BoundedList(data.get('self_critiques', []), maxlen=MAX_HISTORY)
         agent.agent_evaluations = data.get('agent_evaluations', {})
-        agent.real_time_feedback = data.get('real_time_feedback', [])
+        agent.real_time_feedback = BoundedList(data.get('real_time_feedback', []), maxlen=MAX_HISTORY)
         return agent
 
     def __repr__(self):
@@ -1,26 +1,38 @@
 import os
 import anthropic
 from dotenv import load_dotenv
+from .llm_client import LLMClient
 
 # Load environment variables from .env file
 load_dotenv()
 
-class AnthropicClient:
-    def __init__(self):
-        self.client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+class AnthropicClient(LLMClient):
+    provider = 'anthropic'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # The SDK keeps its own connection pool. Retries are left to LLMClient, so they share its backoff and limits
+        self.client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'), timeout=self.timeout, max_retries=0)
 
     def chat_completion(self, messages):
+        prompt = self._convert_messages_to_prompt(messages)
         try:
-            response = self.client.completions.create(
-                model="claude-2",
-                prompt=self._convert_messages_to_prompt(messages),
-                max_tokens_to_sample=1000
+            response = self.call(
+                ('completions', 'claude-2', prompt) if self.coalesce else None,
+                lambda: self.client.completions.create(
+                    model="claude-2",
+                    prompt=prompt,
+                    max_tokens_to_sample=1000
+                )
             )
             return response.completion
         except Exception as e:
             print(f"Error in chat completion: {str(e)}")
             return None
 
+    async def achat_completion(self, messages):
+        return await self.run_async(self.chat_completion, messages)
+
     def _convert_messages_to_prompt(self, messages):
         prompt = ""
         for message in messages:
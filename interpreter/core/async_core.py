@@ -1,4 +1,5 @@
 import asyncio
+import concurrent.futures
 import json
 import os
 import shutil
@@ -14,9 +15,10 @@ import shortuuid
 from pydantic import BaseModel
 from starlette.websockets import WebSocketState
 
+from .acknowledgements import AckWindow
 from .core import OpenInterpreter
-
-last_start_time = 0
+from .output_coalescer import OutputCoalescer
+from .session_manager import SessionManager, copy_settings
 
 try:
     import janus
@@ -42,7 +44,7 @@ complete_message = {"role": "server", "type": "status", "content": "complete"}
 
 
 class AsyncInterpreter(OpenInterpreter):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, server=True, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.respond_thread = None
@@ -55,12 +57,28 @@ class AsyncInterpreter(OpenInterpreter):
         self.require_acknowledge = (
             os.getenv("INTERPRETER_REQUIRE_ACKNOWLEDGE", "False").lower() == "true"
         )
-        self.acknowledged_outputs = []
+        # Outputs that can be awaiting acknowledgement at once
+        self.ack_window_size = int(os.getenv("INTERPRETER_ACK_WINDOW", 32))
+        # Seconds before an unacknowledged output is sent again, and how many times to try
+        self.ack_timeout = float(os.getenv("INTERPRETER_ACK_TIMEOUT", 1))
+        self.ack_retries = int(os.getenv("INTERPRETER_ACK_RETRIES", 20))
+
+        # Merge token chunks that arrive within this many seconds into one websocket frame (0 = off),
+        # up to this many characters per frame
+        self.output_batch_window = float(
+            os.getenv("INTERPRETER_OUTPUT_BATCH_WINDOW", 0)
+        )
+        self.output_batch_bytes = int(os.getenv("INTERPRETER_OUTPUT_BATCH_BYTES", 4096))
 
-        self.server = Server(self)
+        # Sessions are created with server=False, as they're served by the base interpreter's server
+        self.server = Server(self) if server else None
 
         # For the 01. This lets the OAI compatible server accumulate context before responding.
         self.context_mode = False
+        self.last_start_time = 0
+
+        # When this is one of many sessions, responses wait for one of these shared slots
+        self.worker_slots = None
 
     async def input(self, chunk):
         """
@@ -98,7 +116,7 @@ class AsyncInterpreter(OpenInterpreter):
 
             self.stop_event.clear()
             self.respond_thread = threading.Thread(
-                target=self.respond, args=(run_code,)
+                target=self.respond_in_worker_slot, args=(run_code,)
             )
             self.respond_thread.start()
 
@@ -107,6 +125,22 @@ class AsyncInterpreter(OpenInterpreter):
             self.output_queue = janus.Queue()
         return await self.output_queue.async_q.get()
 
+    def respond_in_worker_slot(self, run_code=None):
+        """
+        Waits for a free worker slot (if there's a limit), then responds.
+        """
+        if self.worker_slots is None:
+            return self.respond(run_code)
+
+        while not self.worker_slots.acquire(timeout=0.1):
+            if self.stop_event.is_set():
+                return
+        try:
+            if not self.stop_event.is_set():
+                self.respond(run_code)
+        finally:
+            self.worker_slots.release()
+
     def respond(self, run_code=None):
         for attempt in range(5):  # 5 attempts
             try:
@@ -276,6 +310,92 @@ class AsyncInterpreter(OpenInterpreter):
             self.messages[-1]["content"] += chunk
 
 
+async def run_in_thread(function, worker_slots=None):
+    """
+    Runs a blocking function on a worker thread (once a worker slot is free, if there's a limit).
+    """
+
+    def work():
+        if worker_slots is None:
+            return function()
+        with worker_slots:
+            return function()
+
+    return await asyncio.get_running_loop().run_in_executor(None, work)
+
+
+async def stream_in_thread(make_generator, worker_slots=None, max_buffered=64):
+    """
+    Runs a blocking generator on a worker thread and yields its items here,
+    so the event loop keeps serving other requests in the meantime.
+
+    At most `max_buffered` items wait to be consumed. Beyond that the worker pauses,
+    so a slow client slows the interpreter down instead of filling memory.
+    If the consumer stops early, the generator is closed on its own thread.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=max_buffered)
+    stopped = threading.Event()
+
+    def put(kind, item):
+        # Blocks the worker while the queue is full. Returns False if the consumer is gone.
+        if stopped.is_set():
+            return False
+        coroutine = queue.put((kind, item))
+        try:
+            future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        except RuntimeError:
+            # The event loop is closed, so nobody will ever consume this
+            coroutine.close()
+            stopped.set()
+            return False
+        while not stopped.is_set():
+            try:
+                future.result(timeout=0.1)
+                return True
+            except concurrent.futures.TimeoutError:
+                continue
+            except:
+                return False
+        future.cancel()
+        return False
+
+    def work():
+        if worker_slots is not None:
+            while not worker_slots.acquire(timeout=0.1):
+                if stopped.is_set():
+                    return
+        try:
+            generator = make_generator()
+            try:
+                for item in generator:
+                    if not put("item", item):
+                        break
+            finally:
+                close = getattr(generator, "close", None)
+                if close is not None:
+                    close()
+            put("done", None)
+        except Exception as e:
+            put("error", e)
+        finally:
+            if worker_slots is not None:
+                worker_slots.release()
+
+    threading.Thread(target=work, daemon=True).start()
+
+    try:
+        while True:
+            kind, item = await queue.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise item
+            yield item
+    finally:
+        stopped.set()
+
+
 def authenticate_function(key):
     """
     This function checks if the provided key is valid for authentication.
@@ -434,10 +554,26 @@ def create_router(async_interpreter):
             media_type="text/html",
         )
 
-    @router.websocket("/")
-    async def websocket_endpoint(websocket: WebSocket):
+    async def handle_websocket(websocket, async_interpreter):
         await websocket.accept()
 
+        # Outputs awaiting acknowledgement on this connection
+        acknowledgements = AckWindow(
+            transmit=lambda output: websocket.send_text(json.dumps(output)),
+            size=async_interpreter.ack_window_size,
+            timeout=async_interpreter.ack_timeout,
+            retries=async_interpreter.ack_retries,
+            on_failure=async_interpreter.unsent_messages.append,
+        )
+
+        if async_interpreter.output_batch_window > 0:
+            coalescer = OutputCoalescer(
+                window=async_interpreter.output_batch_window,
+                max_bytes=async_interpreter.output_batch_bytes,
+            )
+        else:
+            coalescer = None
+
         try:  # solving it ;)/ # killian super wrote this
 
             async def receive_input():
@@ -473,9 +609,13 @@ def create_router(async_interpreter):
                                     async_interpreter.require_acknowledge
                                     and "ack" in data
                                 ):
-                                    async_interpreter.acknowledged_outputs.append(
-                                        data["ack"]
-                                    )
+                                    if (
+                                        acknowledgements.ack(data["ack"])
+                                        and async_interpreter.debug
+                                    ):
+                                        print(
+                                            "This output was acknowledged:", data["ack"]
+                                        )
                                     continue
                             elif "bytes" in data:
                                 data = data["bytes"]
@@ -523,9 +663,19 @@ def create_router(async_interpreter):
                         # If we've sent all unsent messages, get a new output
                         if not async_interpreter.unsent_messages:
                             output = await async_interpreter.output()
+                            if coalescer is not None:
+                                output, next_output = await coalescer.collect(
+                                    output,
+                                    async_interpreter.output_queue.async_q.get_nowait,
+                                )
+                                if next_output is not None:
+                                    # Couldn't be merged, so it's sent right after this
+                                    async_interpreter.unsent_messages.append(
+                                        next_output
+                                    )
                             success = await send_message(output)
                             if not success:
-                                async_interpreter.unsent_messages.append(output)
+                                async_interpreter.unsent_messages.appendleft(output)
                                 if async_interpreter.debug:
                                     print(
                                         f"Added message to unsent_messages queue after failed attempts: {output}"
@@ -569,31 +719,18 @@ def create_router(async_interpreter):
                         if isinstance(output, bytes):
                             await websocket.send_bytes(output)
                             return True  # Haven't set up ack for this
+                        elif async_interpreter.require_acknowledge:
+                            output["id"] = id
+                            if async_interpreter.debug:
+                                print("Sending this over the websocket:", output)
+                            # Returns once it's sent. If it's not acknowledged in time, it's
+                            # sent again, then put back on unsent_messages.
+                            await acknowledgements.send(id, output)
+                            return True
                         else:
-                            if async_interpreter.require_acknowledge:
-                                output["id"] = id
                             if async_interpreter.debug:
                                 print("Sending this over the websocket:", output)
                             await websocket.send_text(json.dumps(output))
-
-                        if async_interpreter.require_acknowledge:
-                            acknowledged = False
-                            for _ in range(100):
-                                if id in async_interpreter.acknowledged_outputs:
-                                    async_interpreter.acknowledged_outputs.remove(id)
-                                    acknowledged = True
-                                    if async_interpreter.debug:
-                                        print("This output was acknowledged:", output)
-                                    break
-                                await asyncio.sleep(0.0001)
-
-                            if acknowledged:
-                                return True
-                            else:
-                                if async_interpreter.debug:
-                                    print("Acknowledgement not received for:", output)
-                                return False
-                        else:
                             return True
 
                     except Exception as e:
@@ -615,7 +752,13 @@ def create_router(async_interpreter):
 
                 return False
 
-            await asyncio.gather(receive_input(), send_output())
+            try:
+                await asyncio.gather(receive_input(), send_output())
+            finally:
+                # Anything still unacknowledged is sent again on the next connection
+                async_interpreter.unsent_messages.extendleft(
+                    reversed(acknowledgements.close())
+                )
 
         except Exception as e:
             error = traceback.format_exc() + "\n" + str(e)
@@ -630,6 +773,38 @@ def create_router(async_interpreter):
             print(error)
             print("\n\n--- (ERROR ABOVE WILL BE SENT WHEN POSSIBLE) ---\n\n")
 
+    @router.websocket("/")
+    async def websocket_endpoint(websocket: WebSocket):
+        await handle_websocket(websocket, async_interpreter)
+
+    ### SESSIONS
+
+    @router.websocket("/sessions/{session_id}")
+    async def session_websocket_endpoint(websocket: WebSocket, session_id: str):
+        sessions = async_interpreter.server.sessions
+        try:
+            # Restoring a session, or evicting others, reads and writes files
+            session = await run_in_thread(lambda: sessions.connect(session_id))
+        except ValueError:
+            await websocket.close(code=1008)
+            return
+        try:
+            await handle_websocket(websocket, session)
+        finally:
+            sessions.disconnect(session_id)
+
+    @router.get("/sessions")
+    async def list_sessions():
+        return {"sessions": async_interpreter.server.sessions.list()}
+
+    @router.delete("/sessions/{session_id}")
+    async def delete_session(session_id: str):
+        sessions = async_interpreter.server.sessions
+        if sessions.is_busy(session_id):
+            raise HTTPException(status_code=409, detail="Session is in use")
+        await run_in_thread(lambda: sessions.delete(session_id))
+        return {"status": "success"}
+
     # TODO
     @router.post("/")
     async def post_input(payload: Dict[str, Any]):
@@ -723,36 +898,48 @@ def create_router(async_interpreter):
         temperature: Optional[float] = None
         stream: Optional[bool] = False
 
-    async def openai_compatible_generator(run_code):
+    def completion_chunk(i, content):
+        output_chunk = {
+            "id": i,
+            "object": "chat.completion.chunk",
+            "created": time.time(),
+            "model": "open-interpreter",
+            "choices": [{"delta": {"content": content}}],
+        }
+        return f"data: {json.dumps(output_chunk)}\n\n"
+
+    async def openai_compatible_generator(async_interpreter, run_code):
+        # The interpreter's generators block, so they run on a worker thread (see stream_in_thread)
         if run_code:
             print("Running code.\n")
-            for i, chunk in enumerate(async_interpreter._respond_and_store()):
-                if "content" in chunk:
-                    print(chunk["content"], end="")  # Sorry! Shitty display for now
-                if "start" in chunk:
-                    print("\n")
-
-                output_content = None
-
-                if chunk["type"] == "message" and "content" in chunk:
-                    output_content = chunk["content"]
-                if chunk["type"] == "code" and "start" in chunk:
-                    output_content = " "
-                if chunk["type"] == "code" and "content" in chunk:
-                    output_content = (
-                        f"""<unvoiced code="{chunk["content"]}"></unvoiced>"""
-                    )
+            chunks = stream_in_thread(
+                async_interpreter._respond_and_store,
+                worker_slots=async_interpreter.worker_slots,
+            )
+            i = -1
+            try:
+                async for chunk in chunks:
+                    i += 1
+                    if "content" in chunk:
+                        print(chunk["content"], end="")  # Sorry! Shitty display for now
+                    if "start" in chunk:
+                        print("\n")
+
+                    output_content = None
+
+                    if chunk["type"] == "message" and "content" in chunk:
+                        output_content = chunk["content"]
+                    if chunk["type"] == "code" and "start" in chunk:
+                        output_content = " "
+                    if chunk["type"] == "code" and "content" in chunk:
+                        output_content = (
+                            f"""<unvoiced code="{chunk["content"]}"></unvoiced>"""
+                        )
 
-                if output_content:
-                    await asyncio.sleep(0)
-                    output_chunk = {
-                        "id": i,
-                        "object": "chat.completion.chunk",
-                        "created": time.time(),
-                        "model": "open-interpreter",
-                        "choices": [{"delta": {"content": output_content}}],
-                    }
-                    yield f"data: {json.dumps(output_chunk)}\n\n"
+                    if output_content:
+                        yield completion_chunk(i, output_content)
+            finally:
+                await chunks.aclose()
 
             return
 
@@ -766,62 +953,50 @@ def create_router(async_interpreter):
             "Can you respond?",
             "Please reply.",
         ]:
-            for i, chunk in enumerate(
-                async_interpreter.chat(message=message, stream=True, display=True)
-            ):
-                await asyncio.sleep(0)  # Yield control to the event loop
-                made_chunk = True
+            chunks = stream_in_thread(
+                lambda message=message: async_interpreter.chat(
+                    message=message, stream=True, display=True
+                ),
+                worker_slots=async_interpreter.worker_slots,
+            )
+            i = -1
+            try:
+                async for chunk in chunks:
+                    i += 1
+                    made_chunk = True
 
-                if (
-                    chunk["type"] == "confirmation"
-                    and async_interpreter.auto_run == False
-                ):
-                    break
-
-                if async_interpreter.stop_event.is_set():
-                    break
-
-                output_content = None
-
-                if chunk["type"] == "message" and "content" in chunk:
-                    output_content = chunk["content"]
-                if chunk["type"] == "code" and "start" in chunk:
-                    output_content = " "
-                if chunk["type"] == "code" and "content" in chunk:
-                    output_content = (
-                        f"""<unvoiced code="{chunk["content"]}"></unvoiced>"""
-                    )
+                    if (
+                        chunk["type"] == "confirmation"
+                        and async_interpreter.auto_run == False
+                    ):
+                        break
 
-                if output_content:
-                    await asyncio.sleep(0)
-                    output_chunk = {
-                        "id": i,
-                        "object": "chat.completion.chunk",
-                        "created": time.time(),
-                        "model": "open-interpreter",
-                        "choices": [{"delta": {"content": output_content}}],
-                    }
-                    yield f"data: {json.dumps(output_chunk)}\n\n"
+                    if async_interpreter.stop_event.is_set():
+                        break
+
+                    output_content = None
+
+                    if chunk["type"] == "message" and "content" in chunk:
+                        output_content = chunk["content"]
+                    if chunk["type"] == "code" and "start" in chunk:
+                        output_content = " "
+                    if chunk["type"] == "code" and "content" in chunk:
+                        output_content = (
+                            f"""<unvoiced code="{chunk["content"]}"></unvoiced>"""
+                        )
+
+                    if output_content:
+                        yield completion_chunk(i, output_content)
+            finally:
+                await chunks.aclose()
 
             if made_chunk:
                 break
 
             if async_interpreter.messages[-1]["type"] == "code":
-                await asyncio.sleep(0)
-                output_content = "{CODE_FINISHED}"
-                output_chunk = {
-                    "id": i,
-                    "object": "chat.completion.chunk",
-                    "created": time.time(),
-                    "model": "open-interpreter",
-                    "choices": [{"delta": {"content": output_content}}],
-                }
-                yield f"data: {json.dumps(output_chunk)}\n\n"
-
-    @router.post("/openai/chat/completions")
-    async def chat_completion(request: ChatCompletionRequest):
-        global last_start_time
+                yield completion_chunk(i, "{CODE_FINISHED}")
 
+    async def handle_chat_completion(request, async_interpreter):
         # Convert to LMC
         last_message = request.messages[-1]
 
@@ -831,7 +1006,7 @@ def create_router(async_interpreter):
         if last_message.content == "{STOP}":
             # Handle special STOP token
             async_interpreter.stop_event.set()
-            time.sleep(5)
+            await asyncio.sleep(5)
             async_interpreter.stop_event.clear()
             return
 
@@ -903,7 +1078,7 @@ def create_router(async_interpreter):
                     if async_interpreter.messages[-1]["content"] == "{START}":
                         # Remove that {START} message that would have just been added
                         async_interpreter.messages = async_interpreter.messages[:-1]
-                    last_start_time = time.time()
+                    async_interpreter.last_start_time = time.time()
                     if (
                         async_interpreter.messages
                         and async_interpreter.messages[-1].get("role") != "user"
@@ -912,7 +1087,7 @@ def create_router(async_interpreter):
                 else:
                     # Check if we're within 6 seconds of last_start_time
                     current_time = time.time()
-                    if current_time - last_start_time <= 6:
+                    if current_time - async_interpreter.last_start_time <= 6:
                         # Continue processing
                         pass
                     else:
@@ -927,15 +1102,19 @@ def create_router(async_interpreter):
                     return
 
         async_interpreter.stop_event.set()
-        time.sleep(0.1)
+        await asyncio.sleep(0.1)
         async_interpreter.stop_event.clear()
 
         if request.stream:
             return StreamingResponse(
-                openai_compatible_generator(run_code), media_type="application/x-ndjson"
+                openai_compatible_generator(async_interpreter, run_code),
+                media_type="application/x-ndjson",
             )
         else:
-            messages = async_interpreter.chat(message=".", stream=False, display=True)
+            messages = await run_in_thread(
+                lambda: async_interpreter.chat(message=".", stream=False, display=True),
+                worker_slots=async_interpreter.worker_slots,
+            )
             content = messages[-1]["content"]
             return {
                 "id": "200",
@@ -945,6 +1124,20 @@ def create_router(async_interpreter):
                 "choices": [{"message": {"role": "assistant", "content": content}}],
             }
 
+    @router.post("/openai/chat/completions")
+    async def chat_completion(request: ChatCompletionRequest):
+        return await handle_chat_completion(request, async_interpreter)
+
+    @router.post("/sessions/{session_id}/openai/chat/completions")
+    async def session_chat_completion(session_id: str, request: ChatCompletionRequest):
+        try:
+            session = await run_in_thread(
+                lambda: async_interpreter.server.sessions.get(session_id)
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return await handle_chat_completion(request, session)
+
     return router
 
 
@@ -957,6 +1150,11 @@ class Server:
         router = create_router(async_interpreter)
         self.authenticate = authenticate_function
 
+        # Other conversations, each with its own interpreter, at /sessions/{session_id}
+        self.sessions = SessionManager(
+            async_interpreter, factory=lambda: self.new_session(async_interpreter)
+        )
+
         # Add authentication middleware
         @self.app.middleware("http")
         async def validate_api_key(request: Request, call_next):
@@ -980,6 +1178,14 @@ class Server:
         self.config = uvicorn.Config(app=self.app, host=h, port=p)
         self.uvicorn_server = uvicorn.Server(self.config)
 
+    def new_session(self, async_interpreter):
+        session = copy_settings(
+            async_interpreter, type(async_interpreter)(server=False)
+        )
+        # Sessions are served (and authenticated) by this server
+        session.server = self
+        return session
+
     @property
     def host(self):
         return self.config.host
@@ -1018,6 +1224,9 @@ class Server:
 
         self.uvicorn_server.run()
 
+        # Save every session so they can be picked up again after a restart
+        self.sessions.shutdown()
+
         # for _ in range(retries):
         #     try:
         #         self.uvicorn_server.run()
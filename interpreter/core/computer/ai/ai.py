@@ -1,122 +1,188 @@
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 
-import tiktoken
+from ...utils.retry import backoff_delay, is_retryable
+from ...utils.tokenizers import count_tokens, iter_chunks
 
 
 def split_into_chunks(text, tokens, llm, overlap):
-    try:
-        encoding = tiktoken.encoding_for_model(llm.model)
-        tokenized_text = encoding.encode(text)
-        chunks = []
-        for i in range(0, len(tokenized_text), tokens - overlap):
-            chunk = encoding.decode(tokenized_text[i : i + tokens])
-            chunks.append(chunk)
-    except Exception:
-        chunks = []
-        for i in range(0, len(text), tokens * 4 - overlap):
-            chunk = text[i : i + tokens * 4]
-            chunks.append(chunk)
-    return chunks
+    return list(iter_chunks(text, tokens, overlap, llm.model))
 
 
 def chunk_responses(responses, tokens, llm):
-    try:
-        encoding = tiktoken.encoding_for_model(llm.model)
-        chunked_responses = []
-        current_chunk = ""
-        current_tokens = 0
-
-        for response in responses:
-            tokenized_response = encoding.encode(response)
-            new_tokens = current_tokens + len(tokenized_response)
-
-            # If the new token count exceeds the limit, handle the current chunk
-            if new_tokens > tokens:
-                # If current chunk is empty or response alone exceeds limit, add response as standalone
-                if current_tokens == 0 or len(tokenized_response) > tokens:
-                    chunked_responses.append(response)
-                else:
-                    chunked_responses.append(current_chunk)
-                    current_chunk = response
-                    current_tokens = len(tokenized_response)
-                continue
-
-            # Add response to the current chunk
-            current_chunk += "\n\n" + response if current_chunk else response
-            current_tokens = new_tokens
-
-        # Add remaining chunk if not empty
-        if current_chunk:
-            chunked_responses.append(current_chunk)
-    except Exception:
-        chunked_responses = []
-        current_chunk = ""
-        current_chars = 0
-
-        for response in responses:
-            new_chars = current_chars + len(response)
-
-            # If the new char count exceeds the limit, handle the current chunk
-            if new_chars > tokens * 4:
-                # If current chunk is empty or response alone exceeds limit, add response as standalone
-                if current_chars == 0 or len(response) > tokens * 4:
-                    chunked_responses.append(response)
-                else:
-                    chunked_responses.append(current_chunk)
-                    current_chunk = response
-                    current_chars = len(response)
-                continue
-
-            # Add response to the current chunk
-            current_chunk += "\n\n" + response if current_chunk else response
-            current_chars = new_chars
-
-        # Add remaining chunk if not empty
-        if current_chunk:
-            chunked_responses.append(current_chunk)
+    """
+    Packs responses together into chunks of up to `tokens` tokens. Each response is counted once.
+    """
+    chunked_responses = []
+    current_chunk = ""
+    current_tokens = 0
+
+    for response in responses:
+        response_tokens = count_tokens(response, llm.model)
+        new_tokens = current_tokens + response_tokens
+
+        # If the new token count exceeds the limit, handle the current chunk
+        if new_tokens > tokens:
+            if current_chunk:
+                chunked_responses.append(current_chunk)
+            # If the response alone exceeds the limit, add it as standalone (keeping the order)
+            if response_tokens > tokens:
+                chunked_responses.append(response)
+                current_chunk = ""
+                current_tokens = 0
+            else:
+                current_chunk = response
+                current_tokens = response_tokens
+            continue
+
+        # Add response to the current chunk
+        current_chunk += "\n\n" + response if current_chunk else response
+        current_tokens = new_tokens
+
+    # Add remaining chunk if not empty
+    if current_chunk:
+        chunked_responses.append(current_chunk)
     return chunked_responses
 
 
-def fast_llm(llm, system_message, user_message):
-    old_messages = llm.interpreter.messages
-    old_system_message = llm.interpreter.system_message
-    try:
-        llm.interpreter.system_message = system_message
-        llm.interpreter.messages = []
-        response = llm.interpreter.chat(user_message)
-    finally:
-        llm.interpreter.messages = old_messages
-        llm.interpreter.system_message = old_system_message
-        return response[-1].get("content")
-
-
-def query_map_chunks(chunks, llm, query):
-    """Query the chunks of text using query_chunk_map."""
-    with ThreadPoolExecutor() as executor:
-        responses = list(
-            executor.map(lambda chunk: fast_llm(llm, query, chunk), chunks)
-        )
-    return responses
-
+def isolated_llm(llm):
+    """
+    A copy of the LLM with its own caches, so calls on several threads don't share any state.
+    """
+    from ...llm.utils.context_trimmer import ContextTrimmer
+    from ...llm.utils.convert_to_openai_messages import ConversionCache
 
-def query_reduce_chunks(responses, llm, chunk_size, query):
-    """Reduce query responses in a while loop."""
-    while len(responses) > 1:
-        chunks = chunk_responses(responses, chunk_size, llm)
+    llm = copy.copy(llm)
+    if hasattr(llm, "conversion_cache"):
+        llm.conversion_cache = ConversionCache()
+    if hasattr(llm, "context_trimmer"):
+        llm.context_trimmer = ContextTrimmer(model=llm.model)
+    return llm
 
-        # Use multithreading to summarize each chunk simultaneously
-        with ThreadPoolExecutor() as executor:
-            summaries = list(
-                executor.map(lambda chunk: fast_llm(llm, query, chunk), chunks)
-            )
 
-    return summaries[0]
+def fast_llm(llm, system_message, user_message):
+    # Runs the LLM directly, so the interpreter's messages and system message are never swapped out
+    messages = [
+        {"role": "system", "type": "message", "content": system_message},
+        {"role": "user", "type": "message", "content": user_message},
+    ]
+    response = ""
+    for chunk in isolated_llm(llm).run(messages):
+        if "content" in chunk:
+            response += chunk.get("content")
+    return response
+
+
+class MapReduce:
+    """
+    Asks one query of many chunks of text, then merges the answers.
+
+    Each chunk gets its own LLM context. At most `max_concurrency` calls are in flight,
+    across every query run through this object. Rate limits and transient errors are
+    retried up to `max_retries` times with jittered exponential backoff (or the Retry-After
+    the provider asked for). Answers are cached by (model, query, chunk) hash.
+
+    The answers are reduced as a tree: packed into groups that fit in `chunk_size` tokens,
+    each group reduced to one answer, level by level until one is left.
+    """
+
+    def __init__(
+        self,
+        max_concurrency=4,
+        max_retries=5,
+        backoff=1.0,
+        max_backoff=60,
+        cache_size=1024,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cache_size = cache_size
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        # Metrics
+        self.calls = 0
+        self.retries = 0
+        self.cache_hits = 0
+
+    def run(self, llm, chunks, query, reduce_query, chunk_size):
+        return self.reduce(llm, self.map(llm, chunks, query), chunk_size, reduce_query)
+
+    def map(self, llm, chunks, query):
+        """
+        Asks `query` of each chunk. Returns the answers in order.
+        """
+        if not chunks:
+            return []
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, len(chunks))
+        ) as executor:
+            return list(executor.map(lambda chunk: self.ask(llm, query, chunk), chunks))
+
+    def reduce(self, llm, responses, chunk_size, query):
+        """
+        Merges answers with `query` until one is left.
+        """
+        while len(responses) > 1:
+            groups = chunk_responses(responses, chunk_size, llm)
+            if len(groups) >= len(responses):
+                # No two answers fit together, so pair them up. Each level still halves
+                groups = [
+                    "\n\n".join(responses[i : i + 2])
+                    for i in range(0, len(responses), 2)
+                ]
+            responses = self.map(llm, groups, query)
+        return responses[0] if responses else ""
+
+    def ask(self, llm, query, text):
+        key = hashlib.sha256(
+            "\0".join([str(getattr(llm, "model", "")), query, text]).encode()
+        ).hexdigest()
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return self._cache[key]
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._slots:
+                    self.calls += 1
+                    response = fast_llm(llm, query, text)
+                break
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self.retries += 1
+                time.sleep(backoff_delay(e, attempt, self.backoff, self.max_backoff))
+
+        with self._cache_lock:
+            self._cache[key] = response
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return response
 
 
 class Ai:
     def __init__(self, computer):
         self.computer = computer
 
+        # Settings
+        self.chunk_size = 2000  # In tokens
+        self.overlap = 50
+        self.map_reduce = MapReduce(
+            max_concurrency=int(os.getenv("INTERPRETER_AI_CONCURRENCY", "4"))
+        )
+
     def chat(self, text, base64=None):
         messages = [
             {
@@ -168,24 +234,18 @@ class Ai:
         if custom_reduce_query == None:
             custom_reduce_query = query
 
-        chunk_size = 2000
-        overlap = 50
+        llm = self.computer.interpreter.llm
+        if not getattr(llm, "_is_loaded", True):
+            llm.load()  # Once, before it's copied for each chunk
 
         # Split the text into chunks
-        chunks = split_into_chunks(
-            text, chunk_size, self.computer.interpreter.llm, overlap
-        )
+        chunks = split_into_chunks(text, self.chunk_size, llm, self.overlap)
 
-        # (Map) Query each chunk
-        responses = query_map_chunks(chunks, self.computer.interpreter.llm, query)
-
-        # (Reduce) Compress the responses
-        response = query_reduce_chunks(
-            responses, self.computer.interpreter.llm, chunk_size, custom_reduce_query
+        # (Map) Query each chunk, then (Reduce) compress the responses
+        return self.map_reduce.run(
+            llm, chunks, query, custom_reduce_query, self.chunk_size
         )
 
-        return response
-
     def summarize(self, text):
         query = "You are a highly skilled AI trained in language comprehension and summarization. I would like you to read the following text and summarize it into a concise abstract paragraph. Aim to retain the most important points, providing a coherent and readable summary that could help a person understand the main points of the discussion without needing to read the entire text. Please avoid unnecessary details or tangential points."
         custom_reduce_query = "You are tasked with taking multiple summarized texts and merging them into one unified and concise summary. Maintain the core essence of the content and provide a clear and comprehensive summary that encapsulates all the main points from the individual summaries."
@@ -113,6 +113,10 @@ Do not import the computer module, or any of its sub-modules. They are already i
         """
         Shortcut for computer.terminal.terminate
         """
+        # Cached system message blocks were rendered by the kernels we're about to kill
+        render_cache = getattr(self.interpreter, "render_cache", None)
+        if render_cache is not None:
+            render_cache.clear()
         return self.terminal.terminate()
 
     def screenshot(self, *args, **kwargs):
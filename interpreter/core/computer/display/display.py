@@ -13,6 +13,7 @@ import requests
 from IPython.display import display
 from PIL import Image
 
+from ....terminal_interface.utils.local_storage_path import get_storage_path
 from ...utils.lazy_import import lazy_import
 from ..utils.recipient_utils import format_to_recipient
 
@@ -32,7 +33,13 @@ screeninfo = lazy_import("screeninfo")
 pywinctl = lazy_import("pywinctl")
 
 
-from ..utils.computer_vision import find_text_in_image, pytesseract_get_text
+from ..utils.computer_vision import (
+    find_text_in_image,
+    pytesseract_get_text,
+    pytesseract_get_words,
+    words_to_text,
+)
+from .frames import FramePipeline
 
 
 class Display:
@@ -41,7 +48,12 @@ class Display:
         # set width and height to None initially to prevent pyautogui from importing until it's needed
         self._width = None
         self._height = None
-        self._hashes = {}
+        self._hashes = (
+            None  # Icon embeddings, shared across sessions. Created on first use
+        )
+        # Keeps OCR and icon detection results between screenshots, so only the parts of the
+        # screen that changed are analysed again. Set to None to analyse every screenshot whole
+        self.frames = FramePipeline()
 
     # We use properties here so that this code only executes when height/width are accessed for the first time
     @property
@@ -188,11 +200,12 @@ class Display:
 
         # Open the image file with PIL
         # IPython interactive mode auto-displays plots, causing RGBA handling issues, possibly MacOS-specific.
+        # Skip the conversion (a full copy of the frame) if it's already RGB
         if isinstance(screenshot, list):
             screenshot = [
-                img.convert("RGB") for img in screenshot
+                img if img.mode == "RGB" else img.convert("RGB") for img in screenshot
             ]  # if screenshot is a list (i.e combine_screens=False).
-        else:
+        elif screenshot.mode != "RGB":
             screenshot = screenshot.convert("RGB")
 
         if show:
@@ -212,7 +225,8 @@ class Display:
             try:
                 if self.computer.debug:
                     print("DEBUG MODE ON")
-                    print("NUM HASHES:", len(self._hashes))
+                    if self._hashes is not None:
+                        print("ICON EMBEDDING CACHE:", self._hashes.stats())
                 else:
                     message = format_to_recipient(
                         "Locating this icon will take ~15 seconds. Subsequent icons should be found more quickly.",
@@ -220,13 +234,22 @@ class Display:
                     )
                     print(message)
 
-                if len(self._hashes) > 5000:
-                    self._hashes = dict(list(self._hashes.items())[-5000:])
+                from .point.embedding_cache import EmbeddingCache
+                from .point.point import model_name, point
 
-                from .point.point import point
+                if self._hashes is None:
+                    self._hashes = EmbeddingCache(
+                        os.path.join(
+                            get_storage_path("embeddings"), f"icons-{model_name}.sqlite"
+                        )
+                    )
 
                 result = point(
-                    description, screenshot, self.computer.debug, self._hashes
+                    description,
+                    screenshot,
+                    self.computer.debug,
+                    self._hashes,
+                    frames=self.frames,
                 )
 
                 return result
@@ -292,7 +315,9 @@ class Display:
         # We'll only get here if 1) self.computer.offline = True, or the API failed
 
         # Find the text in the screenshot
-        centers = find_text_in_image(screenshot, text, self.computer.debug)
+        centers = find_text_in_image(
+            screenshot, text, self.computer.debug, words=self.get_words(screenshot)
+        )
 
         return [
             {"coordinates": center, "text": "", "similarity": 1} for center in centers
@@ -303,7 +328,7 @@ class Display:
         Extracts and returns text from a screenshot or the current screen as a list of lists, each representing a line of text.
         """
         if screenshot == None:
-            screenshot = self.screenshot(show=False, force_image=True)
+            screenshot = self.screenshot(show=False)
 
         if not self.computer.offline:
             # Convert the screenshot to base64
@@ -324,12 +349,28 @@ class Display:
         # We'll only get here if 1) self.computer.offline = True, or the API failed
 
         try:
+            if self.frames is not None:
+                return words_to_text(self.get_words(screenshot))
             return pytesseract_get_text(screenshot)
         except:
             raise Exception(
                 "Failed to find text locally.\n\nTo find text in order to use the mouse, please make sure you've installed `pytesseract` along with the Tesseract executable (see this Stack Overflow answer for help installing Tesseract: https://stackoverflow.com/questions/50951955/pytesseract-tesseractnotfound-error-tesseract-is-not-installed-or-its-not-i)."
             )
 
+    def get_words(self, screenshot):
+        """
+        Returns the words on a screenshot and their positions, only re-reading the parts of the
+        screen that changed since the last screenshot read this way.
+        """
+        if self.frames is None:
+            return None
+        return self.frames.boxes(
+            "text",
+            screenshot,
+            pytesseract_get_words,
+            keys=("left", "top", "width", "height"),
+        )
+
 
 def take_screenshot_to_pil(screen=0, combine_screens=True):
     # Get information about all screens
@@ -0,0 +1,260 @@
+import hashlib
+import threading
+
+from ...utils.lazy_import import lazy_import
+from .point.box_index import boxes_to_array, inside, intersects
+
+# Lazy import of optional packages
+np = lazy_import("numpy")
+
+
+def tile_hashes(array, tile_size=64):
+    """
+    Hashes each tile_size x tile_size tile of an image array. Returns a (rows, columns) array.
+    """
+    height, width = array.shape[:2]
+    rows = -(-height // tile_size)
+    columns = -(-width // tile_size)
+    hashes = np.empty((rows, columns), dtype=np.uint64)
+    for row in range(rows):
+        band = array[row * tile_size : (row + 1) * tile_size]
+        for column in range(columns):
+            tile = band[:, column * tile_size : (column + 1) * tile_size]
+            digest = hashlib.blake2b(tile.tobytes(), digest_size=8).digest()
+            hashes[row, column] = int.from_bytes(digest, "little")
+    return hashes
+
+
+def dirty_rectangles(changed, tile_size, width, height):
+    """
+    Turns a (rows, columns) grid of changed tiles into (left, top, right, bottom) pixel
+    rectangles, one per group of touching tiles.
+    """
+    rows, columns = changed.shape
+    seen = np.zeros_like(changed, dtype=bool)
+    rectangles = []
+    for row, column in zip(*np.nonzero(changed)):
+        if seen[row, column]:
+            continue
+        # Flood fill the group, tracking its bounds
+        seen[row, column] = True
+        stack = [(row, column)]
+        top, left, bottom, right = row, column, row, column
+        while stack:
+            r, c = stack.pop()
+            top, left = min(top, r), min(left, c)
+            bottom, right = max(bottom, r), max(right, c)
+            for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if 0 <= nr < rows and 0 <= nc < columns:
+                    if changed[nr, nc] and not seen[nr, nc]:
+                        seen[nr, nc] = True
+                        stack.append((nr, nc))
+        rectangles.append(
+            (
+                int(left * tile_size),
+                int(top * tile_size),
+                int(min((right + 1) * tile_size, width)),
+                int(min((bottom + 1) * tile_size, height)),
+            )
+        )
+    return rectangles
+
+
+def merge_rectangles(rectangles):
+    # Merge overlapping or touching rectangles until none are left
+    rectangles = list(rectangles)
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for rectangle in rectangles:
+            for i, other in enumerate(result):
+                if (
+                    rectangle[0] <= other[2]
+                    and other[0] <= rectangle[2]
+                    and rectangle[1] <= other[3]
+                    and other[1] <= rectangle[3]
+                ):
+                    result[i] = (
+                        min(rectangle[0], other[0]),
+                        min(rectangle[1], other[1]),
+                        max(rectangle[2], other[2]),
+                        max(rectangle[3], other[3]),
+                    )
+                    merged = True
+                    break
+            else:
+                result.append(rectangle)
+        rectangles = result
+    return rectangles
+
+
+def image_size(image):
+    # (width, height) of a PIL image or NumPy array
+    if hasattr(image, "crop"):
+        return image.size
+    return image.shape[1], image.shape[0]
+
+
+def crop(image, rectangle):
+    # PIL images and NumPy arrays
+    if hasattr(image, "crop"):
+        return image.crop(rectangle)
+    left, top, right, bottom = rectangle
+    return image[top:bottom, left:right]
+
+
+class FramePipeline:
+    """
+    Re-runs screen analyses (OCR, contour detection) only on the parts of the screen that changed.
+
+    Each analysis remembers the tile hashes of the last frame it ran on, and the boxes it found.
+    On a new frame, the changed tiles are grouped into rectangles, padded by `margin` and grown
+    to cover any cached box they touch (so it's re-detected whole). The analysis only runs on
+    those rectangles, and its boxes replace the cached boxes inside them.
+
+    If more than `max_dirty_fraction` of the frame changed, or its size changed, the whole
+    frame is analysed again.
+    """
+
+    def __init__(self, tile_size=64, margin=16, max_dirty_fraction=0.5):
+        self.tile_size = tile_size
+        self.margin = margin
+        self.max_dirty_fraction = max_dirty_fraction
+
+        self._analyses = {}  # name -> {"hashes", "boxes"}
+        self._last_frame = None  # (image, hashes), so a frame is only hashed once
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.pixels_analysed = 0
+        self.pixels_seen = 0
+
+    def hashes(self, image):
+        last_frame = self._last_frame
+        if last_frame is not None and last_frame[0] is image:
+            return last_frame[1]
+        hashes = tile_hashes(np.asarray(image), self.tile_size)
+        self._last_frame = (image, hashes)
+        return hashes
+
+    def boxes(self, name, image, analyze, keys=("x", "y", "width", "height")):
+        """
+        Returns the boxes `analyze` finds in `image`, reusing the ones found in unchanged parts
+        of the last frame analysed under `name`.
+
+        `analyze` takes an image (or a crop of one) and returns a list of dicts with the
+        position keys in `keys`, relative to what it was given.
+        """
+        with self._lock:
+            width, height = image_size(image)
+            hashes = self.hashes(image)
+            self.pixels_seen += width * height
+
+            state = self._analyses.get(name)
+            if state is None or state["hashes"].shape != hashes.shape:
+                regions = [(0, 0, width, height)]
+            else:
+                changed = state["hashes"] != hashes
+                regions = dirty_rectangles(changed, self.tile_size, width, height)
+                regions = self._grow(regions, state["boxes"], keys, width, height)
+
+            dirty_area = sum((r - l) * (b - t) for l, t, r, b in regions)
+            if dirty_area > self.max_dirty_fraction * width * height:
+                regions = [(0, 0, width, height)]
+
+            if regions == [(0, 0, width, height)]:
+                boxes = list(analyze(image))
+                self.pixels_analysed += width * height
+            else:
+                boxes = self._keep(state["boxes"], regions, keys, width, height)
+                for region in regions:
+                    boxes += self._offset(analyze(crop(image, region)), region, keys)
+                    self.pixels_analysed += (region[2] - region[0]) * (
+                        region[3] - region[1]
+                    )
+
+            self._analyses[name] = {"hashes": hashes, "boxes": boxes}
+            return [dict(box) for box in boxes]
+
+    def reset(self, name=None):
+        """
+        Forgets the cached results of one analysis, or all of them.
+        """
+        with self._lock:
+            if name is None:
+                self._analyses = {}
+                self._last_frame = None
+            else:
+                self._analyses.pop(name, None)
+
+    def _is_large(self, box, keys, width, height):
+        # Boxes covering a quarter of the frame (a window outline, say) are kept as they are.
+        # Re-detecting them would mean analysing most of the frame again, and when the layout
+        # really changes, most tiles change and the whole frame is analysed anyway.
+        return box[keys[2]] * box[keys[3]] > width * height / 4
+
+    def _grow(self, regions, cached_boxes, keys, width, height):
+        margin = self.margin
+        regions = [
+            (
+                max(left - margin, 0),
+                max(top - margin, 0),
+                min(right + margin, width),
+                min(bottom + margin, height),
+            )
+            for left, top, right, bottom in regions
+        ]
+        boxes = boxes_to_array(
+            [
+                box
+                for box in cached_boxes
+                if not self._is_large(box, keys, width, height)
+            ],
+            keys,
+        )
+
+        # Grow each region to cover the boxes it touches, until nothing changes
+        while True:
+            regions = merge_rectangles(regions)
+            if not len(boxes):
+                return regions
+            touching = self._touching(boxes, regions)
+            grown = []
+            for i, region in enumerate(regions):
+                hits = boxes[touching[:, i]]
+                grown.append(
+                    (
+                        int(min(region[0], hits[:, 0].min(initial=region[0]))),
+                        int(min(region[1], hits[:, 1].min(initial=region[1]))),
+                        int(max(region[2], np.ceil(hits[:, 2]).max(initial=region[2]))),
+                        int(max(region[3], np.ceil(hits[:, 3]).max(initial=region[3]))),
+                    )
+                )
+            if grown == regions:
+                return regions
+            regions = grown
+
+    def _keep(self, cached_boxes, regions, keys, width, height):
+        # Cached boxes outside the regions, plus the large ones
+        stale = self._touching(boxes_to_array(cached_boxes, keys), regions).any(axis=1)
+        return [
+            box
+            for box, is_stale in zip(cached_boxes, stale)
+            if not is_stale or self._is_large(box, keys, width, height)
+        ]
+
+    def _touching(self, boxes, regions):
+        # (boxes, regions) matrix of which boxes overlap or sit inside which regions
+        regions = np.array(regions, dtype=float).reshape(-1, 4)[None, :, :]
+        boxes = boxes[:, None, :]
+        return intersects(boxes, regions) | inside(boxes, regions)
+
+    def _offset(self, boxes, region, keys):
+        offset = []
+        for box in boxes:
+            box = dict(box)
+            box[keys[0]] += region[0]
+            box[keys[1]] += region[1]
+            offset.append(box)
+        return offset
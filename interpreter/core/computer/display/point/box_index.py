@@ -0,0 +1,156 @@
+from ....utils.lazy_import import lazy_import
+
+# Lazy import of optional packages
+np = lazy_import("numpy")
+
+# Upper bound on pairwise comparisons per NumPy call, to keep memory use flat
+max_pairs_per_batch = 4_000_000
+
+
+def boxes_to_array(boxes, keys=("x", "y", "width", "height")):
+    """
+    Converts box dicts into an (N, 4) array of left, top, right, bottom.
+    """
+    if not boxes:
+        return np.zeros((0, 4))
+    array = np.array([[box[key] for key in keys] for box in boxes], dtype=float)
+    array[:, 2] += array[:, 0]
+    array[:, 3] += array[:, 1]
+    return array
+
+
+def inside(queries, boxes):
+    # queries: (Q, 1, 4), boxes: (1, B, 4). Edges may touch.
+    return (
+        (boxes[..., 0] <= queries[..., 0])
+        & (queries[..., 2] <= boxes[..., 2])
+        & (boxes[..., 1] <= queries[..., 1])
+        & (queries[..., 3] <= boxes[..., 3])
+    )
+
+
+def intersects(queries, boxes):
+    # Overlaps with a positive area
+    return (
+        np.maximum(boxes[..., 0], queries[..., 0])
+        < np.minimum(boxes[..., 2], queries[..., 2])
+    ) & (
+        np.maximum(boxes[..., 1], queries[..., 1])
+        < np.minimum(boxes[..., 3], queries[..., 3])
+    )
+
+
+class BoxIndex:
+    """
+    Answers "is this box inside / does it intersect any of the indexed boxes?"
+    for many boxes at once.
+
+    Queries are sorted by their top edge and processed in bands. Each band is only
+    compared against the indexed boxes that overlap it vertically, found with a
+    binary search.
+    """
+
+    def __init__(self, boxes, keys=("x", "y", "width", "height")):
+        array = boxes_to_array(boxes, keys)
+        order = np.argsort(array[:, 1], kind="stable")
+        self.boxes = array[order]
+        # The lowest bottom edge among boxes sorted by top, so far (for binary search)
+        self._max_bottom = (
+            np.maximum.accumulate(self.boxes[:, 3]) if len(array) else None
+        )
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def contains(self, queries):
+        """
+        For each (left, top, right, bottom) row, whether it's inside any indexed box.
+        """
+        return self._any(queries, inside)
+
+    def intersects(self, queries):
+        """
+        For each (left, top, right, bottom) row, whether it overlaps any indexed box.
+        """
+        return self._any(queries, intersects)
+
+    def _any(self, queries, test):
+        result = np.zeros(len(queries), dtype=bool)
+        if len(queries) == 0 or len(self.boxes) == 0:
+            return result
+
+        order = np.argsort(queries[:, 1], kind="stable")
+        sorted_queries = queries[order]
+        band_size = max(1, max_pairs_per_batch // len(self.boxes))
+
+        for start in range(0, len(sorted_queries), band_size):
+            band = sorted_queries[start : start + band_size]
+            # Indexed boxes that start below the band, or end above it, can't touch it
+            band_top, band_bottom = band[:, 1].min(), band[:, 3].max()
+            last = np.searchsorted(self.boxes[:, 1], band_bottom, side="right")
+            first = np.searchsorted(self._max_bottom[:last], band_top, side="left")
+            candidates = self.boxes[first:last]
+            if len(candidates):
+                result[order[start : start + band_size]] = test(
+                    band[:, None, :], candidates[None, :, :]
+                ).any(axis=1)
+
+        return result
+
+
+def combine_boxes(boxes):
+    """
+    Merges overlapping boxes, exactly like merging them one by one: each box joins the
+    first merged box it overlaps (or starts a new one), repeated until nothing changes.
+
+    Each result is a copy of the first box in its group, with x, y, width and height
+    updated.
+    """
+    while True:
+        count = len(boxes)
+        x = np.empty(count)
+        y = np.empty(count)
+        right = np.empty(count)  # x + width
+        bottom = np.empty(count)  # y + height
+        sources = []
+        merged = 0
+
+        for box in boxes:
+            bx, by, bw, bh = box["x"], box["y"], box["width"], box["height"]
+            overlaps = (
+                (bx < right[:merged])
+                & (bx + bw > x[:merged])
+                & (by < bottom[:merged])
+                & (by + bh > y[:merged])
+            )
+            i = int(overlaps.argmax()) if merged else 0
+            if merged and overlaps[i]:
+                width = right[i] - x[i]
+                height = bottom[i] - y[i]
+                x[i] = min(bx, x[i])
+                y[i] = min(by, y[i])
+                # Like the original, the far edges are measured from the updated x and y
+                right[i] = max(bx + bw, x[i] + width)
+                bottom[i] = max(by + bh, y[i] + height)
+            else:
+                x[merged], y[merged] = bx, by
+                right[merged], bottom[merged] = bx + bw, by + bh
+                sources.append(box)
+                merged += 1
+
+        combined_boxes = []
+        for i, box in enumerate(sources):
+            box = box.copy()
+            box["x"], box["y"] = as_number(x[i], box["x"]), as_number(y[i], box["y"])
+            box["width"] = as_number(right[i] - x[i], box["width"])
+            box["height"] = as_number(bottom[i] - y[i], box["height"])
+            combined_boxes.append(box)
+
+        if len(combined_boxes) == len(boxes):
+            return combined_boxes
+        boxes = combined_boxes
+
+
+def as_number(value, like):
+    # Keep ints as ints, so boxes can still be used for cropping
+    return int(value) if isinstance(like, (int, np.integer)) else float(value)
@@ -0,0 +1,186 @@
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+
+def perceptual_hash(image, size=8, tolerance=4):
+    """
+    A key for an icon that stays the same when the icon is rendered slightly differently
+    (a few pixels of anti-aliasing, compression noise), so those renderings share one embedding.
+    It's the difference hash of the icon, shrunk to (size + 1) x size in grayscale, plus its
+    coarse average color, so icons that only differ in color still get embeddings of their own.
+    """
+    rgb = image.convert("RGB")
+    gray = np.asarray(
+        rgb.convert("L").resize((size + 1, size), Image.BOX), dtype=np.int16
+    )
+    # Neighbors within `tolerance` of each other count as equal, so flat areas are stable
+    bits = np.packbits(gray[:, 1:] > gray[:, :-1] + tolerance)
+    color = np.asarray(rgb.resize((1, 1), Image.BOX)).ravel() // 32
+    return f"dhash:{bits.tobytes().hex()}:{''.join(str(c) for c in color)}"
+
+
+class EmbeddingCache:
+    """
+    Embeddings (of icons, and of search queries) stored in an SQLite file. Icons are keyed by
+    perceptual_hash, so near-identical renderings of an icon share an embedding.
+
+    The file is shared by every session and process on the machine, so an icon is only
+    embedded once. Reads are memory-mapped. Once the stored embeddings take up more than
+    `max_bytes`, the least recently used ones are evicted.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._connection = None
+        self._bytes_since_eviction_check = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False, isolation_level=None
+            )
+            # WAL lets other processes read while one writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(f"PRAGMA mmap_size={self.max_bytes * 2}")
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )"""
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def __len__(self):
+        with self._lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()[0]
+
+    def __contains__(self, key):
+        with self._lock:
+            return (
+                self.connection.execute(
+                    "SELECT 1 FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                is not None
+            )
+
+    def get_many(self, keys):
+        """
+        Returns {key: embedding} for the keys that are stored, and marks them as recently used.
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            # SQLite limits the number of parameters per query
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                rows = self.connection.execute(
+                    f"SELECT key, data FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, data in rows:
+                    found[key] = np.frombuffer(data, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                self.connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, embeddings):
+        """
+        Stores {key: embedding}. Embeddings are saved as 1D float32 arrays.
+        """
+        if not embeddings:
+            return
+        now = time.time()
+        rows = [
+            (key, np.asarray(embedding, dtype=np.float32).ravel().tobytes(), now)
+            for key, embedding in embeddings.items()
+        ]
+        with self._lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, data, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            # Only check the total size once a few percent of the cap has been written
+            self._bytes_since_eviction_check += sum(len(row[1]) for row in rows)
+            if self._bytes_since_eviction_check >= self.max_bytes * 0.05:
+                self._bytes_since_eviction_check = 0
+                self._evict()
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def __getitem__(self, key):
+        embedding = self.get(key)
+        if embedding is None:
+            raise KeyError(key)
+        return embedding
+
+    def __setitem__(self, key, embedding):
+        self.set_many({key: embedding})
+
+    def clear(self):
+        with self._lock:
+            self.connection.execute("DELETE FROM embeddings")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM embeddings"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def _evict(self):
+        size = self.connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM embeddings"
+        ).fetchone()[0]
+        if size <= self.max_bytes:
+            return
+        # Evict down to 90% of the cap, so we don't evict on every write
+        excess = size - self.max_bytes * 0.9
+        self.connection.execute(
+            """DELETE FROM embeddings WHERE key IN (
+                SELECT key FROM (
+                    SELECT
+                        key,
+                        LENGTH(data) AS size,
+                        SUM(LENGTH(data)) OVER (ORDER BY last_used, key) AS freed
+                    FROM embeddings
+                ) WHERE freed - size < ?
+            )""",
+            (excess,),
+        )
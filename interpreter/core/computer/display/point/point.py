@@ -12,7 +12,12 @@ from PIL import Image, ImageDraw, ImageEnhance, ImageFont
 from sentence_transformers import SentenceTransformer, util
 
 from .....terminal_interface.utils.oi_dir import oi_dir
-from ...utils.computer_vision import pytesseract_get_text_bounding_boxes
+from ...utils.computer_vision import (
+    pytesseract_get_text_bounding_boxes,
+    pytesseract_get_words,
+)
+from .box_index import BoxIndex, boxes_to_array, combine_boxes
+from .embedding_cache import perceptual_hash
 
 try:
     nltk.corpus.words.words()
@@ -42,14 +47,14 @@ def take_screenshot_to_pil(filename="temp_screenshot.png"):
 from ...utils.computer_vision import find_text_in_image
 
 
-def point(description, screenshot=None, debug=False, hashes=None):
+def point(description, screenshot=None, debug=False, hashes=None, frames=None):
     if description.startswith('"') and description.endswith('"'):
         return find_text_in_image(description.strip('"'), screenshot, debug)
     else:
-        return find_icon(description, screenshot, debug, hashes)
+        return find_icon(description, screenshot, debug, hashes, frames)
 
 
-def find_icon(description, screenshot=None, debug=False, hashes=None):
+def find_icon(description, screenshot=None, debug=False, hashes=None, frames=None):
     if debug:
         print("STARTING")
     if screenshot == None:
@@ -68,7 +73,13 @@ def find_icon(description, screenshot=None, debug=False, hashes=None):
     #     temp_image_path = temp_file.name
     #   print("yeah took", time.time()-thetime)
 
-    icons_bounding_boxes = get_element_boxes(image_data, debug)
+    if frames is not None and not debug:
+        # Only look for elements in the parts of the screen that changed
+        icons_bounding_boxes = frames.boxes(
+            "elements", image_data, lambda image: get_element_boxes(image, False)
+        )
+    else:
+        icons_bounding_boxes = get_element_boxes(image_data, debug)
 
     if debug:
         print("GOT ICON BOUNDING BOXES")
@@ -131,7 +142,15 @@ def find_icon(description, screenshot=None, debug=False, hashes=None):
     if debug:
         print("GETTING TEXT")
 
-    response = pytesseract_get_text_bounding_boxes(screenshot)
+    if frames is not None and not debug:
+        response = frames.boxes(
+            "text",
+            image_data,
+            pytesseract_get_words,
+            keys=("left", "top", "width", "height"),
+        )
+    else:
+        response = pytesseract_get_text_bounding_boxes(screenshot)
 
     if debug:
         print("GOT TEXT, processing it")
@@ -210,26 +229,14 @@ def find_icon(description, screenshot=None, debug=False, hashes=None):
             os.path.join(debug_path, "pytesseract_filtered_blocks_image_with_text.png")
         )
 
-    # Create an empty list to store the filtered boxes
-    filtered_boxes = []
+    # Index the text blocks so every icon box can be checked against them at once
+    text_index = BoxIndex(blocks, keys=("left", "top", "width", "height"))
 
     # Filter out boxes that fall inside text
-    for box in icons_bounding_boxes:
-        if not any(
-            text_box["left"] <= box["x"] <= text_box["left"] + text_box["width"]
-            and text_box["top"] <= box["y"] <= text_box["top"] + text_box["height"]
-            and text_box["left"]
-            <= box["x"] + box["width"]
-            <= text_box["left"] + text_box["width"]
-            and text_box["top"]
-            <= box["y"] + box["height"]
-            <= text_box["top"] + text_box["height"]
-            for text_box in blocks
-        ):
-            filtered_boxes.append(box)
-        else:
-            pass
-            # print("Filtered out an icon because I think it is text.")
+    inside_text = text_index.contains(boxes_to_array(icons_bounding_boxes))
+    filtered_boxes = [
+        box for box, is_text in zip(icons_bounding_boxes, inside_text) if not is_text
+    ]
 
     icons_bounding_boxes = filtered_boxes
 
@@ -252,17 +259,10 @@ def find_icon(description, screenshot=None, debug=False, hashes=None):
         )
 
     # Filter out boxes that intersect with text at all
-    filtered_boxes = []
-    for box in icons_bounding_boxes:
-        if not any(
-            max(text_box["left"], box["x"])
-            < min(text_box["left"] + text_box["width"], box["x"] + box["width"])
-            and max(text_box["top"], box["y"])
-            < min(text_box["top"] + text_box["height"], box["y"] + box["height"])
-            for text_box in blocks
-        ):
-            filtered_boxes.append(box)
-    icons_bounding_boxes = filtered_boxes
+    touches_text = text_index.intersects(boxes_to_array(icons_bounding_boxes))
+    icons_bounding_boxes = [
+        box for box, is_text in zip(icons_bounding_boxes, touches_text) if not is_text
+    ]
 
     if debug:
         # Create a copy of the image data
@@ -339,42 +339,6 @@ def find_icon(description, screenshot=None, debug=False, hashes=None):
             os.path.join(debug_path, "debug_image_after_expanding_boxes.png")
         )
 
-    def combine_boxes(icons_bounding_boxes):
-        while True:
-            combined_boxes = []
-            for box in icons_bounding_boxes:
-                for i, combined_box in enumerate(combined_boxes):
-                    if (
-                        box["x"] < combined_box["x"] + combined_box["width"]
-                        and box["x"] + box["width"] > combined_box["x"]
-                        and box["y"] < combined_box["y"] + combined_box["height"]
-                        and box["y"] + box["height"] > combined_box["y"]
-                    ):
-                        combined_box["x"] = min(box["x"], combined_box["x"])
-                        combined_box["y"] = min(box["y"], combined_box["y"])
-                        combined_box["width"] = (
-                            max(
-                                box["x"] + box["width"],
-                                combined_box["x"] + combined_box["width"],
-                            )
-                            - combined_box["x"]
-                        )
-                        combined_box["height"] = (
-                            max(
-                                box["y"] + box["height"],
-                                combined_box["y"] + combined_box["height"],
-                            )
-                            - combined_box["y"]
-                        )
-                        break
-                else:
-                    combined_boxes.append(box.copy())
-            if len(combined_boxes) == len(icons_bounding_boxes):
-                break
-            else:
-                icons_bounding_boxes = combined_boxes
-        return combined_boxes
-
     if os.getenv("OI_POINT_OVERLAP", "True") == "True":
         icons_bounding_boxes = combine_boxes(icons_bounding_boxes)
 
@@ -404,8 +368,7 @@ def find_icon(description, screenshot=None, debug=False, hashes=None):
         icon["width"] = w
         icon["height"] = h
 
-        icon_image_hash = hashlib.sha256(icon_image.tobytes()).hexdigest()
-        icon["hash"] = icon_image_hash
+        icon["hash"] = perceptual_hash(icon_image)
 
         # Calculate the relative central xy coordinates of the bounding box
         center_x = box["center_x"] / image_width  # Relative X coordinate
@@ -445,8 +408,9 @@ def find_icon(description, screenshot=None, debug=False, hashes=None):
 
 fast_model = True
 
-# First, we load the respective CLIP model
-model = SentenceTransformer("clip-ViT-B-32")
+# The CLIP model is loaded the first time something needs embedding (see load_model)
+model_name = "clip-ViT-B-32"
+model = None
 
 
 import os
@@ -497,43 +461,68 @@ elif torch.backends.mps.is_available():
 else:
     device = torch.device("cpu")
 
-# Move the model to the specified device
-model = model.to(device)
 
+def load_model():
+    global model
+    if model is None:
+        # Move the model to the specified device
+        model = SentenceTransformer(model_name).to(device)
+    return model
 
-def image_search(query, icons, hashes, debug):
-    hashed_icons = [icon for icon in icons if icon["hash"] in hashes]
-    unhashed_icons = [icon for icon in icons if icon["hash"] not in hashes]
-
-    # Embed the unhashed icons
-    if fast_model:
-        query_and_unhashed_icons_embeds = model.encode(
-            [query] + [icon["data"] for icon in unhashed_icons],
-            batch_size=128,
-            convert_to_tensor=True,
-            show_progress_bar=debug,
-        )
-    else:
-        query_and_unhashed_icons_embeds = embed_images(
-            [query] + [icon["data"] for icon in unhashed_icons], model, transforms
-        )
 
-    query_embed = query_and_unhashed_icons_embeds[0]
-    unhashed_icons_embeds = query_and_unhashed_icons_embeds[1:]
+def get_cached_embeddings(hashes, keys):
+    # `hashes` is an EmbeddingCache, or a plain dict
+    if hasattr(hashes, "get_many"):
+        return hashes.get_many(keys)
+    return {key: hashes[key] for key in keys if key in hashes}
 
-    # Store hashes for unhashed icons
-    for icon, emb in zip(unhashed_icons, unhashed_icons_embeds):
-        hashes[icon["hash"]] = emb
 
-    # Move tensors to the specified device before concatenating
-    unhashed_icons_embeds = unhashed_icons_embeds.to(device)
+def cache_embeddings(hashes, embeddings):
+    if hasattr(hashes, "set_many"):
+        hashes.set_many(embeddings)
+    else:
+        hashes.update(embeddings)
 
-    # Include hashed icons in img_emb
-    img_emb = torch.cat(
-        [unhashed_icons_embeds]
-        + [hashes[icon["hash"]].unsqueeze(0) for icon in hashed_icons]
+
+def image_search(query, icons, hashes, debug):
+    query_key = "query:" + hashlib.sha256(query.encode()).hexdigest()
+    embeddings = get_cached_embeddings(
+        hashes, [query_key] + [icon["hash"] for icon in icons]
     )
 
+    # Embed the query and unhashed icons (each distinct icon once)
+    to_embed = {}
+    if query_key not in embeddings:
+        to_embed[query_key] = query
+    for icon in icons:
+        if icon["hash"] not in embeddings:
+            to_embed[icon["hash"]] = icon["data"]
+
+    if to_embed:
+        if fast_model:
+            new_embeds = load_model().encode(
+                list(to_embed.values()),
+                batch_size=128,
+                convert_to_tensor=True,
+                show_progress_bar=debug,
+            )
+        else:
+            new_embeds = embed_images(list(to_embed.values()), load_model(), transforms)
+
+        # Store hashes for the new embeddings
+        new_embeddings = {
+            key: embed.detach().cpu().numpy()
+            for key, embed in zip(to_embed, new_embeds)
+        }
+        cache_embeddings(hashes, new_embeddings)
+        embeddings.update(new_embeddings)
+
+    # Move tensors to the specified device, in the same order as icons
+    query_embed = torch.as_tensor(embeddings[query_key]).to(device)
+    img_emb = torch.stack(
+        [torch.as_tensor(embeddings[icon["hash"]]) for icon in icons]
+    ).to(device)
+
     # Perform semantic search
     hits = util.semantic_search(query_embed, img_emb)[0]
 
@@ -1,6 +1,10 @@
-import difflib
+import os
+import shutil
+import threading
 
 from ...utils.lazy_import import lazy_import
+from .multi_edit import apply_edits
+from .text_index import TextIndex
 
 # Lazy import of aifs, imported when needed
 aifs = lazy_import('aifs')
@@ -10,6 +14,11 @@ class Files:
         self.computer = computer
         # No sandbox restrictions: This class allows full access to the file system
 
+        # Settings
+        self.chunk_size = 1 << 20  # Characters read at a time while editing
+
+        self._index = None  # ((path, mtime, size), TextIndex) of the last file searched
+
     def search(self, *args, **kwargs):
         """
         Search the filesystem for the given query.
@@ -20,36 +29,92 @@ class Files:
         """
         Edits a file on the filesystem, replacing the original text with the replacement text.
         """
-        with open(path, "r") as file:
-            filedata = file.read()
+        self.edit_many(path, [(original_text, replacement_text)])
+
+    def edit_many(self, path, edits):
+        """
+        Makes several edits to a file at once. Each edit is (original text, replacement text)
+        to replace every match, or (original text, replacement text, n) to replace only the
+        nth match. Matches are looked for in the file as it was, not as other edits leave it.
+
+        The file is read once, in chunks, so it can be larger than memory. The result goes to
+        a temporary file that replaces the original only if every edit matched, so the file
+        is never left half edited. Symlinks are followed, and the file keeps its permissions
+        and, where allowed, its owner.
+
+        Returns a dict per edit with its "original" text, its total "count" of matches, and
+        the "offset" and "line" of each match it replaced, under "matches".
+        """
+        edits = [
+            (edit[0], edit[1], edit[2] if len(edit) > 2 else None) for edit in edits
+        ]
 
-        if original_text not in filedata:
-            matches = get_close_matches_in_text(original_text, filedata)
-            if matches:
-                suggestions = ", ".join(matches)
-                raise ValueError(
-                    f"Original text not found. Did you mean one of these? {suggestions}"
-                )
+        # Replace the file a symlink points to, not the link
+        path = os.path.realpath(path)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(path, "r") as source, open(temp_path, "w") as destination:
+                results = apply_edits(source, destination, edits, self.chunk_size)
 
-        filedata = filedata.replace(original_text, replacement_text)
+            for i, ((original, _, occurrence), (count, _)) in enumerate(zip(edits, results)):
+                prefix = f"Edit {i + 1}: " if len(edits) > 1 else ""
+                if count == 0:
+                    raise ValueError(prefix + self._not_found_message(path, original))
+                if occurrence is not None and count < occurrence:
+                    raise ValueError(
+                        f"{prefix}Original text was found {count} times, so there's no match {occurrence}."
+                    )
+
+            shutil.copymode(path, temp_path)
+            if hasattr(os, "chown"):
+                stat = os.stat(path)
+                try:
+                    os.chown(temp_path, stat.st_uid, stat.st_gid)
+                except OSError:
+                    pass  # Only privileged users can give files away. The new file is ours
+            os.replace(temp_path, path)
+        except:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        return [
+            {"original": original, "count": count, "matches": matches}
+            for (original, _, _), (count, matches) in zip(edits, results)
+        ]
+
+    def _not_found_message(self, path, original_text):
+        matches = self.near_matches(path, original_text)
+        if matches:
+            suggestions = ", ".join(
+                f"{match['text']} (line {match['line']})" for match in matches
+            )
+            return f"Original text not found. Did you mean one of these? {suggestions}"
+        return "Original text not found."
+
+    def near_matches(self, path, text, n=3, filedata=None):
+        """
+        Returns up to `n` regions of a file that resemble `text`, best first, as dicts with
+        "text", "line" and "score". The file's index is kept until the file changes.
+        """
+        try:
+            stat = os.stat(path)
+            key = (path, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            key = None
 
-        with open(path, "w") as file:
-            file.write(filedata)
+        if key is None or self._index is None or self._index[0] != key:
+            if filedata is None:
+                with open(path, "r") as file:
+                    filedata = file.read()
+            self._index = (key, TextIndex(filedata))
+        return self._index[1].near_matches(text, n)
 
 
 def get_close_matches_in_text(original_text, filedata, n=3):
     """
     Returns the closest matches to the original text in the content of the file.
     """
-    words = filedata.split()
-    original_words = original_text.split()
-    len_original = len(original_words)
-
-    matches = []
-    for i in range(len(words) - len_original + 1):
-        phrase = " ".join(words[i : i + len_original])
-        similarity = difflib.SequenceMatcher(None, original_text, phrase).ratio()
-        matches.append((similarity, phrase))
-
-    matches.sort(reverse=True)
-    return [match[1] for match in matches[:n]]
+    return [match["text"] for match in TextIndex(filedata).near_matches(original_text, n)]
@@ -0,0 +1,104 @@
+def apply_edits(source, destination, edits, chunk_size=1 << 20):
+    """
+    Copies text from the `source` file object to `destination`, applying every edit on the way,
+    in one pass and without holding more than a chunk (plus the longest original text) in memory.
+
+    `edits` is a list of (original, replacement, occurrence). `occurrence` is None to replace
+    every match, or n to replace only the nth (counting from 1). Like str.replace, each edit's
+    matches are counted without overlapping each other. Replacements of different edits must
+    not overlap, or a ValueError is raised.
+
+    Returns, for each edit, how many matches it had in total, and the offset and line of each
+    match it replaced: [(count, [{"offset": ..., "line": ...}, ...]), ...]
+    """
+    if any(not original for original, _, _ in edits):
+        raise ValueError("Original text can't be empty.")
+
+    longest = max((len(original) for original, _, _ in edits), default=1)
+    counts = [0] * len(edits)
+    replaced = [[] for _ in edits]
+    cursors = [0] * len(edits)  # Where to look for each edit's next match
+    found = [None] * len(edits)  # Each edit's next match in the buffer, if known
+    searched = [0] * len(edits)  # How far each edit has been looked for, if not found
+
+    buffer = ""
+    buffer_start = 0  # Offset of buffer[0] in the file
+    written = 0  # Everything before this offset has been written
+    line = 1  # The line `written` is on
+    end_of_file = False
+
+    def write_until(offset):
+        # Copies the original text up to `offset`
+        nonlocal written, line
+        text = buffer[written - buffer_start : offset - buffer_start]
+        destination.write(text)
+        line += text.count("\n")
+        written = offset
+
+    while not end_of_file:
+        data = source.read(chunk_size)
+        end_of_file = not data
+        buffer += data
+        buffer_end = buffer_start + len(buffer)
+
+        # Matches starting before `limit` are known: every original text fits after them
+        limit = buffer_end if end_of_file else buffer_end - longest + 1
+
+        while True:
+            for i, (original, _, _) in enumerate(edits):
+                if found[i] is None and searched[i] < buffer_end:
+                    # Don't look through the same text twice
+                    start = max(cursors[i], searched[i] - len(original) + 1)
+                    position = buffer.find(original, max(start - buffer_start, 0))
+                    if position == -1:
+                        searched[i] = buffer_end
+                    else:
+                        found[i] = buffer_start + position
+            candidates = [
+                (start, i)
+                for i, start in enumerate(found)
+                if start is not None and start < limit
+            ]
+            if not candidates:
+                break
+
+            start, i = min(candidates)
+            original, replacement, occurrence = edits[i]
+            found[i] = None
+
+            # Keep going with this edit until another one's next match comes first
+            bound = min(
+                [(other, j) for j, other in enumerate(found) if other is not None]
+                + [(limit, -1)]
+            )
+            while True:
+                cursors[i] = searched[i] = start + len(original)
+                counts[i] += 1
+                if occurrence is None or counts[i] == occurrence:
+                    if start < written:
+                        raise ValueError(
+                            f"Edits overlap: {original!r} overlaps text that's already being replaced."
+                        )
+                    write_until(start)
+                    replaced[i].append({"offset": start, "line": line})
+                    destination.write(replacement)
+                    line += original.count("\n")
+                    written = start + len(original)
+
+                position = buffer.find(original, cursors[i] - buffer_start)
+                if position == -1:
+                    searched[i] = buffer_end
+                    break
+                start = buffer_start + position
+                if (start, i) > bound:
+                    found[i] = start
+                    break
+
+        # Copy everything that can't be part of a match anymore, and forget it
+        if written < limit:
+            write_until(limit)
+        keep_from = min([written] + [max(cursor, limit) for cursor in cursors])
+        buffer = buffer[keep_from - buffer_start :]
+        buffer_start = keep_from
+
+    return list(zip(counts, replaced))
@@ -0,0 +1,151 @@
+import difflib
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from itertools import accumulate, compress, count
+
+# Texts with up to this many words are compared window by window, like difflib would
+brute_force_words = 2000
+
+# Words that occur more often than this are too common to place a match
+max_word_occurrences = 5000
+
+
+class TextIndex:
+    """
+    Finds the regions of a text that most resemble a phrase, for "did you mean" suggestions.
+
+    Every word of the text that also appears in the phrase votes for where the phrase would
+    start if it were there (its position in the text minus its position in the phrase),
+    weighted by how rare the word is. Only the best-voted regions are compared with
+    difflib. Words of the phrase that aren't in the text are stood in for by words that
+    are spelled similarly (and start or end the same way).
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.words = text.split()
+        self._line_ends = None  # Cumulative word count at the end of each line
+        self._vocabulary = None
+        self._affixes = None  # First/last two letters -> words of the text
+
+    def line_of(self, word_index):
+        """
+        The 1-based line number of a word.
+        """
+        if self._line_ends is None:
+            self._line_ends = list(
+                accumulate(map(len, map(str.split, self.text.split("\n"))))
+            )
+        return bisect_right(self._line_ends, word_index) + 1
+
+    def near_matches(self, phrase, n=3):
+        """
+        Returns up to `n` regions like `phrase`, best first, as dicts with the region's
+        "text" (its words, joined by spaces), "line" and "score" (difflib's ratio).
+        """
+        phrase_words = phrase.split()
+        length = len(phrase_words)
+        if not length or not self.words:
+            return []
+
+        if len(self.words) <= brute_force_words:
+            starts = range(len(self.words) - length + 1)
+            matches = sorted(
+                (
+                    (
+                        self._score(phrase, start, length),
+                        self._phrase(start, length),
+                        start,
+                    )
+                    for start in starts
+                ),
+                reverse=True,
+            )[:n]
+        else:
+            scored = sorted(
+                (
+                    (self._score(phrase, start, length), start)
+                    for start in self._candidates(phrase_words, n * 10)
+                ),
+                reverse=True,
+            )
+            # Distinct regions only
+            matches = []
+            for score, start in scored:
+                if all(abs(start - other) >= length for _, _, other in matches):
+                    matches.append((score, self._phrase(start, length), start))
+                    if len(matches) == n:
+                        break
+
+        return [
+            {"text": text, "line": self.line_of(start), "score": score}
+            for score, text, start in matches
+        ]
+
+    def _phrase(self, start, length):
+        return " ".join(self.words[start : start + length])
+
+    def _score(self, phrase, start, length):
+        return difflib.SequenceMatcher(
+            None, phrase, self._phrase(start, length)
+        ).ratio()
+
+    def _candidates(self, phrase_words, regions):
+        # Where each word sits in the phrase
+        offsets = defaultdict(list)
+        for j, word in enumerate(phrase_words):
+            offsets[word].append(j)
+
+        # Let similarly spelled words stand in for the phrase's words that aren't in the text
+        if self._vocabulary is None:
+            self._vocabulary = set(self.words)
+        missing = [word for word in offsets if word not in self._vocabulary][:20]
+        for word in missing:
+            for close in difflib.get_close_matches(
+                word, self._similar_words(word), n=5, cutoff=0.7
+            ):
+                offsets[close].extend(offsets[word])
+
+        # One pass over the text, in C
+        hits = compress(count(), map(offsets.__contains__, self.words))
+        positions = defaultdict(list)
+        for i in hits:
+            positions[self.words[i]].append(i)
+        if not positions:
+            return []
+
+        # Very common words can't place a match, unless there's nothing else
+        rarest = min(len(found) for found in positions.values())
+        limit = max(max_word_occurrences, rarest)
+
+        votes = defaultdict(float)
+        last_start = max(len(self.words) - len(phrase_words), 0)
+        for word, found in positions.items():
+            if len(found) > limit:
+                continue
+            weight = 1 / len(found)
+            for j in offsets[word]:
+                for i in found:
+                    votes[min(max(i - j, 0), last_start)] += weight
+
+        # Nearby starts vote for the same region, so sum them up per bucket
+        bucket_size = max(len(phrase_words) // 4, 1)
+        buckets = defaultdict(float)
+        best_start = {}
+        for start, vote in votes.items():
+            bucket = start // bucket_size
+            buckets[bucket] += vote
+            if vote > votes.get(best_start.get(bucket), 0):
+                best_start[bucket] = start
+
+        top = sorted(buckets, key=buckets.get, reverse=True)[:regions]
+        return [best_start[bucket] for bucket in top]
+
+    def _similar_words(self, word):
+        # Words of the text that start or end like `word`, for difflib to compare
+        if self._affixes is None:
+            self._affixes = defaultdict(list)
+            for known in self._vocabulary:
+                self._affixes["<" + known[:2]].append(known)
+                self._affixes[known[-2:] + ">"].append(known)
+        return set(self._affixes["<" + word[:2]]) | set(self._affixes[word[-2:] + ">"])
@@ -0,0 +1,232 @@
+import ast
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+# Kernel code that runs a skill file the first time one of its functions is called
+loader_code = """
+def _load_skill(path):
+    with open(path, "r") as f:
+        exec(compile(f.read(), path, "exec"), globals())
+"""
+
+stub_code = """
+def {name}(*args, **kwargs):
+    {docstring}
+    _load_skill({path!r})
+    skill = globals()[{name!r}]
+    if getattr(skill, "_skill_stub", False):
+        raise NameError("{name} isn't defined by " + {path!r})
+    return skill(*args, **kwargs)
+{name}._skill_stub = True
+"""
+
+# Bumped when entries change shape, so older indexes are parsed again
+index_version = 2
+
+
+def words(text):
+    """
+    Lowercase words of a text, with snake_case and camelCase names split into
+    their parts.
+    """
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class SkillIndex:
+    """
+    What's in each skill file (its functions' signatures and docstrings, and whether
+    it does anything else when run), extracted with `ast` and saved as JSON next to
+    the skills directory. A file is only parsed again when its modification time or
+    size change, and its content hash with them.
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or os.path.join(
+            os.path.dirname(os.path.abspath(path)),
+            os.path.basename(os.path.normpath(path)) + "_index.json",
+        )
+        self.skills = None  # file name -> entry, once loaded
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.parsed = 0
+
+    def refresh(self):
+        """
+        Brings the index up to date with the skills directory, and saves it if
+        anything changed. Returns the entries, by file name.
+        """
+        with self._lock:
+            if self.skills is None:
+                self.skills = self._load()
+
+            try:
+                files = [
+                    entry
+                    for entry in os.scandir(self.path)
+                    if entry.name.endswith(".py") and entry.is_file()
+                ]
+            except FileNotFoundError:
+                files = []
+
+            changed = False
+            skills = {}
+            for entry in files:
+                stat = entry.stat()
+                skill = self.skills.get(entry.name)
+                if (
+                    skill is None
+                    or skill["mtime_ns"] != stat.st_mtime_ns
+                    or skill["size"] != stat.st_size
+                ):
+                    skill = self._parse(entry.path, stat, skill)
+                    changed = True
+                skills[entry.name] = skill
+            changed = changed or skills.keys() != self.skills.keys()
+
+            self.skills = skills
+            if changed:
+                self._save()
+            return skills
+
+    def functions(self):
+        """
+        Every function defined by a skill, as dicts with "name", "signature",
+        "docstring", "path" and "line".
+        """
+        return [
+            dict(function, path=os.path.join(self.path, file_name))
+            for file_name, skill in sorted(self.refresh().items())
+            for function in skill["functions"]
+        ]
+
+    def search(self, query, n=10):
+        """
+        The functions that best match a query, best first. Words in a function's name
+        count three times as much as words in its docstring, and rare words more than
+        common ones.
+        """
+        functions = self.functions()
+        query_words = set(words(query))
+        if not query_words:
+            return functions[:n]
+
+        documents = [
+            Counter(words(function["name"]) * 3 + words(function["docstring"]))
+            for function in functions
+        ]
+        frequency = Counter(word for document in documents for word in set(document))
+
+        scored = []
+        for function, document in zip(functions, documents):
+            length = sum(document.values()) or 1
+            score = sum(
+                math.log(1 + len(documents) / frequency[word])
+                * document[word]
+                / (document[word] + 0.5 + length / 20)
+                for word in query_words
+                if word in document
+            )
+            if score > 0:
+                scored.append((-score, function["name"], function))
+        return [function for _, _, function in sorted(scored, key=lambda s: s[:2])[:n]]
+
+    def stub_code(self):
+        """
+        Code that, run in the kernel, defines a small stub for every skill function.
+        A stub runs its skill's file the first time it's called, which replaces it with
+        the real function. Files that define anything besides functions and imports
+        (classes, constants, other statements) are run right away instead, so those
+        names exist like they did before skills were loaded lazily. Returns (code,
+        paths of files that couldn't be parsed).
+        """
+        skills = self.refresh()
+        code = [loader_code]
+        broken = []
+        for file_name, skill in sorted(skills.items()):
+            path = os.path.join(self.path, file_name)
+            if skill["error"]:
+                broken.append(path)
+            elif skill["eager"] or not skill["functions"]:
+                code.append(f"_load_skill({path!r})\n")
+                continue
+            for function in skill["functions"]:
+                docstring = f"{function['name']}{function['signature']}"
+                if function["docstring"]:
+                    docstring += "\n\n" + function["docstring"]
+                code.append(
+                    stub_code.format(
+                        name=function["name"], docstring=repr(docstring), path=path
+                    )
+                )
+        return "".join(code), broken
+
+    def _parse(self, path, stat, previous):
+        with open(path, "rb") as f:
+            content = f.read()
+        content_hash = hashlib.sha256(content).hexdigest()
+        skill = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "hash": content_hash,
+        }
+
+        if previous is not None and previous["hash"] == content_hash:
+            return dict(previous, **skill)  # Touched, not changed
+
+        self.parsed += 1
+        try:
+            tree = ast.parse(content, filename=path)
+        except (SyntaxError, ValueError) as e:
+            return dict(skill, functions=[], eager=False, error=str(e))
+
+        functions = {}  # The last definition of a name wins, like it would when run
+        eager = False  # Whether running it does more than define functions
+        for i, node in enumerate(tree.body):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                functions[node.name] = {
+                    "name": node.name,
+                    "signature": f"({ast.unparse(node.args)})",
+                    "docstring": ast.get_docstring(node) or "",
+                    "line": node.lineno,
+                }
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                pass
+            elif not (i == 0 and isinstance(node, ast.Expr)):  # Not a docstring
+                eager = True
+        return dict(skill, functions=list(functions.values()), eager=eager, error=None)
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r") as f:
+                saved = json.load(f)
+            if saved.get("version") != index_version:
+                return {}
+            if saved["path"] == os.path.abspath(self.path):
+                return saved["skills"]
+        except:
+            pass
+        return {}
+
+    def _save(self):
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(
+                    {
+                        "version": index_version,
+                        "path": os.path.abspath(self.path),
+                        "skills": self.skills,
+                    },
+                    f,
+                )
+            os.replace(temp_path, self.index_path)
+        except:
+            pass  # It's only an index
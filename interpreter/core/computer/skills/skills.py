@@ -1,4 +1,3 @@
-import glob
 import inspect
 import json
 import os
@@ -9,6 +8,7 @@ from pathlib import Path
 from ....terminal_interface.utils.oi_dir import oi_dir
 from ...utils.lazy_import import lazy_import
 from ..utils.recipient_utils import format_to_recipient
+from .skill_index import SkillIndex
 
 # Lazy import, imported when needed to speed up start time
 aifs = lazy_import("aifs")
@@ -25,6 +25,14 @@ class Skills:
         self.computer = computer
         self.path = str(Path(oi_dir) / "skills")
         self.new_skill = NewSkill(self)
+        self._index = None
+
+    @property
+    def index(self):
+        # Follows self.path, which can be changed after startup
+        if self._index is None or self._index.path != self.path:
+            self._index = SkillIndex(self.path)
+        return self._index
 
     def list(self):
         return [
@@ -38,37 +46,40 @@ class Skills:
             "To run a skill, run its name as a function name (it is already imported)."
         )
 
-    def search(self, query):
+    def search(self, query, n=10):
         """
-        This just lists all for now.
+        Returns the skills that best match the query, best first, with their
+        signatures and the first line of their docstrings.
         """
-        return [
-            file.replace(".py", "()")
-            for file in os.listdir(self.path)
-            if file.endswith(".py")
-        ]
+        results = []
+        for function in self.index.search(query, n):
+            result = function["name"] + function["signature"]
+            summary = function["docstring"].strip().split("\n")[0]
+            if summary:
+                result += " - " + summary
+            results.append(result)
+        return results
 
     def import_skills(self):
+        """
+        Makes every skill callable in the kernel. Only a stub of each skill function is
+        defined now, from the skill index; its file runs the first time it's called.
+        """
         previous_save_skills_setting = self.computer.save_skills
 
         self.computer.save_skills = False
 
         # Make sure it's not over 100mb
-        total_size = 0
-        for path, dirs, files in os.walk(self.path):
-            for f in files:
-                fp = os.path.join(path, f)
-                total_size += os.path.getsize(fp)
+        total_size = sum(skill["size"] for skill in self.index.refresh().values())
         total_size = total_size / (1024 * 1024)  # convert bytes to megabytes
         if total_size > 100:
             raise Warning(
                 f"Skills at path {self.path} can't exceed 100mb. Try deleting some."
             )
 
-        code_to_run = ""
-        for file in glob.glob(os.path.join(self.path, "*.py")):
-            with open(file, "r") as f:
-                code_to_run += f.read() + "\n"
+        code_to_run, broken = self.index.stub_code()
+        for file in broken:
+            print(f"Skill at {file} might be broken— it can't be parsed.")
 
         if self.computer.interpreter.debug:
             print("IMPORTING SKILLS:\n", code_to_run)
@@ -76,21 +87,10 @@ class Skills:
         output = self.computer.run("python", code_to_run)
 
         if "traceback" in str(output).lower():
-            # Import them individually
-            for file in glob.glob(os.path.join(self.path, "*.py")):
-                with open(file, "r") as f:
-                    code_to_run = f.read() + "\n"
-
-                if self.computer.interpreter.debug:
-                    print(self.path)
-                    print("IMPORTING SKILL:\n", code_to_run)
-
-                output = self.computer.run("python", code_to_run)
-
-                if "traceback" in str(output).lower():
-                    print(
-                        f"Skill at {file} might be broken— it produces a traceback when run."
-                    )
+            print(
+                f"Skills at {self.path} might be broken— "
+                "importing them produced a traceback."
+            )
 
         self.computer.save_skills = previous_save_skills_setting
 
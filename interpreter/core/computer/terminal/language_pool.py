@@ -0,0 +1,145 @@
+import atexit
+import threading
+import time
+import traceback
+
+
+class LanguagePool:
+    """
+    Keeps pre-started language instances (Jupyter kernels, shell processes...) ready,
+    so the first run of a language, and the first run after a reset, don't wait for startup.
+
+    Whenever a warm instance is handed out, a replacement is started in the background.
+    """
+
+    def __init__(self, terminal):
+        self.terminal = terminal
+
+        # Settings
+        self.languages = ["python"]  # Which languages to keep warm
+        self.size = 1  # Warm instances to keep per language
+
+        self._warm = {}  # language class -> [ready instances]
+        self._spawning = {}  # language class -> number being started
+        self._lock = threading.Lock()
+        self._started = False
+        self._shut_down = False
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.spawns = 0
+        self.spawn_failures = 0
+        self.total_spawn_time = 0.0
+        self.last_spawn_time = None
+
+    def start(self, languages=None):
+        """
+        Starts warming up instances of `languages` (or self.languages) in the background.
+        """
+        if languages is not None:
+            self.languages = languages
+        if not self._started:
+            self._started = True
+            self._shut_down = False
+            atexit.register(self.shutdown)
+        for name in self.languages:
+            lang_class = self.terminal.get_language(name)
+            if lang_class is not None:
+                self._refill(lang_class)
+
+    def acquire(self, lang_class):
+        """
+        Returns a ready instance of lang_class if we have one, or None.
+        """
+        if not self._started or not self._is_pooled(lang_class):
+            return None
+
+        with self._lock:
+            instances = self._warm.get(lang_class)
+            instance = instances.pop(0) if instances else None
+            if instance is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        # Start its replacement
+        self._refill(lang_class)
+        return instance
+
+    def stats(self):
+        with self._lock:
+            warm = {lang_class.name: len(i) for lang_class, i in self._warm.items()}
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "spawns": self.spawns,
+            "spawn_failures": self.spawn_failures,
+            "average_spawn_time": self.total_spawn_time / self.spawns
+            if self.spawns
+            else None,
+            "last_spawn_time": self.last_spawn_time,
+            "warm": warm,
+        }
+
+    def shutdown(self):
+        """
+        Terminates every warm instance and stops starting new ones.
+        """
+        with self._lock:
+            self._shut_down = True
+            instances = [i for warm in self._warm.values() for i in warm]
+            self._warm = {}
+        for instance in instances:
+            try:
+                instance.terminate()
+            except:
+                pass
+
+    def _is_pooled(self, lang_class):
+        return any(
+            self.terminal.get_language(name) is lang_class for name in self.languages
+        )
+
+    def _refill(self, lang_class):
+        with self._lock:
+            if self._shut_down:
+                return
+            missing = (
+                self.size
+                - len(self._warm.get(lang_class, []))
+                - self._spawning.get(lang_class, 0)
+            )
+            if missing <= 0:
+                return
+            self._spawning[lang_class] = self._spawning.get(lang_class, 0) + missing
+
+        for _ in range(missing):
+            # Not a daemon, so we never exit halfway through starting a kernel (and orphan it).
+            # shutdown() runs at exit, after these finish, and cleans them up.
+            threading.Thread(target=self._spawn, args=(lang_class,)).start()
+
+    def _spawn(self, lang_class):
+        start = time.time()
+        try:
+            instance = self.terminal._create_language(lang_class, start=True)
+        except:
+            with self._lock:
+                self._spawning[lang_class] -= 1
+                self.spawn_failures += 1
+            if self.terminal.computer.verbose:
+                print(f"Failed to warm up {lang_class.name}:\n{traceback.format_exc()}")
+            return
+
+        spawn_time = time.time() - start
+        with self._lock:
+            self._spawning[lang_class] -= 1
+            self.spawns += 1
+            self.total_spawn_time += spawn_time
+            self.last_spawn_time = spawn_time
+            if not self._shut_down:
+                self._warm.setdefault(lang_class, []).append(instance)
+                return
+
+        # We shut down while this was starting
+        instance.terminate()
@@ -1,9 +1,7 @@
 import os
-import queue
 import re
 import subprocess
 import threading
-import time
 import traceback
 from .subprocess_language import SubprocessLanguage
 
@@ -31,6 +29,8 @@ class Java(SubprocessLanguage):
         return "##end_of_execution##" in line
 
     def run(self, code):
+        self.done.clear()
+        self.discard_stale_end_markers()
         try:
             # Extract the class name from the code
             match = re.search(r'class\s+(\w+)', code)
@@ -93,23 +93,12 @@ class Java(SubprocessLanguage):
             stderr_thread.join()
 
             run_process.wait()
-            self.done.set()
-
-            while True:
-                if not self.output_queue.empty():
-                    yield self.output_queue.get()
-                else:
-                    time.sleep(0.1)
-                try:
-                    output = self.output_queue.get(timeout=0.3)
-                    yield output
-                except queue.Empty:
-                    if self.done.is_set():
-                        for _ in range(3):
-                            if not self.output_queue.empty():
-                                yield self.output_queue.get()
-                            time.sleep(0.2)
-                        break
+
+            # Both streams have been read to the end, so nothing can arrive after this
+            if not self.done.is_set():
+                self.signal_end_of_execution()
+
+            yield from self.stream_output()
 
         except Exception as e:
             yield {
@@ -1,13 +1,18 @@
+import codecs
 import os
 import queue
 import re
+import select
+import selectors
 import subprocess
 import threading
-import time
 import traceback
 
 from ..base_language import BaseLanguage
 
+# Put on the output queue once the code has finished running
+end_of_execution = object()
+
 
 class SubprocessLanguage(BaseLanguage):
     def __init__(self):
@@ -16,6 +21,14 @@ class SubprocessLanguage(BaseLanguage):
         self.verbose = False
         self.output_queue = queue.Queue()
         self.done = threading.Event()
+        self._stop_pump = None
+
+        # Selectors don't work on pipes on Windows, so there we fall back to a reader thread per stream
+        self.use_selector = os.name != "nt"
+
+        # Without a selector, stderr is read on its own thread and might lag behind
+        # the end of execution marker on stdout. Wait this long for stragglers.
+        self.straggler_timeout = 0.05
 
     def detect_active_line(self, line):
         return None
@@ -36,6 +49,8 @@ class SubprocessLanguage(BaseLanguage):
         return code
 
     def terminate(self):
+        if self._stop_pump:
+            self._stop_pump.set()
         if self.process:
             self.process.terminate()
             self.process.stdin.close()
@@ -59,16 +74,24 @@ class SubprocessLanguage(BaseLanguage):
             encoding="utf-8",
             errors="replace",
         )
-        threading.Thread(
-            target=self.handle_stream_output,
-            args=(self.process.stdout, False),
-            daemon=True,
-        ).start()
-        threading.Thread(
-            target=self.handle_stream_output,
-            args=(self.process.stderr, True),
-            daemon=True,
-        ).start()
+        if self.use_selector:
+            self._stop_pump = threading.Event()
+            threading.Thread(
+                target=self.pump_output,
+                args=(self.process, self._stop_pump),
+                daemon=True,
+            ).start()
+        else:
+            threading.Thread(
+                target=self.handle_stream_output,
+                args=(self.process.stdout, False),
+                daemon=True,
+            ).start()
+            threading.Thread(
+                target=self.handle_stream_output,
+                args=(self.process.stderr, True),
+                daemon=True,
+            ).start()
 
     def run(self, code):
         retry_count = 0
@@ -77,7 +100,8 @@ class SubprocessLanguage(BaseLanguage):
         # Setup
         try:
             code = self.preprocess_code(code)
-            if not self.process:
+            if not self.process or self.process.poll() is not None:
+                # Not started yet, or it exited (e.g. the code ran `exit`)
                 self.start_process()
         except:
             yield {
@@ -92,6 +116,7 @@ class SubprocessLanguage(BaseLanguage):
                 print(f"(after processing) Running processed code:\n{code}\n---")
 
             self.done.clear()
+            self.discard_stale_end_markers()
 
             try:
                 self.process.stdin.write(code + "\n")
@@ -119,75 +144,215 @@ class SubprocessLanguage(BaseLanguage):
                     }
                     return
 
+        yield from self.stream_output()
+
+    def stream_output(self):
+        """
+        Yields output from the queue as soon as it arrives, until the end of execution.
+        Output lines that arrived together are batched into a single message.
+        """
+        finished = False
+        while not finished:
+            try:
+                # The timeout only keeps this interruptible. Output wakes us immediately.
+                chunks = [self.output_queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            while True:
+                try:
+                    chunks.append(self.output_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if end_of_execution in chunks and not self.use_selector:
+                # Give stderr's reader thread a moment to catch up
+                while True:
+                    try:
+                        chunks.append(
+                            self.output_queue.get(timeout=self.straggler_timeout)
+                        )
+                    except queue.Empty:
+                        break
+
+            batch = None
+            for chunk in chunks:
+                if chunk is end_of_execution:
+                    finished = True
+                    continue
+                if (
+                    batch is not None
+                    and chunk.get("format") == "output"
+                    and batch.get("format") == "output"
+                ):
+                    batch["content"] += chunk["content"]
+                    continue
+                if batch is not None:
+                    yield batch
+                batch = dict(chunk)
+            if batch is not None:
+                yield batch
+
+    def discard_stale_end_markers(self):
+        """
+        Drops end of execution markers left over from a previous run,
+        but keeps any output that's still waiting to be read.
+        """
+        leftovers = []
         while True:
-            if not self.output_queue.empty():
-                yield self.output_queue.get()
-            else:
-                time.sleep(0.1)
             try:
-                output = self.output_queue.get(timeout=0.3)  # Waits for 0.3 seconds
-                yield output
+                chunk = self.output_queue.get_nowait()
             except queue.Empty:
-                if self.done.is_set():
-                    # Try to yank 3 more times from it... maybe there's something in there...
-                    # (I don't know if this actually helps. Maybe we just need to yank 1 more time)
-                    for _ in range(3):
-                        if not self.output_queue.empty():
-                            yield self.output_queue.get()
-                        time.sleep(0.2)
+                break
+            if chunk is not end_of_execution:
+                leftovers.append(chunk)
+        for chunk in leftovers:
+            self.output_queue.put(chunk)
+
+    def signal_end_of_execution(self):
+        self.done.set()
+        self.output_queue.put(end_of_execution)
+
+    def pump_output(self, process, stop_event):
+        """
+        Reads stdout and stderr on one thread, waking as soon as either has data.
+
+        Because both streams are read here, any stderr output the code produced before
+        the end of execution marker can be collected before we signal that it's done.
+        """
+        stdout_fd = process.stdout.fileno()
+        stderr_fd = process.stderr.fileno()
+        streams = {stdout_fd: False, stderr_fd: True}  # fd -> is_error_stream
+        decoders = {
+            fd: codecs.getincrementaldecoder("utf-8")(errors="replace")
+            for fd in streams
+        }
+        buffers = {fd: "" for fd in streams}
+
+        def read(fd):
+            # Reads whatever is available and handles any complete lines. Returns False at EOF.
+            try:
+                data = os.read(fd, 65536)
+            except BlockingIOError:
+                # Already drained (stderr is also read when stdout finishes)
+                return True
+            buffers[fd] += decoders[fd].decode(data, final=not data)
+            *lines, buffers[fd] = buffers[fd].split("\n")
+            lines = [line + "\n" for line in lines]
+            if not data and buffers[fd]:
+                lines.append(buffers[fd])
+                buffers[fd] = ""
+
+            ended = False
+            for line in lines:
+                if self.handle_line(line, streams[fd]):
+                    ended = True
+            if ended:
+                # Collect whatever stderr has ready before saying we're done
+                while (
+                    fd != stderr_fd
+                    and stderr_fd in open_fds
+                    and select.select([stderr_fd], [], [], 0)[0]
+                    and read(stderr_fd)
+                ):
+                    pass
+                self.signal_end_of_execution()
+
+            if not data:
+                selector.unregister(fd)
+                open_fds.discard(fd)
+            return bool(data)
+
+        selector = selectors.DefaultSelector()
+        open_fds = set(streams)
+        try:
+            for fd in streams:
+                os.set_blocking(fd, False)
+                selector.register(fd, selectors.EVENT_READ)
+
+            while open_fds and not stop_event.is_set():
+                # The timeout only lets us notice stop_event. Data wakes us immediately.
+                for key, _ in selector.select(timeout=0.5):
+                    if stop_event.is_set():
+                        break
+                    if key.fd in open_fds:
+                        read(key.fd)
+
+                if stdout_fd not in open_fds:
+                    # The process exited (or closed stdout) without finishing normally.
+                    # Let it finish exiting, so the next run() sees it's gone and restarts it.
+                    try:
+                        process.wait(timeout=1)
+                    except subprocess.TimeoutExpired:
+                        pass
+                    if not self.done.is_set():
+                        self.signal_end_of_execution()
                     break
+        except (OSError, ValueError):
+            # The pipes were closed under us, e.g. by terminate()
+            if self.verbose:
+                print("Stream closed while reading.")
+        finally:
+            selector.close()
 
     def handle_stream_output(self, stream, is_error_stream):
         try:
             for line in iter(stream.readline, ""):
-                if self.verbose:
-                    print(f"Received output line:\n{line}\n---")
-
-                line = self.line_postprocessor(line)
-
-                if line is None:
-                    continue  # `line = None` is the postprocessor's signal to discard completely
-
-                if self.detect_active_line(line):
-                    active_line = self.detect_active_line(line)
-                    self.output_queue.put(
-                        {
-                            "type": "console",
-                            "format": "active_line",
-                            "content": active_line,
-                        }
-                    )
-                    # Sometimes there's a little extra on the same line, so be sure to send that out
-                    line = re.sub(r"##active_line\d+##", "", line)
-                    if line:
-                        self.output_queue.put(
-                            {"type": "console", "format": "output", "content": line}
-                        )
-                elif self.detect_end_of_execution(line):
-                    # Sometimes there's a little extra on the same line, so be sure to send that out
-                    line = line.replace("##end_of_execution##", "").strip()
-                    if line:
-                        self.output_queue.put(
-                            {"type": "console", "format": "output", "content": line}
-                        )
-                    self.done.set()
-                elif is_error_stream and "KeyboardInterrupt" in line:
-                    self.output_queue.put(
-                        {
-                            "type": "console",
-                            "format": "output",
-                            "content": "KeyboardInterrupt",
-                        }
-                    )
-                    time.sleep(0.1)
-                    self.done.set()
-                else:
-                    self.output_queue.put(
-                        {"type": "console", "format": "output", "content": line}
-                    )
+                if self.handle_line(line, is_error_stream):
+                    self.signal_end_of_execution()
         except ValueError as e:
             if "operation on closed file" in str(e):
                 if self.verbose:
                     print("Stream closed while reading.")
             else:
                 raise e
+
+    def handle_line(self, line, is_error_stream):
+        """
+        Puts a line of output on the queue. Returns True if it marks the end of execution.
+        """
+        if self.verbose:
+            print(f"Received output line:\n{line}\n---")
+
+        line = self.line_postprocessor(line)
+
+        if line is None:
+            return False  # `line = None` is the postprocessor's signal to discard completely
+
+        if self.detect_active_line(line):
+            active_line = self.detect_active_line(line)
+            self.output_queue.put(
+                {
+                    "type": "console",
+                    "format": "active_line",
+                    "content": active_line,
+                }
+            )
+            # Sometimes there's a little extra on the same line, so be sure to send that out
+            line = re.sub(r"##active_line\d+##", "", line)
+            if line:
+                self.output_queue.put(
+                    {"type": "console", "format": "output", "content": line}
+                )
+        elif self.detect_end_of_execution(line):
+            # Sometimes there's a little extra on the same line, so be sure to send that out
+            line = line.replace("##end_of_execution##", "").strip()
+            if line:
+                self.output_queue.put(
+                    {"type": "console", "format": "output", "content": line}
+                )
+            return True
+        elif is_error_stream and "KeyboardInterrupt" in line:
+            self.output_queue.put(
+                {
+                    "type": "console",
+                    "format": "output",
+                    "content": "KeyboardInterrupt",
+                }
+            )
+            return True
+        else:
+            self.output_queue.put(
+                {"type": "console", "format": "output", "content": line}
+            )
+        return False
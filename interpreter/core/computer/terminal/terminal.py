@@ -3,6 +3,7 @@ import os
 import time
 
 from ..utils.recipient_utils import parse_for_recipient
+from .language_pool import LanguagePool
 from .languages.applescript import AppleScript
 from .languages.html import HTML
 from .languages.java import Java
@@ -45,6 +46,9 @@ class Terminal:
         ]
         self._active_languages = {}
 
+        # Pre-started languages. Call warm_pool.start() to begin warming them up.
+        self.warm_pool = LanguagePool(self)
+
     def get_language(self, language):
         for lang in self.languages:
             if language.lower() == lang.name.lower() or (
@@ -122,13 +126,11 @@ class Terminal:
 
     def _streaming_run(self, language, code, display=False):
         if language not in self._active_languages:
-            # Get the language. Pass in self.computer *if it takes a single argument*
-            # but pass in nothing if not. This makes custom languages easier to add / understand.
             lang_class = self.get_language(language)
-            if lang_class.__init__.__code__.co_argcount > 1:
-                self._active_languages[language] = lang_class(self.computer)
-            else:
-                self._active_languages[language] = lang_class()
+            instance = self.warm_pool.acquire(lang_class)
+            if instance is None:
+                instance = self._create_language(lang_class)
+            self._active_languages[language] = instance
         try:
             for chunk in self._active_languages[language].run(code):
                 # self.format_to_recipient can format some messages as having a certain recipient.
@@ -160,6 +162,20 @@ class Terminal:
         except GeneratorExit:
             self.stop()
 
+    def _create_language(self, lang_class, start=False):
+        # Pass in self.computer *if it takes a single argument*
+        # but pass in nothing if not. This makes custom languages easier to add / understand.
+        if lang_class.__init__.__code__.co_argcount > 1:
+            instance = lang_class(self.computer)
+        else:
+            instance = lang_class()
+
+        # Subprocess languages start their process on first run. Do it now instead.
+        if start and getattr(instance, "start_cmd", None):
+            instance.start_process()
+
+        return instance
+
     def stop(self):
         for language in self._active_languages.values():
             language.stop()
@@ -51,21 +51,65 @@ def pytesseract_get_text_bounding_boxes(img):
     return boxes
 
 
-def find_text_in_image(img, text, debug=False):
+def pytesseract_get_words(img):
+    """
+    Like pytesseract_get_text_bounding_boxes, but only the boxes that hold a word
+    (not the page, block and line boxes around them).
+    """
+    return [
+        box for box in pytesseract_get_text_bounding_boxes(img) if box["text"].strip()
+    ]
+
+
+def words_to_text(words):
+    """
+    Joins word boxes back into text: words on the same line left to right, lines top to bottom.
+    """
+    lines = []
+    for word in sorted(words, key=lambda word: word["top"]):
+        middle = word["top"] + word["height"] / 2
+        for line in lines:
+            if line["top"] <= middle <= line["bottom"]:
+                line["words"].append(word)
+                break
+        else:
+            lines.append(
+                {
+                    "top": word["top"],
+                    "bottom": word["top"] + word["height"],
+                    "words": [word],
+                }
+            )
+    return "\n".join(
+        " ".join(
+            word["text"] for word in sorted(line["words"], key=lambda w: w["left"])
+        )
+        for line in lines
+    )
+
+
+def find_text_in_image(img, text, debug=False, words=None):
     # Convert PIL Image to NumPy array
     img_array = np.array(img)
 
     # Convert the image to grayscale
     gray = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
 
-    # Use pytesseract to get the data from the image
-    d = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT)
+    if words is None:
+        # Use pytesseract to get the data from the image
+        d = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT)
+    else:
+        # Word boxes that were already found (see FramePipeline)
+        d = {
+            key: [word[key] for word in words]
+            for key in ["text", "left", "top", "width", "height"]
+        }
 
     # Initialize an empty list to store the centers of the bounding boxes
     centers = []
 
     # Get the number of detected boxes
-    n_boxes = len(d["level"])
+    n_boxes = len(d["text"])
 
     # Create a copy of the grayscale image to draw on
     img_draw = np.array(gray.copy())
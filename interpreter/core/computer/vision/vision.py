@@ -1,17 +1,35 @@
 import base64
 import contextlib
+import hashlib
 import io
 import os
-import tempfile
+import threading
+from collections import OrderedDict
 
 from PIL import Image
 
 from ...utils.lazy_import import lazy_import
 from ..utils.computer_vision import pytesseract_get_text
 
+np = lazy_import("numpy")
+
 # transformers = lazy_import("transformers") # Doesn't work for some reason! We import it later.
 
 
+def quiet():
+    # Silences the models' printing. stdout is shared by every thread, so this is skipped
+    # off the main thread, where it would also silence whatever the main thread prints
+    if threading.current_thread() is threading.main_thread():
+        return contextlib.redirect_stdout(open(os.devnull, "w"))
+    return contextlib.nullcontext()
+
+
+def quiet_stderr():
+    if threading.current_thread() is threading.main_thread():
+        return contextlib.redirect_stderr(open(os.devnull, "w"))
+    return contextlib.nullcontext()
+
+
 class Vision:
     def __init__(self, computer):
         self.computer = computer
@@ -19,12 +37,16 @@ class Vision:
         self.tokenizer = None  # Will load upon first use
         self.easyocr = None
 
+        # OCR results, by image content
+        self.ocr_cache_size = 256
+        self._ocr_cache = OrderedDict()
+        self._ocr_lock = threading.Lock()
+        self._load_lock = threading.Lock()  # Images may be described on worker threads
+
     def load(self, load_moondream=True, load_easyocr=True):
         # print("Loading vision models (Moondream, EasyOCR)...\n")
 
-        with contextlib.redirect_stdout(
-            open(os.devnull, "w")
-        ), contextlib.redirect_stderr(open(os.devnull, "w")):
+        with self._load_lock, quiet(), quiet_stderr():
             if self.easyocr == None and load_easyocr:
                 import easyocr
 
@@ -62,63 +84,112 @@ class Vision:
         path=None,
         lmc=None,
         pil_image=None,
+        image=None,
     ):
         """
-        Gets OCR of image.
+        Gets OCR of image. `image` can also be a NumPy array (BGR, like OpenCV's), or the
+        bytes of an image file.
         """
 
         if lmc:
             if "base64" in lmc["format"]:
-                # # Extract the extension from the format, default to 'png' if not specified
-                # if "." in lmc["format"]:
-                #     extension = lmc["format"].split(".")[-1]
-                # else:
-                #     extension = "png"
-                # Save the base64 content as a temporary file
-                img_data = base64.b64decode(lmc["content"])
-                with tempfile.NamedTemporaryFile(
-                    delete=False, suffix=".png"
-                ) as temp_file:
-                    temp_file.write(img_data)
-                    temp_file_path = temp_file.name
-
-                # Set path to the path of the temporary file
-                path = temp_file_path
-
+                image = base64.b64decode(lmc["content"])
             elif lmc["format"] == "path":
-                # Convert to base64
-                path = lmc["content"]
+                image = lmc["content"]
         elif base_64:
-            # Save the base64 content as a temporary file
-            img_data = base64.b64decode(base_64)
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_file:
-                temp_file.write(img_data)
-                temp_file_path = temp_file.name
-
-            # Set path to the path of the temporary file
-            path = temp_file_path
+            image = base64.b64decode(base_64)
         elif path:
-            pass
+            image = path
         elif pil_image:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_file:
-                pil_image.save(temp_file, format="PNG")
-                temp_file_path = temp_file.name
-
-            # Set path to the path of the temporary file
-            path = temp_file_path
+            image = pil_image
 
         try:
-            if not self.easyocr:
-                self.load(load_moondream=False)
-            result = self.easyocr.readtext(path)
-            text = " ".join([item[1] for item in result])
-            return text.strip()
+            return self.ocr_many([image])[0]
         except ImportError:
             print(
                 "\nTo use local vision, run `pip install 'open-interpreter[local]'`.\n"
             )
             return ""
 
+    def ocr_many(self, images):
+        """
+        Gets OCR of several images at once (paths, bytes of image files, PIL images or
+        NumPy arrays, which are read as BGR like OpenCV's). Images with the same size are
+        read in one batch. Results are cached by image content.
+        """
+        keys = []
+        decoded = {}
+        for image in images:
+            key, array = self._ocr_key(image)
+            keys.append(key)
+            if array is not None:
+                decoded[key] = array
+
+        with self._ocr_lock:
+            results = {
+                key: self._ocr_cache[key] for key in keys if key in self._ocr_cache
+            }
+            for key in results:
+                self._ocr_cache.move_to_end(key)
+
+        missing = {}
+        for key, image in zip(keys, images):
+            if key not in results and key not in missing:
+                missing[key] = (
+                    decoded[key] if key in decoded else self._ocr_array(image)
+                )
+
+        if missing:
+            if not self.easyocr:
+                self.load(load_moondream=False)
+
+            # Group same-sized images, so each group is one batch
+            batches = {}
+            for key, array in missing.items():
+                batches.setdefault(array.shape, []).append(key)
+
+            with self._ocr_lock:
+                for batch in batches.values():
+                    arrays = [missing[key] for key in batch]
+                    if len(arrays) > 1 and hasattr(self.easyocr, "readtext_batched"):
+                        readings = self.easyocr.readtext_batched(arrays)
+                    else:
+                        readings = [self.easyocr.readtext(array) for array in arrays]
+                    for key, reading in zip(batch, readings):
+                        text = " ".join([item[1] for item in reading]).strip()
+                        results[key] = text
+                        self._ocr_cache[key] = text
+
+                while len(self._ocr_cache) > self.ocr_cache_size:
+                    self._ocr_cache.popitem(last=False)
+
+        return [results[key] for key in keys]
+
+    def _ocr_key(self, image):
+        """
+        Returns (cache key, decoded array or None). Hashes the file's bytes if we have them
+        (cheaper than decoding), otherwise the pixels.
+        """
+        if isinstance(image, str):
+            with open(image, "rb") as f:
+                image = f.read()
+        if isinstance(image, (bytes, bytearray)):
+            return "file:" + hashlib.sha256(image).hexdigest(), None
+        array = self._ocr_array(image)
+        pixels = str(array.shape).encode() + np.ascontiguousarray(array).tobytes()
+        return "pixels:" + hashlib.sha256(pixels).hexdigest(), array
+
+    def _ocr_array(self, image):
+        # Decode in memory. EasyOCR reads arrays directly, so nothing touches the disk.
+        # It takes color arrays to be BGR, like OpenCV (and the files it reads) does
+        if isinstance(image, np.ndarray):
+            return image
+        if isinstance(image, str):
+            image = Image.open(image)
+        elif isinstance(image, (bytes, bytearray)):
+            image = Image.open(io.BytesIO(image))
+        return np.ascontiguousarray(np.asarray(image.convert("RGB"))[..., ::-1])
+
     def query(
         self,
         query="Describe this image. Also tell me what text is in the image, if any.",
@@ -139,7 +210,7 @@ class Vision:
                     "\nTo use local vision, run `pip install 'open-interpreter[local]'`.\n"
                 )
                 return ""
-            if not success:
+            if not success and self.model == None:
                 return ""
 
         if lmc:
@@ -166,7 +237,7 @@ class Vision:
         elif pil_image:
             img = pil_image
 
-        with contextlib.redirect_stdout(open(os.devnull, "w")):
+        with quiet():
             enc_image = self.model.encode_image(img)
             answer = self.model.answer_question(
                 enc_image, query, self.tokenizer, max_length=400
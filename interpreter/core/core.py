@@ -27,6 +27,7 @@ from interpreter.terminal_interface.utils.oi_dir import oi_dir
 from interpreter.core.computer.computer import Computer
 from interpreter.core.default_system_message import default_system_message
 from interpreter.core.llm.llm import Llm
+from interpreter.core.render_message import RenderCache
 from interpreter.core.respond import respond
 from interpreter.core.utils.telemetry import send_telemetry
 from interpreter.core.utils.truncate_output import truncate_output
@@ -128,6 +129,7 @@ class OpenInterpreter:
         self.task_assignment_system = None
         self.lead_agent = None
         self.current_project = None
+        self.render_cache = RenderCache()  # Outputs of `# cache` blocks in the system message
 
     def initialize_openrouter_client(self):
         with app.app_context():
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class KnowledgeStore:
+    """
+    Knowledge shared by every agent, in an append-only SQLite file. Each piece of content is
+    stored once, under its hash, and agents only store references to it (a key and the hash),
+    so giving a result to a whole team writes it once instead of once per agent.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv(
+            "INTERPRETER_KNOWLEDGE_DB"
+        )  # Defaults to the interpreter's storage directory
+        self._lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            if self.path is None:
+                from ..terminal_interface.utils.local_storage_path import (
+                    get_storage_path,
+                )
+
+                self.path = os.path.join(get_storage_path(), "knowledge.sqlite")
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False, isolation_level=None
+            )
+            # WAL lets other processes read while one writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS knowledge (
+                hash TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+            )
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS knowledge_refs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                agent_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                hash TEXT NOT NULL REFERENCES knowledge (hash),
+                created_at REAL NOT NULL
+            )"""
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS knowledge_refs_agent_key ON knowledge_refs (agent_id, key)"
+            )
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def add(self, agent_ids: List, key: str, content: str) -> str:
+        """
+        Give `content` to every agent in `agent_ids` under `key`, in one transaction. Content that's
+        already stored isn't stored again. Returns the content's hash.
+        """
+        content = str(content)
+        content_hash = self.content_hash(content)
+        now = time.time()
+        with self._lock:
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "INSERT OR IGNORE INTO knowledge (hash, content, created_at) VALUES (?, ?, ?)",
+                    (content_hash, content, now),
+                )
+                connection.executemany(
+                    "INSERT INTO knowledge_refs (agent_id, key, hash, created_at) VALUES (?, ?, ?, ?)",
+                    [(str(agent_id), key, content_hash, now) for agent_id in agent_ids],
+                )
+                connection.execute("COMMIT")
+            except:
+                connection.execute("ROLLBACK")
+                raise
+        return content_hash
+
+    def get(self, content_hash: str) -> Optional[str]:
+        """
+        The content stored under a hash, if any.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT content FROM knowledge WHERE hash = ?", (content_hash,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def latest(self, agent_id, key: str) -> Optional[str]:
+        """
+        The content an agent was last given under `key`, if any.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                """SELECT knowledge.content FROM knowledge_refs JOIN knowledge USING (hash)
+                WHERE agent_id = ? AND key = ? ORDER BY knowledge_refs.id DESC LIMIT 1""",
+                (str(agent_id), key),
+            ).fetchone()
+        return row[0] if row else None
+
+    def references(self, agent_id, limit: int = 100) -> List[Dict]:
+        """
+        An agent's most recent references, newest first, as dicts with 'key', 'hash' and 'created_at'.
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT key, hash, created_at FROM knowledge_refs WHERE agent_id = ? ORDER BY id DESC LIMIT ?",
+                (str(agent_id), limit),
+            ).fetchall()
+        return [
+            {"key": key, "hash": content_hash, "created_at": created_at}
+            for key, content_hash, created_at in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
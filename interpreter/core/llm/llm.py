@@ -21,7 +21,12 @@ from .run_text_llm import run_text_llm
 
 # from .run_function_calling_llm import run_function_calling_llm
 from .run_tool_calling_llm import run_tool_calling_llm
-from .utils.convert_to_openai_messages import convert_to_openai_messages
+from .utils.context_trimmer import ContextTrimmer
+from .utils.convert_to_openai_messages import (
+    ConversionCache,
+    convert_to_openai_messages,
+)
+from .utils.image_descriptions import ImageDescriptions
 
 # Create or get the logger
 logger = logging.getLogger("LiteLLM")
@@ -70,6 +75,15 @@ class Llm:
         self.api_version = None
         self._is_loaded = False
 
+        # Remembers per-message token counts between turns
+        self.context_trimmer = ContextTrimmer(model=self.model)
+
+        # Remembers converted messages (and encoded images) between turns
+        self.conversion_cache = ConversionCache()
+
+        # Describes images for models without vision, in the background, and remembers them
+        self.image_descriptions = ImageDescriptions(self)
+
         # Budget manager powered by LiteLLM
         self.max_budget = None
 
@@ -162,42 +176,60 @@ class Llm:
                             print("Removing image message!")
                 # Idea: we could set detail: low for the middle messages, instead of deleting them
         elif self.supports_vision == False and self.vision_renderer:
-            for img_msg in image_messages:
-                if img_msg["format"] != "description":
+            positions = [
+                i
+                for i, msg in enumerate(messages)
+                if msg["type"] == "image" and msg["format"] != "description"
+            ]
+            # Start describing them all at once (most were started when they were added)
+            for i in positions:
+                self.image_descriptions.prefetch(messages[i])
+
+            # Described copies replace the image messages here. The images themselves stay
+            # in the conversation, and their descriptions are cached
+            messages = list(messages)
+            for i in positions:
+                img_msg = messages[i]
+                if not self.image_descriptions.is_ready(img_msg):
                     self.interpreter.display_message("\n  *Viewing image...*\n")
 
-                    if img_msg["format"] == "path":
-                        precursor = f"The image I'm referring to ({img_msg['content']}) contains the following: "
-                        if self.interpreter.computer.import_computer_api:
-                            postcursor = f"\nIf you want to ask questions about the image, run `computer.vision.query(path='{img_msg['content']}', query='(ask any question here)')` and a vision AI will answer it."
-                        else:
-                            postcursor = ""
+                if img_msg["format"] == "path":
+                    precursor = f"The image I'm referring to ({img_msg['content']}) contains the following: "
+                    if self.interpreter.computer.import_computer_api:
+                        postcursor = f"\nIf you want to ask questions about the image, run `computer.vision.query(path='{img_msg['content']}', query='(ask any question here)')` and a vision AI will answer it."
                     else:
-                        precursor = "Imagine I have just shown you an image with this description: "
                         postcursor = ""
+                else:
+                    precursor = (
+                        "Imagine I have just shown you an image with this description: "
+                    )
+                    postcursor = ""
+
+                try:
+                    image_description, ocr = self.image_descriptions.describe(img_msg)
+
+                    # It would be nice to format this as a message to the user and display it like: "I see: image_description"
+
+                    content = (
+                        precursor
+                        + image_description
+                        + "\n---\nI've OCR'd the image, this is the result (this may or may not be relevant. If it's not relevant, ignore this): '''\n"
+                        + ocr
+                        + "\n'''"
+                        + postcursor
+                    )
+
+                except ImportError:
+                    print(
+                        "\nTo use local vision, run `pip install 'open-interpreter[local]'`.\n"
+                    )
+                    content = ""
 
-                    try:
-                        image_description = self.vision_renderer(lmc=img_msg)
-                        ocr = self.interpreter.computer.vision.ocr(lmc=img_msg)
-
-                        # It would be nice to format this as a message to the user and display it like: "I see: image_description"
-
-                        img_msg["content"] = (
-                            precursor
-                            + image_description
-                            + "\n---\nI've OCR'd the image, this is the result (this may or may not be relevant. If it's not relevant, ignore this): '''\n"
-                            + ocr
-                            + "\n'''"
-                            + postcursor
-                        )
-                        img_msg["format"] = "description"
-
-                    except ImportError:
-                        print(
-                            "\nTo use local vision, run `pip install 'open-interpreter[local]'`.\n"
-                        )
-                        img_msg["format"] = "description"
-                        img_msg["content"] = ""
+                messages[i] = {
+                    **img_msg,
+                    "format": "description",
+                    "content": content,
+                }
 
         # Convert to OpenAI messages format
         messages = convert_to_openai_messages(
@@ -206,25 +238,28 @@ class Llm:
             vision=self.supports_vision,
             shrink_images=self.interpreter.shrink_images,
             interpreter=self.interpreter,
+            cache=self.conversion_cache,
         )
 
         system_message = messages[0]["content"]
         messages = messages[1:]
 
         # Trim messages
+        if self.context_trimmer.model != model:
+            self.context_trimmer = ContextTrimmer(model=model)
         try:
             if self.context_window and self.max_tokens:
                 trim_to_be_this_many_tokens = (
                     self.context_window - self.max_tokens - 25
                 )  # arbitrary buffer
-                messages = tt.trim(
+                messages = self.context_trimmer.trim(
                     messages,
                     system_message=system_message,
                     max_tokens=trim_to_be_this_many_tokens,
                 )
             elif self.context_window and not self.max_tokens:
                 # Just trim to the context window if max_tokens not set
-                messages = tt.trim(
+                messages = self.context_trimmer.trim(
                     messages,
                     system_message=system_message,
                     max_tokens=self.context_window,
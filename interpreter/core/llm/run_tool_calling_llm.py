@@ -2,7 +2,7 @@ import os
 import re
 
 from .utils.merge_deltas import merge_deltas
-from .utils.parse_partial_json import parse_partial_json
+from .utils.parse_partial_json import PartialJsonParser
 
 tool_schema = {
     "type": "function",
@@ -175,6 +175,10 @@ def run_tool_calling_llm(llm, request_params):
     review_category = None
     buffer = ""
 
+    # Parses the streamed arguments incrementally, instead of re-parsing all of them per delta
+    arguments_parser = PartialJsonParser()
+    yielded_code_length = 0
+
     for chunk in llm.completions(**request_params):
         if "choices" not in chunk or len(chunk["choices"]) == 0:
             # This happens sometimes
@@ -270,40 +274,37 @@ def run_tool_calling_llm(llm, request_params):
                     "content": code_delta,
                 }
 
-        if (
+        elif (
             accumulated_deltas.get("function_call")
             and "arguments" in accumulated_deltas["function_call"]
             and accumulated_deltas["function_call"]["arguments"]
         ):
-            if "arguments" in accumulated_deltas["function_call"]:
-                arguments = accumulated_deltas["function_call"]["arguments"]
-                arguments = parse_partial_json(arguments)
-
-                if arguments:
-                    if (
-                        language is None
-                        and "language" in arguments
-                        and "code"
-                        in arguments  # <- This ensures we're *finished* typing language, as opposed to partially done
-                        and arguments["language"]
-                    ):
-                        language = arguments["language"]
-
-                    if language is not None and "code" in arguments:
-                        # Calculate the delta (new characters only)
-                        code_delta = arguments["code"][len(code) :]
-                        # Update the code
-                        code = arguments["code"]
-                        # Yield the delta
-                        if code_delta:
-                            yield {
-                                "type": "code",
-                                "format": language,
-                                "content": code_delta,
-                            }
-                else:
-                    if llm.interpreter.verbose:
-                        print("Arguments not a dict.")
+            arguments = accumulated_deltas["function_call"]["arguments"]
+            arguments_parser.feed(arguments[arguments_parser.consumed :])
+
+            if not arguments_parser.failed:
+                if (
+                    language is None
+                    and "language" in arguments_parser.completed
+                    and arguments_parser.get("language")
+                ):
+                    language = arguments_parser.get("language")
+
+                if language is not None and "code" in arguments_parser.started:
+                    # Only the characters we haven't yielded yet
+                    code_delta = arguments_parser.text_since(
+                        "code", yielded_code_length
+                    )
+                    yielded_code_length += len(code_delta)
+                    if code_delta:
+                        yield {
+                            "type": "code",
+                            "format": language,
+                            "content": code_delta,
+                        }
+            else:
+                if llm.interpreter.verbose:
+                    print("Arguments not a dict.")
 
     if os.getenv("INTERPRETER_REQUIRE_AUTHENTICATION", "False").lower() == "true":
         print("function_call_detected", function_call_detected)
@@ -0,0 +1,203 @@
+from collections import OrderedDict
+
+from ...utils.tokenizers import get_encoding
+
+# Flat per-image estimate, since we can't tokenize base64 data meaningfully.
+# Roughly what a high-detail screenshot costs on OpenAI vision models.
+IMAGE_TOKEN_ESTIMATE = 1000
+
+
+def message_key(message):
+    """
+    A hashable fingerprint of an OpenAI-format message. Any mutation to the
+    message's role, content or tool calls produces a different key.
+
+    Hashing a str is cached on the str object, so messages that carry the same
+    content strings from turn to turn are fingerprinted in constant time.
+    """
+    key = []
+    for field, value in message.items():
+        if isinstance(value, str):
+            key.append((field, value))
+        elif isinstance(value, list):
+            parts = []
+            for part in value:
+                if isinstance(part, dict):
+                    if part.get("type") == "image_url":
+                        url = part["image_url"]
+                        url = url.get("url") if isinstance(url, dict) else url
+                        parts.append(("image_url", url))
+                    else:
+                        parts.append(("text", str(part.get("text", ""))))
+                else:
+                    parts.append(("text", str(part)))
+            key.append((field, tuple(parts)))
+        else:
+            key.append((field, str(value)))
+    return tuple(key)
+
+
+class ContextTrimmer:
+    """
+    Trims OpenAI-format messages to a token budget, like `tokentrim.trim`, but
+    remembers the token count of every message it has seen.
+
+    Messages before the last user message only change when the history is
+    edited, so from turn to turn they're assumed unchanged (after a spot check)
+    and only the messages after them are fingerprinted, counted and tokenized.
+    Each turn costs about as much as what's new, instead of as much as the whole
+    conversation. Call reset() after editing old messages in place.
+    """
+
+    def __init__(self, model=None, max_cached_messages=50000):
+        self.model = model
+        self.max_cached_messages = max_cached_messages
+        self._encoding = None
+        self._counts = OrderedDict()  # message_key -> token count
+
+        # Last turn's messages: their keys, and the running total of their counts
+        self._keys = []
+        self._totals = [0]
+        self._stable = 0  # Messages before this index are assumed unchanged next turn
+        self._last_start = 0  # The first message we kept last turn
+
+    @property
+    def encoding(self):
+        if self._encoding is None:
+            self._encoding = get_encoding(self.model)
+            if self._encoding is None:
+                raise RuntimeError(f"No tokenizer available for {self.model}")
+        return self._encoding
+
+    def count_text(self, text):
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def _count_uncached(self, message):
+        # Mirrors tokentrim's accounting: 3 tokens of overhead per message,
+        # plus the tokens of every value, plus one for a name.
+        tokens = 3
+        for field, value in message.items():
+            if isinstance(value, list):
+                for part in value:
+                    if isinstance(part, dict) and part.get("type") == "image_url":
+                        tokens += IMAGE_TOKEN_ESTIMATE
+                    elif isinstance(part, dict):
+                        tokens += self.count_text(str(part.get("text", "")))
+                    else:
+                        tokens += self.count_text(str(part))
+            else:
+                tokens += self.count_text(str(value))
+            if field == "name":
+                tokens += 1
+        return tokens
+
+    def count(self, message, key=None):
+        """
+        Returns the (cached) number of tokens in a single message.
+        """
+        if key is None:
+            key = message_key(message)
+        tokens = self._counts.get(key)
+        if tokens is None:
+            tokens = self._count_uncached(message)
+            self._counts[key] = tokens
+            if len(self._counts) > self.max_cached_messages:
+                self._counts.popitem(last=False)
+        else:
+            self._counts.move_to_end(key)
+        return tokens
+
+    def count_messages(self, messages):
+        return sum(self.count(message) for message in messages) + 3
+
+    def reset(self):
+        """
+        Forgets last turn's messages, so the next trim looks at every message.
+        """
+        self._keys = []
+        self._totals = [0]
+        self._stable = 0
+        self._last_start = 0
+
+    def trim(self, messages, system_message=None, max_tokens=None):
+        """
+        Drops the oldest messages until the conversation (plus the system
+        message) fits in `max_tokens`. If even the newest message doesn't fit,
+        its content is shortened from the middle.
+
+        Returns the messages with the system message prepended, like tokentrim.
+        """
+        # Reuse what we know about last turn's stable messages, if the history
+        # still starts (and the stable part still ends) with the same messages
+        stable = self._stable if self._stable <= len(messages) else 0
+        if stable and (
+            message_key(messages[0]) != self._keys[0]
+            or message_key(messages[stable - 1]) != self._keys[stable - 1]
+        ):
+            stable = 0
+        if stable == 0:
+            self._last_start = 0
+
+        keys, totals = self._keys, self._totals
+        del keys[stable:]
+        del totals[stable + 1 :]
+        for message in messages[stable:]:
+            key = message_key(message)
+            keys.append(key)
+            totals.append(totals[-1] + self.count(message, key))
+
+        # Earlier messages are followed by the last user message, so converting
+        # the next turn's messages won't change them
+        self._stable = 0
+        for i in range(len(messages) - 1, stable - 1, -1):
+            if messages[i].get("role") == "user":
+                self._stable = i
+                break
+        else:
+            self._stable = stable
+
+        budget = max_tokens - 3  # Reply priming
+        if system_message:
+            system_message = {"role": "system", "content": system_message}
+            budget -= self.count(system_message)
+
+        def total_from(start):
+            return totals[-1] - totals[start]
+
+        # History usually only grows, so the first kept message rarely moves
+        # backwards. Start from last turn's cut.
+        start = min(self._last_start, max(len(messages) - 1, 0))
+        if total_from(start) > budget:
+            while start < len(messages) - 1 and total_from(start) > budget:
+                start += 1
+        else:
+            # Budget may have grown: pull older messages back in
+            while start > 0 and total_from(start - 1) <= budget:
+                start -= 1
+        total = total_from(start)
+        self._last_start = start
+
+        trimmed = messages[start:]
+        if trimmed and total > budget:
+            trimmed = trimmed[:-1] + [self._shorten(trimmed[-1], budget)]
+
+        if system_message:
+            return [system_message] + trimmed
+        return trimmed
+
+    def _shorten(self, message, budget):
+        content = message.get("content")
+        if not isinstance(content, str):
+            return message
+        overhead = self.count(message) - self.count_text(content)
+        available = max(budget - overhead, 0)
+        tokens = self.encoding.encode(content, disallowed_special=())
+        if len(tokens) <= available:
+            return message
+        half = available // 2
+        content = (
+            self.encoding.decode(tokens[:half])
+            + "..."
+            + self.encoding.decode(tokens[len(tokens) - half :] if half else [])
+        )
+        return {**message, "content": content}
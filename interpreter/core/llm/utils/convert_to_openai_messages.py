@@ -1,10 +1,133 @@
 import base64
 import io
 import json
+import os
 import sys
+from collections import OrderedDict
 
 from PIL import Image
 
+# Interpreter settings that change how a message is converted
+conversion_settings = [
+    "user_message_template",
+    "always_apply_user_message_template",
+    "code_output_sender",
+    "code_output_template",
+    "empty_code_output_template",
+]
+
+
+class ConversionCache:
+    """
+    A bounded LRU cache of converted messages, keyed by message content + conversion flags.
+
+    Bounded both by number of entries and by the approximate size of what's stored,
+    since a single converted screenshot can be several megabytes.
+    """
+
+    def __init__(self, max_entries=2000, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (converted message, size)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, converted):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        size = message_size(converted)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (converted, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+
+def message_size(message):
+    if message is None:
+        return 0
+    content = message.get("content")
+    if isinstance(content, list):
+        return sum(
+            len(part.get("image_url", {}).get("url", "")) + len(part.get("text", ""))
+            for part in content
+        )
+    return len(str(content))
+
+
+def conversion_key(
+    message,
+    function_calling=True,
+    vision=False,
+    shrink_images=True,
+    interpreter=None,
+    is_last_user_message=False,
+):
+    """
+    Returns a hashable key for this message's conversion, or None if it can't be cached.
+
+    Content strings are used directly (Python caches their hash), so looking up a
+    multi-megabyte screenshot that's already been converted doesn't re-hash it.
+    """
+    settings = tuple(getattr(interpreter, name, None) for name in conversion_settings)
+
+    file_state = None
+    if message.get("type") == "image" and message.get("format") == "path":
+        # The file behind a path can change, so include its modification time
+        try:
+            stat = os.stat(message["content"])
+            file_state = (stat.st_mtime_ns, stat.st_size)
+        except (OSError, TypeError):
+            return None
+
+    key = (
+        message.get("role"),
+        message.get("type"),
+        message.get("format"),
+        message.get("recipient"),
+        message.get("content"),
+        file_state,
+        bool(function_calling),
+        bool(vision),
+        bool(shrink_images),
+        is_last_user_message,
+        settings,
+    )
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def copy_message(message):
+    message = dict(message)
+    if isinstance(message.get("content"), list):
+        message["content"] = [dict(part) for part in message["content"]]
+    return message
+
 
 def convert_to_openai_messages(
     messages,
@@ -12,9 +135,13 @@ def convert_to_openai_messages(
     vision=False,
     shrink_images=True,
     interpreter=None,
+    cache=None,
 ):
     """
     Converts LMC messages into OpenAI messages
+
+    If a ConversionCache is passed, messages that haven't changed since the last call
+    (most of the history, and especially images) are only converted once.
     """
     new_messages = []
 
@@ -31,226 +158,45 @@ def convert_to_openai_messages(
 
     #     messages = [message for message in messages if message.get("type") != "code"]
 
-    for message in messages:
-        # Is this for thine eyes?
-        if "recipient" in message and message["recipient"] != "assistant":
-            continue
-
-        new_message = {}
-
-        if message["type"] == "message":
-            new_message["role"] = message[
-                "role"
-            ]  # This should never be `computer`, right?
-
-            if message["role"] == "user" and (
-                message == [m for m in messages if m["role"] == "user"][-1]
-                or interpreter.always_apply_user_message_template
-            ):
-                # Only add the template for the last message?
-                new_message["content"] = interpreter.user_message_template.replace(
-                    "{content}", message["content"]
-                )
-            else:
-                new_message["content"] = message["content"]
-
-        elif message["type"] == "code":
-            new_message["role"] = "assistant"
-            if function_calling:
-                new_message["function_call"] = {
-                    "name": "execute",
-                    "arguments": json.dumps(
-                        {"language": message["format"], "code": message["content"]}
-                    ),
-                    # parsed_arguments isn't actually an OpenAI thing, it's an OI thing.
-                    # but it's soo useful!
-                    # "parsed_arguments": {
-                    #     "language": message["format"],
-                    #     "code": message["content"],
-                    # },
-                }
-                # Add empty content to avoid error "openai.error.InvalidRequestError: 'content' is a required property - 'messages.*'"
-                # especially for the OpenAI service hosted on Azure
-                new_message["content"] = ""
-            else:
-                new_message[
-                    "content"
-                ] = f"""```{message["format"]}\n{message["content"]}\n```"""
-
-        elif message["type"] == "console" and message["format"] == "output":
-            if function_calling:
-                new_message["role"] = "function"
-                new_message["name"] = "execute"
-                if "content" not in message:
-                    print("What is this??", content)
-                if type(message["content"]) != str:
-                    if interpreter.debug:
-                        print("\n\n\nStrange chunk found:", message, "\n\n\n")
-                    message["content"] = str(message["content"])
-                if message["content"].strip() == "":
-                    new_message[
-                        "content"
-                    ] = "No output"  # I think it's best to be explicit, but we should test this.
-                else:
-                    new_message["content"] = message["content"]
-
-            else:
-                # This should be experimented with.
-                if interpreter.code_output_sender == "user":
-                    if message["content"].strip() == "":
-                        content = interpreter.empty_code_output_template
-                    else:
-                        content = interpreter.code_output_template.replace(
-                            "{content}", message["content"]
-                        )
-
-                    new_message["role"] = "user"
-                    new_message["content"] = content
-                elif interpreter.code_output_sender == "assistant":
-                    new_message["role"] = "assistant"
-                    new_message["content"] = (
-                        "\n```output\n" + message["content"] + "\n```"
-                    )
-
-        elif message["type"] == "image":
-            if message.get("format") == "description":
-                new_message["role"] = message["role"]
-                new_message["content"] = message["content"]
-            else:
-                if vision == False:
-                    # If no vision, we only support the format of "description"
-                    continue
-
-                if "base64" in message["format"]:
-                    # Extract the extension from the format, default to 'png' if not specified
-                    if "." in message["format"]:
-                        extension = message["format"].split(".")[-1]
-                    else:
-                        extension = "png"
-
-                    encoded_string = message["content"]
-
-                elif message["format"] == "path":
-                    # Convert to base64
-                    image_path = message["content"]
-                    extension = image_path.split(".")[-1]
-
-                    with open(image_path, "rb") as image_file:
-                        encoded_string = base64.b64encode(image_file.read()).decode(
-                            "utf-8"
-                        )
-
-                else:
-                    # Probably would be better to move this to a validation pass
-                    # Near core, through the whole messages object
-                    if "format" not in message:
-                        raise Exception("Format of the image is not specified.")
-                    else:
-                        raise Exception(
-                            f"Unrecognized image format: {message['format']}"
-                        )
-
-                content = f"data:image/{extension};base64,{encoded_string}"
-
-                if shrink_images:
-                    # Shrink to less than 5mb
-
-                    # Calculate size
-                    content_size_bytes = sys.getsizeof(str(content))
-
-                    # Convert the size to MB
-                    content_size_mb = content_size_bytes / (1024 * 1024)
-
-                    # If the content size is greater than 5 MB, resize the image
-                    if content_size_mb > 5:
-                        # Decode the base64 image
-                        img_data = base64.b64decode(encoded_string)
-                        img = Image.open(io.BytesIO(img_data))
-
-                        # Run in a loop to make SURE it's less than 5mb
-                        for _ in range(10):
-                            # Calculate the scale factor needed to reduce the image size to 4.9 MB
-                            scale_factor = (4.9 / content_size_mb) ** 0.5
-
-                            # Calculate the new dimensions
-                            new_width = int(img.width * scale_factor)
-                            new_height = int(img.height * scale_factor)
-
-                            # Resize the image
-                            img = img.resize((new_width, new_height))
-
-                            # Convert the image back to base64
-                            buffered = io.BytesIO()
-                            img.save(buffered, format=extension)
-                            encoded_string = base64.b64encode(
-                                buffered.getvalue()
-                            ).decode("utf-8")
-
-                            # Set the content
-                            content = f"data:image/{extension};base64,{encoded_string}"
-
-                            # Recalculate the size of the content in bytes
-                            content_size_bytes = sys.getsizeof(str(content))
-
-                            # Convert the size to MB
-                            content_size_mb = content_size_bytes / (1024 * 1024)
-
-                            if content_size_mb < 5:
-                                break
-                        else:
-                            print(
-                                "Attempted to shrink the image but failed. Sending to the LLM anyway."
-                            )
-
-                new_message = {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": content, "detail": "low"},
-                        }
-                    ],
-                }
-
-                if message["role"] == "computer":
-                    new_message["content"].append(
-                        {
-                            "type": "text",
-                            "text": "This image is the result of the last tool output. What does it mean / are we done?",
-                        }
-                    )
-                if message.get("format") == "path":
-                    if any(
-                        content.get("type") == "text"
-                        for content in new_message["content"]
-                    ):
-                        for content in new_message["content"]:
-                            if content.get("type") == "text":
-                                content["text"] += (
-                                    "\nThis image is at this path: "
-                                    + message["content"]
-                                )
-                    else:
-                        new_message["content"].append(
-                            {
-                                "type": "text",
-                                "text": "This image is at this path: "
-                                + message["content"],
-                            }
-                        )
+    # Only the last user message gets the user message template (unless always_apply_user_message_template)
+    last_user_index = None
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i]["role"] == "user":
+            last_user_index = i
+            break
+
+    for i, message in enumerate(messages):
+        is_last_user_message = i == last_user_index
+
+        key = None
+        if cache is not None:
+            key = conversion_key(
+                message,
+                function_calling=function_calling,
+                vision=vision,
+                shrink_images=shrink_images,
+                interpreter=interpreter,
+                is_last_user_message=is_last_user_message,
+            )
 
-        elif message["type"] == "file":
-            new_message = {"role": "user", "content": message["content"]}
-        elif message["type"] == "error":
-            print("Ignoring 'type' == 'error' messages.")
-            continue
+        if key is not None and key in cache:
+            new_message = cache.get(key)
         else:
-            raise Exception(f"Unable to convert this message type: {message}")
-
-        if isinstance(new_message["content"], str):
-            new_message["content"] = new_message["content"].strip()
+            new_message = convert_message(
+                message,
+                function_calling=function_calling,
+                vision=vision,
+                shrink_images=shrink_images,
+                interpreter=interpreter,
+                is_last_user_message=is_last_user_message,
+            )
+            if key is not None:
+                cache.set(key, new_message)
 
-        new_messages.append(new_message)
+        if new_message is not None:
+            # Later steps (like tool call conversion) mutate messages in place,
+            # so never hand out the cached object itself
+            new_messages.append(copy_message(new_message))
 
     if function_calling == False:
         combined_messages = []
@@ -287,3 +233,223 @@ def convert_to_openai_messages(
         new_messages = combined_messages
 
     return new_messages
+
+
+def convert_message(
+    message,
+    function_calling=True,
+    vision=False,
+    shrink_images=True,
+    interpreter=None,
+    is_last_user_message=False,
+):
+    """
+    Converts a single LMC message into an OpenAI message, or returns None if it should be skipped
+    """
+    # Is this for thine eyes?
+    if "recipient" in message and message["recipient"] != "assistant":
+        return None
+
+    new_message = {}
+
+    if message["type"] == "message":
+        new_message["role"] = message["role"]  # This should never be `computer`, right?
+
+        if message["role"] == "user" and (
+            is_last_user_message or interpreter.always_apply_user_message_template
+        ):
+            # Only add the template for the last message?
+            new_message["content"] = interpreter.user_message_template.replace(
+                "{content}", message["content"]
+            )
+        else:
+            new_message["content"] = message["content"]
+
+    elif message["type"] == "code":
+        new_message["role"] = "assistant"
+        if function_calling:
+            new_message["function_call"] = {
+                "name": "execute",
+                "arguments": json.dumps(
+                    {"language": message["format"], "code": message["content"]}
+                ),
+                # parsed_arguments isn't actually an OpenAI thing, it's an OI thing.
+                # but it's soo useful!
+                # "parsed_arguments": {
+                #     "language": message["format"],
+                #     "code": message["content"],
+                # },
+            }
+            # Add empty content to avoid error "openai.error.InvalidRequestError: 'content' is a required property - 'messages.*'"
+            # especially for the OpenAI service hosted on Azure
+            new_message["content"] = ""
+        else:
+            new_message[
+                "content"
+            ] = f"""```{message["format"]}\n{message["content"]}\n```"""
+
+    elif message["type"] == "console" and message["format"] == "output":
+        if function_calling:
+            new_message["role"] = "function"
+            new_message["name"] = "execute"
+            if "content" not in message:
+                print("What is this??", content)
+            if type(message["content"]) != str:
+                if interpreter.debug:
+                    print("\n\n\nStrange chunk found:", message, "\n\n\n")
+                message["content"] = str(message["content"])
+            if message["content"].strip() == "":
+                new_message[
+                    "content"
+                ] = "No output"  # I think it's best to be explicit, but we should test this.
+            else:
+                new_message["content"] = message["content"]
+
+        else:
+            # This should be experimented with.
+            if interpreter.code_output_sender == "user":
+                if message["content"].strip() == "":
+                    content = interpreter.empty_code_output_template
+                else:
+                    content = interpreter.code_output_template.replace(
+                        "{content}", message["content"]
+                    )
+
+                new_message["role"] = "user"
+                new_message["content"] = content
+            elif interpreter.code_output_sender == "assistant":
+                new_message["role"] = "assistant"
+                new_message["content"] = "\n```output\n" + message["content"] + "\n```"
+
+    elif message["type"] == "image":
+        if message.get("format") == "description":
+            new_message["role"] = message["role"]
+            new_message["content"] = message["content"]
+        else:
+            if vision == False:
+                # If no vision, we only support the format of "description"
+                return None
+
+            if "base64" in message["format"]:
+                # Extract the extension from the format, default to 'png' if not specified
+                if "." in message["format"]:
+                    extension = message["format"].split(".")[-1]
+                else:
+                    extension = "png"
+
+                encoded_string = message["content"]
+
+            elif message["format"] == "path":
+                # Convert to base64
+                image_path = message["content"]
+                extension = image_path.split(".")[-1]
+
+                with open(image_path, "rb") as image_file:
+                    encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
+
+            else:
+                # Probably would be better to move this to a validation pass
+                # Near core, through the whole messages object
+                if "format" not in message:
+                    raise Exception("Format of the image is not specified.")
+                else:
+                    raise Exception(f"Unrecognized image format: {message['format']}")
+
+            content = f"data:image/{extension};base64,{encoded_string}"
+
+            if shrink_images:
+                # Shrink to less than 5mb
+
+                # Calculate size
+                content_size_bytes = sys.getsizeof(str(content))
+
+                # Convert the size to MB
+                content_size_mb = content_size_bytes / (1024 * 1024)
+
+                # If the content size is greater than 5 MB, resize the image
+                if content_size_mb > 5:
+                    # Decode the base64 image
+                    img_data = base64.b64decode(encoded_string)
+                    img = Image.open(io.BytesIO(img_data))
+
+                    # Run in a loop to make SURE it's less than 5mb
+                    for _ in range(10):
+                        # Calculate the scale factor needed to reduce the image size to 4.9 MB
+                        scale_factor = (4.9 / content_size_mb) ** 0.5
+
+                        # Calculate the new dimensions
+                        new_width = int(img.width * scale_factor)
+                        new_height = int(img.height * scale_factor)
+
+                        # Resize the image
+                        img = img.resize((new_width, new_height))
+
+                        # Convert the image back to base64
+                        buffered = io.BytesIO()
+                        img.save(buffered, format=extension)
+                        encoded_string = base64.b64encode(buffered.getvalue()).decode(
+                            "utf-8"
+                        )
+
+                        # Set the content
+                        content = f"data:image/{extension};base64,{encoded_string}"
+
+                        # Recalculate the size of the content in bytes
+                        content_size_bytes = sys.getsizeof(str(content))
+
+                        # Convert the size to MB
+                        content_size_mb = content_size_bytes / (1024 * 1024)
+
+                        if content_size_mb < 5:
+                            break
+                    else:
+                        print(
+                            "Attempted to shrink the image but failed. Sending to the LLM anyway."
+                        )
+
+            new_message = {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": content, "detail": "low"},
+                    }
+                ],
+            }
+
+            if message["role"] == "computer":
+                new_message["content"].append(
+                    {
+                        "type": "text",
+                        "text": "This image is the result of the last tool output. What does it mean / are we done?",
+                    }
+                )
+            if message.get("format") == "path":
+                if any(
+                    content.get("type") == "text" for content in new_message["content"]
+                ):
+                    for content in new_message["content"]:
+                        if content.get("type") == "text":
+                            content["text"] += (
+                                "\nThis image is at this path: " + message["content"]
+                            )
+                else:
+                    new_message["content"].append(
+                        {
+                            "type": "text",
+                            "text": "This image is at this path: " + message["content"],
+                        }
+                    )
+
+    elif message["type"] == "file":
+        new_message = {"role": "user", "content": message["content"]}
+    elif message["type"] == "error":
+        print("Ignoring 'type' == 'error' messages.")
+        return None
+    else:
+        raise Exception(f"Unable to convert this message type: {message}")
+
+    if isinstance(new_message["content"], str):
+        new_message["content"] = new_message["content"].strip()
+
+    return new_message
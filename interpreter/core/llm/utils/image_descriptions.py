@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ...utils.history import BoundedDict
+
+
+class ImageDescriptions:
+    """
+    Describes image messages for models that can't see them: a description from
+    `llm.vision_renderer` (Moondream, by default) plus OCR of the image.
+
+    The description and the OCR run concurrently on a small worker pool. Identical images
+    are only described once, even when requested again while in flight. Finished results
+    are saved as one JSON file per image, named by the hash of its content (and of the
+    renderer), so they survive between turns and sessions.
+
+    Call `prefetch` as soon as an image message exists, and `describe` when it's needed.
+    """
+
+    def __init__(self, llm, max_workers=None, path=None):
+        self.llm = llm
+        self.max_workers = max_workers or int(
+            os.getenv("INTERPRETER_VISION_WORKERS", "2")
+        )
+        self.path = path  # Defaults to the interpreter's storage directory
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = {}  # key -> (description future, OCR future)
+        self._results = {}  # key -> (description, OCR)
+        # (renderer, content or (path, mtime, size)) -> key, so each image is hashed once
+        self._keys = BoundedDict(maxlen=1024)
+
+        # Metrics
+        self.described = 0
+        self.hits = 0
+
+    def key(self, message):
+        """
+        The content hash of an image message (and of the renderer that will describe it).
+        It's remembered by the content string, or by the path while the file is unchanged.
+        """
+        renderer = self.llm.vision_renderer
+        renderer = getattr(renderer, "__qualname__", None) or repr(renderer)
+        if message["format"] == "path":
+            stat = os.stat(message["content"])
+            memo_key = (renderer, (message["content"], stat.st_mtime_ns, stat.st_size))
+        else:
+            memo_key = (renderer, message["content"])
+        with self._lock:
+            key = self._keys.get(memo_key)
+        if key is not None:
+            return key
+
+        if message["format"] == "path":
+            with open(message["content"], "rb") as f:
+                content = f.read()
+        else:
+            content = message["content"].encode()
+        key = hashlib.sha256(renderer.encode() + b"\0" + content).hexdigest()
+        with self._lock:
+            self._keys[memo_key] = key
+        return key
+
+    def is_ready(self, message):
+        """
+        Whether `describe` would return without waiting.
+        """
+        key = self.key(message)
+        with self._lock:
+            if key in self._results:
+                return True
+            pending = self._pending.get(key)
+            if pending is not None:
+                return all(future.done() for future in pending)
+        return os.path.exists(self._file(key))
+
+    def prefetch(self, message):
+        """
+        Starts describing an image message in the background, unless it's already described.
+        """
+        self._start(self.key(message), message)
+
+    def describe(self, message):
+        """
+        Returns (description, OCR text) of an image message, waiting for it if needed.
+        Errors from the renderer or OCR (like an ImportError) are raised here.
+        """
+        return self._wait(self._start(self.key(message), message))
+
+    def describe_many(self, messages):
+        """
+        Like `describe`, for several messages at once. They're all started before any is awaited.
+        """
+        started = [self._start(self.key(message), message) for message in messages]
+        return [self._wait(start) for start in started]
+
+    def _start(self, key, message):
+        # Returns (finished result, None), or (None, the futures that will produce it)
+        with self._lock:
+            if key in self._results:
+                return self._results[key], None
+            if key in self._pending:
+                return None, self._pending[key]
+            saved = self._load(key)
+            if saved is not None:
+                self._results[key] = saved
+                return saved, None
+
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="describe-image"
+                )
+            renderer = self.llm.vision_renderer
+            vision = self.llm.interpreter.computer.vision
+            pending = (
+                self._executor.submit(renderer, lmc=message),
+                self._executor.submit(vision.ocr, lmc=message),
+            )
+            self._pending[key] = pending
+
+        for future in pending:
+            future.add_done_callback(lambda _: self._finish(key, pending))
+        return None, pending
+
+    def _wait(self, start):
+        result, pending = start
+        if pending is None:
+            self.hits += 1
+            return result
+        return tuple(future.result() for future in pending)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _finish(self, key, pending):
+        if not all(future.done() for future in pending):
+            return
+        with self._lock:
+            if self._pending.get(key) is not pending:
+                return  # The other future's callback got here first
+            del self._pending[key]
+            if any(future.exception() is not None for future in pending):
+                return  # Not cached, so it's retried next time
+            result = tuple(future.result() for future in pending)
+            self._results[key] = result
+            self.described += 1
+        self._save(key, result)
+
+    def _file(self, key):
+        if self.path is None:
+            from ....terminal_interface.utils.local_storage_path import get_storage_path
+
+            self.path = get_storage_path("image_descriptions")
+        return os.path.join(self.path, key[:2], key + ".json")
+
+    def _load(self, key):
+        try:
+            with open(self._file(key)) as f:
+                saved = json.load(f)
+            return saved["description"], saved["ocr"]
+        except:
+            return None
+
+    def _save(self, key, result):
+        path = self._file(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump({"description": result[0], "ocr": result[1]}, f)
+            os.replace(temp_path, path)
+        except:
+            pass  # It's only a cache
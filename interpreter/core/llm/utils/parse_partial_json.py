@@ -58,3 +58,270 @@ def parse_partial_json(s):
     except:
         # If we still can't parse the string as JSON, return None to indicate failure.
         return None
+
+
+# Runs of string characters that need no decoding
+_plain_string_chars = re.compile(r'[^"\\]+')
+_whitespace = " \t\n\r"
+_simple_escapes = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class PartialJsonParser:
+    """
+    Incrementally parses a JSON object that arrives in pieces, like streamed
+    tool call arguments: {"language": "python", "code": "print('hi')"}
+
+    Unlike parse_partial_json, which re-parses everything received so far, each
+    call to feed() only looks at the new text, so streaming N characters is O(N).
+
+    String values are available while they're still being streamed. Other values
+    (numbers, nested objects...) appear once they're complete.
+    """
+
+    def __init__(self):
+        self.consumed = 0  # Characters fed so far
+        self.failed = False
+        self.started = set()  # Keys whose values have begun
+        self.completed = set()  # Keys whose values are complete
+
+        self._state = "start"
+        self._pending = ""  # An escape sequence split across feeds
+        self._key = []
+        self._current_key = None
+        self._strings = {}  # key -> [pieces, total length]
+        self._values = {}  # key -> non-string value
+        self._raw = []
+        self._raw_depth = 0
+        self._raw_in_string = False
+        self._raw_escaped = False
+
+    def feed(self, text):
+        """
+        Parses the next piece of the document.
+        Returns {key: new characters} for every string value that grew.
+        """
+        self.consumed += len(text)
+        new_text = {}
+        if not self.failed and text:
+            self._feed(self._pending + text, new_text)
+        return {key: "".join(pieces) for key, pieces in new_text.items()}
+
+    def _feed(self, text, new_text):
+        self._pending = ""
+        i = 0
+        n = len(text)
+
+        while i < n:
+            state = self._state
+
+            if state in ("key", "string"):
+                match = _plain_string_chars.match(text, i)
+                if match:
+                    chunk = match.group()
+                    i = match.end()
+                    if state == "key":
+                        self._key.append(chunk)
+                    else:
+                        self._append(self._current_key, chunk, new_text)
+                    continue
+
+                char = text[i]
+                if char == '"':
+                    i += 1
+                    if state == "key":
+                        self._current_key = "".join(self._key)
+                        self._state = "colon"
+                    else:
+                        self.completed.add(self._current_key)
+                        self._state = "comma_or_end"
+                    continue
+
+                # A backslash. Decode the whole escape sequence, or wait for the rest of it.
+                end = self._escape_end(text, i)
+                if end is None:
+                    self._pending = text[i:]
+                    return
+                decoded = _simple_escapes.get(text[i + 1])
+                if decoded is None:
+                    try:
+                        decoded = json.loads('"' + text[i:end] + '"')
+                    except ValueError:
+                        self.failed = True
+                        return
+                i = end
+                if state == "key":
+                    self._key.append(decoded)
+                else:
+                    self._append(self._current_key, decoded, new_text)
+                continue
+
+            if state == "raw":
+                i = self._consume_raw(text, i)
+                if self.failed:
+                    return
+                continue
+
+            char = text[i]
+            i += 1
+
+            if char in _whitespace:
+                continue
+
+            if state == "start":
+                if char != "{":
+                    self.failed = True
+                    return
+                self._state = "key_or_end"
+            elif state == "key_or_end":
+                if char == '"':
+                    self._key = []
+                    self._state = "key"
+                elif char == "}":
+                    self._state = "done"
+                else:
+                    self.failed = True
+                    return
+            elif state == "colon":
+                if char != ":":
+                    self.failed = True
+                    return
+                self._state = "value"
+            elif state == "value":
+                self.started.add(self._current_key)
+                if char == '"':
+                    self._strings[self._current_key] = [[], 0]
+                    self._values.pop(self._current_key, None)
+                    self._state = "string"
+                else:
+                    self._raw = [char]
+                    self._raw_depth = 1 if char in "{[" else 0
+                    self._raw_in_string = False
+                    self._raw_escaped = False
+                    self._state = "raw"
+            elif state == "comma_or_end":
+                if char == ",":
+                    self._state = "key_or_end"
+                elif char == "}":
+                    self._state = "done"
+                else:
+                    self.failed = True
+                    return
+            # Anything after the closing brace is ignored
+
+    def get(self, key, default=None):
+        """
+        The current value of a key, including partially streamed strings.
+        """
+        if key in self._strings:
+            pieces, _ = self._strings[key]
+            if len(pieces) > 1:
+                pieces[:] = ["".join(pieces)]
+            return pieces[0] if pieces else ""
+        return self._values.get(key, default)
+
+    def text_since(self, key, offset):
+        """
+        The characters of a string value after `offset`, without joining the whole value.
+        """
+        if key not in self._strings:
+            return ""
+        pieces, length = self._strings[key]
+        remaining = length - offset
+        if remaining <= 0:
+            return ""
+        taken = []
+        for piece in reversed(pieces):
+            taken.append(piece)
+            remaining -= len(piece)
+            if remaining <= 0:
+                break
+        text = "".join(reversed(taken))
+        return text[-remaining:] if remaining < 0 else text
+
+    @property
+    def value(self):
+        """
+        Everything parsed so far, as a dict.
+        """
+        if self.failed:
+            return None
+        value = {key: self.get(key) for key in self.started if key in self._strings}
+        value.update(self._values)
+        return value
+
+    def _append(self, key, text, new_text):
+        entry = self._strings[key]
+        entry[0].append(text)
+        entry[1] += len(text)
+        new_text.setdefault(key, []).append(text)
+
+    def _escape_end(self, text, i):
+        # Returns the index just past the escape sequence at text[i], or None if it's incomplete
+        if i + 1 >= len(text):
+            return None
+        if text[i + 1] != "u":
+            return i + 2
+        if i + 6 > len(text):
+            return None
+        try:
+            code = int(text[i + 2 : i + 6], 16)
+        except ValueError:
+            return i + 6  # Malformed, which decoding it reports
+        # A high surrogate must be decoded together with the low surrogate that follows it
+        if 0xD800 <= code <= 0xDBFF:
+            if text[i + 6 : i + 8] == "\\u":
+                return i + 12 if i + 12 <= len(text) else None
+            if i + 8 > len(text):
+                return None
+        return i + 6
+
+    def _consume_raw(self, text, i):
+        # Numbers, literals and nested structures are buffered until they're complete
+        n = len(text)
+        start = i
+        while i < n:
+            char = text[i]
+            if self._raw_depth == 0:
+                if char in ",}" or char in _whitespace:
+                    self._raw.append(text[start:i])
+                    self._finish_raw()
+                    return i
+            elif self._raw_in_string:
+                if self._raw_escaped:
+                    self._raw_escaped = False
+                elif char == "\\":
+                    self._raw_escaped = True
+                elif char == '"':
+                    self._raw_in_string = False
+            elif char == '"':
+                self._raw_in_string = True
+            elif char in "{[":
+                self._raw_depth += 1
+            elif char in "}]":
+                self._raw_depth -= 1
+                if self._raw_depth == 0:
+                    self._raw.append(text[start : i + 1])
+                    self._finish_raw()
+                    return i + 1
+            i += 1
+        self._raw.append(text[start:])
+        return i
+
+    def _finish_raw(self):
+        try:
+            self._values[self._current_key] = json.loads("".join(self._raw))
+        except ValueError:
+            self.failed = True
+            return
+        self._strings.pop(self._current_key, None)
+        self.completed.add(self._current_key)
+        self._state = "comma_or_end"
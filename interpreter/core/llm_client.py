@@ -0,0 +1,190 @@
+import asyncio
+import copy
+import functools
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .utils.retry import backoff_delay, is_retryable
+
+
+class LLMClient:
+    """
+    What every LLM provider client shares: a pooled HTTP session (connections are kept alive
+    and reused), a timeout on every request, retries of rate limits, timeouts and server errors
+    with jittered exponential backoff, a limit on concurrent requests per provider, and
+    coalescing of identical requests (made while one is in flight, they share its response).
+
+    Every blocking call has an async counterpart, which runs it on the client's thread pool,
+    so many calls can be awaited together with asyncio.gather.
+
+    Settings default to INTERPRETER_<PROVIDER>_CONCURRENCY, _TIMEOUT and _RETRIES.
+    """
+
+    provider = "default"
+
+    _limits = {}  # provider -> semaphore shared by every client of that provider
+    _limits_lock = threading.Lock()
+
+    def __init__(
+        self,
+        max_concurrency: int = None,
+        timeout: float = None,
+        max_retries: int = None,
+        backoff: float = 0.5,
+        max_backoff: float = 30,
+    ):
+        prefix = f"INTERPRETER_{self.provider.upper()}_"
+
+        # Settings
+        self.max_concurrency = max_concurrency or int(
+            os.getenv(prefix + "CONCURRENCY", "8")
+        )
+        self.timeout = timeout or float(os.getenv(prefix + "TIMEOUT", "60"))
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else int(os.getenv(prefix + "RETRIES", "3"))
+        )
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.coalesce = True
+
+        self._session = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> Future of the response
+
+        # Metrics
+        self.requests = 0
+        self.retries = 0
+        self.coalesced = 0
+
+    @property
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=self.max_concurrency,
+                    pool_maxsize=self.max_concurrency,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    @property
+    def limit(self) -> threading.BoundedSemaphore:
+        """
+        The provider's limit on concurrent requests, shared by all its clients. It's sized by
+        the first client that needs it, so clients created later can't raise it.
+        """
+        with LLMClient._limits_lock:
+            if self.provider not in LLMClient._limits:
+                LLMClient._limits[self.provider] = threading.BoundedSemaphore(
+                    self.max_concurrency
+                )
+            return LLMClient._limits[self.provider]
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        json_data: Dict[str, Any] = None,
+        headers: Dict[str, str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Send an HTTP request on the pooled session and return its JSON response.
+        """
+        key = (
+            (method, url, json.dumps(json_data, sort_keys=True, default=str))
+            if self.coalesce
+            else None
+        )
+        return self.call(
+            key, functools.partial(self._send, method, url, json_data, headers)
+        )
+
+    def _send(self, method, url, json_data, headers):
+        response = self.session.request(
+            method, url, json=json_data, headers=headers, timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def call(self, key: Optional[Hashable], function: Callable[[], Any]) -> Any:
+        """
+        Call function() within the provider's concurrency limit, retrying it if it fails in a way
+        that's worth retrying. Calls with the same key (unless it's None) made while one is in
+        flight wait for it, and get a copy of its result.
+        """
+        with self._lock:
+            future = self._in_flight.get(key) if key is not None else None
+            owner = future is None
+            if owner:
+                future = Future()
+                if key is not None:
+                    self._in_flight[key] = future
+            else:
+                self.coalesced += 1  # Metrics are only changed while holding the lock
+
+        if not owner:
+            return copy.deepcopy(future.result())
+
+        try:
+            future.set_result(self._call_with_retries(function))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            if key is not None:
+                with self._lock:
+                    del self._in_flight[key]
+        return future.result()
+
+    def _call_with_retries(self, function):
+        attempt = 0
+        while True:
+            try:
+                with self.limit:
+                    with self._lock:
+                        self.requests += 1
+                    return function()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(backoff_delay(e, attempt, self.backoff, self.max_backoff))
+                attempt += 1
+
+    async def run_async(self, function: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking method of this client on its thread pool, and await the result.
+        """
+        with self._lock:
+            if self._executor is None:
+                # Coalesced calls wait on a thread too, so there are more threads than request slots
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency * 4,
+                    thread_name_prefix=f"{self.provider}-client",
+                )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(function, *args, **kwargs)
+        )
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
@@ -1,16 +1,19 @@
-import requests
 import os
 from typing import List, Dict, Any, Tuple
 from dotenv import load_dotenv
+from .llm_client import LLMClient
 
 # Load environment variables from .env file
 load_dotenv()
 
-class OpenRouterClient:
+class OpenRouterClient(LLMClient):
     BASE_URL = "https://openrouter.ai/api/v1"
+    provider = "openrouter"
 
-    def __init__(self):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
         self.api_key = os.getenv("OPENROUTER_API_KEY")
+        self.default_model = os.getenv("OPENROUTER_MODEL", "openai/gpt-3.5-turbo")
 
     def set_api_key(self, api_key: str):
         self.api_key = api_key
@@ -25,15 +28,11 @@ class OpenRouterClient:
         }
         url = f"{self.BASE_URL}{endpoint}"
         
-        if method == "GET":
-            response = requests.get(url, headers=headers)
-        elif method == "POST":
-            response = requests.post(url, json=data, headers=headers)
-        else:
+        if method not in ["GET", "POST"]:
             raise ValueError(f"Unsupported HTTP method: {method}")
         
-        response.raise_for_status()
-        return response.json()
+        # Pooled, with a timeout, retries, a concurrency limit and coalescing (see LLMClient)
+        return self.request(method, url, json_data=data if method == "POST" else None, headers=headers)
 
     def get_available_models(self) -> List[str]:
         if not self.api_key:
@@ -45,20 +44,26 @@ class OpenRouterClient:
             print(f"Error fetching available models: {str(e)}")
             return []
 
-    def chat_completion(self, messages: List[Dict[str, str]], model: str) -> Dict[str, Any]:
+    def chat_completion(self, messages: List[Dict[str, str]], model: str = None) -> Dict[str, Any]:
         data = {
-            "model": model,
+            "model": model or self.default_model,
             "messages": messages
         }
         return self._make_request("/chat/completions", method="POST", data=data)
 
-    def text_completion(self, prompt: str, model: str) -> Dict[str, Any]:
+    def text_completion(self, prompt: str, model: str = None) -> Dict[str, Any]:
         data = {
-            "model": model,
+            "model": model or self.default_model,
             "prompt": prompt
         }
         return self._make_request("/completions", method="POST", data=data)
 
+    async def achat_completion(self, messages: List[Dict[str, str]], model: str = None) -> Dict[str, Any]:
+        return await self.run_async(self.chat_completion, messages, model)
+
+    async def atext_completion(self, prompt: str, model: str = None) -> Dict[str, Any]:
+        return await self.run_async(self.text_completion, prompt, model)
+
     def test_api(self) -> Tuple[bool, str]:
         try:
             models = self.get_available_models()
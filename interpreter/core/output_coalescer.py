@@ -0,0 +1,75 @@
+import asyncio
+import queue
+
+
+def can_merge(output, next_output):
+    """
+    Whether two outputs can be sent as one, with the same result for a client that
+    accumulates them: plain content chunks of the same message, with no start/end flags.
+    """
+    if not isinstance(output, dict) or not isinstance(next_output, dict):
+        return False
+    for chunk in [output, next_output]:
+        if (
+            "start" in chunk
+            or "end" in chunk
+            or "id" in chunk
+            or not isinstance(chunk.get("content"), str)
+        ):
+            return False
+    return {key: value for key, value in output.items() if key != "content"} == {
+        key: value for key, value in next_output.items() if key != "content"
+    }
+
+
+class OutputCoalescer:
+    """
+    Merges consecutive content chunks (usually one per token) into fewer, larger outputs.
+
+    When a chunk arrives, waits `window` seconds, then merges in every chunk of the same
+    message that has arrived since, up to `max_bytes` of content. This costs one wait per
+    merged output, not one per token.
+    """
+
+    def __init__(self, window=0.02, max_bytes=4096):
+        self.window = window
+        self.max_bytes = max_bytes
+
+        # Metrics
+        self.chunks_in = 0
+        self.outputs_out = 0
+
+    async def collect(self, output, get_nowait):
+        """
+        Merges `output` with the chunks queued after it, read with `get_nowait`
+        (which raises asyncio.QueueEmpty or queue.Empty when there are none).
+        Returns (output to send, next output or None). The next output couldn't be merged
+        and must be sent after this one.
+        """
+        self.chunks_in += 1
+        self.outputs_out += 1
+        if not can_merge(output, output):
+            return output, None
+
+        await asyncio.sleep(self.window)
+
+        contents = [output["content"]]
+        size = len(output["content"])
+        next_output = None
+
+        while size < self.max_bytes:
+            try:
+                next_output = get_nowait()
+            except (asyncio.QueueEmpty, queue.Empty):
+                next_output = None
+                break
+            if not can_merge(output, next_output):
+                break
+            self.chunks_in += 1
+            contents.append(next_output["content"])
+            size += len(next_output["content"])
+            next_output = None
+
+        if len(contents) > 1:
+            output = dict(output, content="".join(contents))
+        return output, next_output
@@ -1,11 +1,95 @@
 import re
+import time
 
+# A {{ }} block opts into caching by starting with a directive comment, e.g.
+#
+#   {{
+#   # cache: ttl=300 depends=custom_instructions,computer.import_computer_api
+#   print(...)
+#   }}
+#
+# `ttl` is in seconds (omit it to cache until the dependencies change), and
+# `depends` is a comma-separated list of attribute paths on the interpreter
+# whose values are folded into the cache key.
+cache_directive_pattern = re.compile(r"^\s*#\s*cache\b:?(.*)$", re.MULTILINE)
 
-def render_message(interpreter, message):
+
+class RenderCache:
+    """
+    Caches the output of {{ }} blocks that opt in with a `# cache` directive,
+    so rendering the system message doesn't need a kernel round-trip per block
+    on every pass through the respond loop.
+    """
+
+    def __init__(self):
+        self._entries = {}  # key -> (output, expires_at or None)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        output, expires_at = entry
+        if expires_at is not None and time.time() >= expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self.hits += 1
+        return output
+
+    def set(self, key, output, ttl=None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._entries[key] = (output, expires_at)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def parse_cache_directive(code):
+    """
+    Returns (ttl, depends) if the block's first line is a `# cache` directive,
+    or None if the block should be run every time.
+    """
+    first_line = code.strip().split("\n", 1)[0]
+    match = cache_directive_pattern.match(first_line)
+    if not match:
+        return None
+
+    ttl = None
+    depends = []
+    for option in match.group(1).split():
+        key, _, value = option.partition("=")
+        if key == "ttl" and value:
+            ttl = float(value)
+        elif key == "depends" and value:
+            depends = [d.strip() for d in value.split(",") if d.strip()]
+    return ttl, depends
+
+
+def resolve_dependency(interpreter, path):
+    value = interpreter
+    for attribute in path.split("."):
+        value = getattr(value, attribute, None)
+    return repr(value)
+
+
+def render_message(interpreter, message, cache=None):
     """
     Renders a dynamic message into a string.
     """
 
+    # Nothing to run, so don't touch the computer at all
+    if "{{" not in message:
+        return message.strip()
+
+    if cache is None:
+        cache = getattr(interpreter, "render_cache", None)
+
     previous_save_skills_setting = interpreter.computer.save_skills
     interpreter.computer.save_skills = False
 
@@ -15,9 +99,22 @@ def render_message(interpreter, message):
     for i, part in enumerate(parts):
         # If the part is enclosed in {{ and }}
         if part.startswith("{{") and part.endswith("}}"):
+            code = part[2:-2].strip()
+
+            directive = parse_cache_directive(code) if cache is not None else None
+            if directive is not None:
+                ttl, depends = directive
+                key = (code,) + tuple(
+                    resolve_dependency(interpreter, path) for path in depends
+                )
+                cached_output = cache.get(key)
+                if cached_output is not None:
+                    parts[i] = cached_output
+                    continue
+
             # Run the code inside the brackets
             output = interpreter.computer.run(
-                "python", part[2:-2].strip(), display=interpreter.verbose
+                "python", code, display=interpreter.verbose
             )
 
             # Extract the output content
@@ -31,6 +128,9 @@ def render_message(interpreter, message):
             # Replace the part with the output
             parts[i] = "\n".join(outputs)
 
+            if directive is not None:
+                cache.set(key, parts[i], ttl=ttl)
+
     # Join the parts back into the message
     rendered_message = "".join(parts).strip()
 
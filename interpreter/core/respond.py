@@ -346,6 +346,18 @@ def respond(interpreter):
                 ## ↓ CODE IS RUN HERE
 
                 for line in interpreter.computer.run(language, code, stream=True):
+                    if (
+                        line.get("type") == "image"
+                        and interpreter.llm.supports_vision == False
+                        and interpreter.llm.vision_renderer
+                    ):
+                        # Start describing it now, so it's ready when the LLM needs it
+                        try:
+                            interpreter.llm.image_descriptions.prefetch(
+                                {"role": "computer", **line}
+                            )
+                        except:
+                            pass
                     yield {"role": "computer", **line}
 
                 ## ↑ CODE IS RUN HERE
@@ -0,0 +1,360 @@
+import base64
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from ..terminal_interface.utils.local_storage_path import get_storage_path
+
+# Settings that belong to one conversation, so they're saved along with its messages
+session_settings = ["auto_run", "context_mode", "last_start_time"]
+
+# Attributes that must never be copied from the base interpreter into a new session
+uncopied_attributes = ["id", "messages", "print", "last_start_time"]
+
+valid_session_id = re.compile(r"^[A-Za-z0-9_\-]{1,128}$")
+
+
+def copy_settings(source, target):
+    """
+    Copies simple settings (strings, numbers, booleans) from one interpreter to another,
+    including the settings of its llm and computer. Conversation state is not copied.
+    """
+    for name, value in vars(source).items():
+        if name.startswith("_") or name in uncopied_attributes:
+            continue
+        if value is None or isinstance(value, (str, int, float, bool)):
+            setattr(target, name, value)
+
+    for child in ["llm", "computer"]:
+        source_child = getattr(source, child, None)
+        target_child = getattr(target, child, None)
+        if source_child is None or target_child is None:
+            continue
+        for name, value in vars(source_child).items():
+            if name.startswith("_"):
+                continue
+            if value is None or isinstance(value, (str, int, float, bool)):
+                setattr(target_child, name, value)
+
+    return target
+
+
+def encode_bytes(value):
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"Can't save {type(value).__name__} in a session")
+
+
+def decode_bytes(value):
+    if set(value) == {"__bytes__"}:
+        return base64.b64decode(value["__bytes__"])
+    return value
+
+
+class SessionManager:
+    """
+    Maps session IDs to isolated interpreters, so one server can hold many conversations.
+
+    Each session gets its own interpreter (and so its own computer and language kernels).
+    At most `max_workers` sessions generate a response at once; the rest wait for a slot.
+    Sessions that have been idle for `idle_timeout` seconds, or the least recently used ones
+    once there are more than `max_sessions`, are saved to disk and shut down. They're restored
+    (with a fresh computer) the next time they're used.
+    """
+
+    def __init__(
+        self,
+        interpreter,
+        factory=None,
+        max_sessions=None,
+        max_workers=None,
+        idle_timeout=None,
+        storage_path=None,
+    ):
+        self.interpreter = interpreter
+        # Creates a new interpreter configured like the base one
+        self.factory = factory or (
+            lambda: copy_settings(interpreter, type(interpreter)())
+        )
+
+        # Settings
+        self.max_sessions = max_sessions or int(
+            os.getenv("INTERPRETER_MAX_SESSIONS", 32)
+        )
+        self.max_workers = max_workers or int(os.getenv("INTERPRETER_MAX_WORKERS", 4))
+        self.idle_timeout = idle_timeout or float(
+            os.getenv("INTERPRETER_SESSION_IDLE_TIMEOUT", 600)
+        )
+        self.storage_path = storage_path or get_storage_path("sessions")
+
+        # Shared by every session's respond thread
+        self.worker_slots = threading.BoundedSemaphore(self.max_workers)
+
+        self.sessions = (
+            OrderedDict()
+        )  # session id -> interpreter, least recently used first
+        self._last_used = {}
+        self._connections = {}
+        self._lock = threading.RLock()
+        self._evicting = {}  # session id -> event set once it's saved (or kept)
+        self._reaper = None
+        self._stop_reaper = threading.Event()
+
+        # Metrics
+        self.created = 0
+        self.restored = 0
+        self.evicted = 0
+
+    def get(self, session_id):
+        """
+        Returns the interpreter for this session, restoring or creating it if needed.
+        """
+        if not valid_session_id.match(session_id):
+            raise ValueError(f"Invalid session ID: {session_id}")
+
+        while True:
+            with self._lock:
+                evicting = self._evicting.get(session_id)
+                if evicting is None:
+                    session = self.sessions.get(session_id)
+                    if session is None:
+                        session = self._load(session_id)
+                        if session is None:
+                            session = self._create(session_id)
+                            self.created += 1
+                        self.sessions[session_id] = session
+                    self.sessions.move_to_end(session_id)
+                    self._last_used[session_id] = time.time()
+                    break
+            # It's being saved, so wait to restore it (or get it back, if saving fails)
+            evicting.wait()
+
+        self._start_reaper()
+        self.evict_idle(keep=session_id)
+        return session
+
+    def connect(self, session_id):
+        """
+        Marks a client as connected to this session, so it won't be evicted.
+        """
+        session = self.get(session_id)
+        with self._lock:
+            self._connections[session_id] = self._connections.get(session_id, 0) + 1
+        return session
+
+    def disconnect(self, session_id):
+        with self._lock:
+            if self._connections.get(session_id, 0) > 1:
+                self._connections[session_id] -= 1
+            else:
+                self._connections.pop(session_id, None)
+            self._last_used[session_id] = time.time()
+
+    def is_busy(self, session_id):
+        with self._lock:
+            if self._connections.get(session_id):
+                return True
+            session = self.sessions.get(session_id)
+        respond_thread = getattr(session, "respond_thread", None)
+        return respond_thread is not None and respond_thread.is_alive()
+
+    def evict_idle(self, keep=None):
+        """
+        Saves and shuts down sessions that have been idle too long, then the least
+        recently used sessions until there are at most max_sessions in memory.
+        The session `keep` is never evicted.
+
+        Sessions are only picked while holding the lock; saving and shutting them
+        down happens after, so other sessions aren't held up meanwhile.
+        """
+        now = time.time()
+        with self._lock:
+            evicted = [
+                (session_id, self._take(session_id))
+                for session_id in list(self.sessions)
+                if now - self._last_used.get(session_id, now) > self.idle_timeout
+                and session_id != keep
+                and not self.is_busy(session_id)
+            ]
+
+            for session_id in list(self.sessions):
+                if len(self.sessions) <= self.max_sessions:
+                    break
+                if session_id != keep and not self.is_busy(session_id):
+                    evicted.append((session_id, self._take(session_id)))
+
+        for session_id, session in evicted:
+            # Evicting happens on behalf of other sessions' requests, which shouldn't fail because of it
+            try:
+                self._finish_evicting(session_id, session)
+            except:
+                self._report(
+                    f"Failed to save session {session_id}, keeping it in memory."
+                )
+
+    def evict(self, session_id):
+        """
+        Saves this session to disk and shuts it down.
+        If it can't be saved, it stays in memory and the error is raised.
+        """
+        with self._lock:
+            if session_id not in self.sessions or session_id in self._evicting:
+                return
+            session = self._take(session_id)
+        self._finish_evicting(session_id, session)
+
+    def _take(self, session_id):
+        # Removes a session from memory for evicting. Requests for it wait until it's saved
+        self._evicting[session_id] = threading.Event()
+        return self.sessions.pop(session_id)
+
+    def _finish_evicting(self, session_id, session):
+        try:
+            self._save(session_id, session)
+        except:
+            with self._lock:
+                self.sessions[session_id] = session
+                self.sessions.move_to_end(session_id, last=False)
+                self._evicting.pop(session_id).set()
+            raise
+
+        with self._lock:
+            self._last_used.pop(session_id, None)
+            self.evicted += 1
+            self._evicting.pop(session_id).set()
+        self._shut_down(session)
+
+    def delete(self, session_id):
+        """
+        Shuts down this session and forgets it, including anything saved to disk.
+        """
+        while True:
+            with self._lock:
+                evicting = self._evicting.get(session_id)
+                if evicting is None:
+                    session = self.sessions.pop(session_id, None)
+                    self._last_used.pop(session_id, None)
+                    self._connections.pop(session_id, None)
+                    try:
+                        os.remove(self._path(session_id))
+                    except FileNotFoundError:
+                        pass
+                    break
+            evicting.wait()
+
+        if session is not None:
+            self._shut_down(session)
+
+    def list(self):
+        with self._lock:
+            return [
+                {
+                    "id": session_id,
+                    "busy": self.is_busy(session_id),
+                    "idle_seconds": time.time() - self._last_used[session_id],
+                    "messages": len(session.messages),
+                }
+                for session_id, session in self.sessions.items()
+            ]
+
+    def shutdown(self):
+        """
+        Saves every session to disk and shuts them all down.
+        """
+        self._stop_reaper.set()
+        with self._lock:
+            session_ids = list(self.sessions)
+        for session_id in session_ids:
+            try:
+                self.evict(session_id)
+            except:
+                self._report(f"Failed to save session {session_id}.")
+                with self._lock:
+                    session = self.sessions.pop(session_id, None)
+                if session is not None:
+                    self._shut_down(session)
+
+    def _create(self, session_id):
+        session = self.factory()
+        session.id = session_id
+        session.worker_slots = self.worker_slots
+        return session
+
+    def _path(self, session_id):
+        return os.path.join(self.storage_path, session_id + ".json")
+
+    def _save(self, session_id, session):
+        data = {
+            "id": session_id,
+            "messages": session.messages,
+            "settings": {
+                name: getattr(session, name)
+                for name in session_settings
+                if hasattr(session, name)
+            },
+        }
+        os.makedirs(self.storage_path, exist_ok=True)
+        # Write to a temporary file first so a crash never leaves half a session behind
+        temp_path = self._path(session_id) + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(data, f, default=encode_bytes)
+        os.replace(temp_path, self._path(session_id))
+
+    def _load(self, session_id):
+        try:
+            with open(self._path(session_id)) as f:
+                data = json.load(f, object_hook=decode_bytes)
+            messages = data["messages"]
+            settings = dict(data.get("settings", {}))
+            if not isinstance(messages, list):
+                raise ValueError("Saved messages aren't a list")
+        except FileNotFoundError:
+            return None
+        except:
+            # One bad file shouldn't make the session unusable for good
+            self._report(f"Failed to restore session {session_id}, starting a new one.")
+            return None
+
+        session = self._create(session_id)
+        self.restored += 1
+        session.messages = messages
+        for name, value in settings.items():
+            setattr(session, name, value)
+        return session
+
+    def _report(self, message):
+        print(message)
+        if getattr(self.interpreter, "debug", False):
+            traceback.print_exc()
+
+    def _shut_down(self, session):
+        stop_event = getattr(session, "stop_event", None)
+        if stop_event is not None:
+            stop_event.set()
+        try:
+            session.computer.terminate()
+        except:
+            if getattr(self.interpreter, "debug", False):
+                print("Failed to shut down a session:\n", traceback.format_exc())
+
+    def _start_reaper(self):
+        if self._reaper is not None:
+            return
+        with self._lock:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap, daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        # Evicts idle sessions even when no requests are coming in
+        while not self._stop_reaper.wait(max(self.idle_timeout / 4, 1)):
+            try:
+                self.evict_idle()
+            except:
+                if getattr(self.interpreter, "debug", False):
+                    traceback.print_exc()
@@ -1,14 +1,433 @@
 # /root/open/interpreter/core/task_assignment.py
 
-from typing import List, Dict
-from interpreter.core.agent import Agent
+from typing import List, Dict, Callable, Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from interpreter.core.agent import Agent, MAX_HISTORY
+from interpreter.core.knowledge_store import KnowledgeStore
 from interpreter.core.openrouter_client import OpenRouterClient
 from flask_sqlalchemy import SQLAlchemy
+import itertools
 import json
+import os
+import re
+import threading
 import time
 
 db = SQLAlchemy()
 
+
+def append_record(column: Optional[str], record: Dict, limit: int = MAX_HISTORY) -> str:
+    """
+    Append a record to a JSON list stored in a text column, keeping only the last `limit` records.
+    """
+    records = json.loads(column) if column else []
+    records.append(record)
+    return json.dumps(records[-limit:])
+
+# The JSON the task analysis AI is asked to answer with
+ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'required_capabilities': {'type': 'array', 'items': {'type': 'string'}},
+        'complexity': {'type': 'string', 'enum': ['simple', 'moderate', 'complex']},
+        'needs_breakdown': {'type': 'boolean'},
+        'subtasks': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'id': {'type': 'string'},
+                    'description': {'type': 'string'},
+                    'depends_on': {'type': 'array', 'items': {'type': 'string'}},
+                },
+                'required': ['id', 'description'],
+            },
+        },
+    },
+    'required': ['required_capabilities', 'complexity', 'needs_breakdown', 'subtasks'],
+}
+
+
+def parse_analysis(content: str) -> Dict:
+    """
+    Parse a task analysis answered as JSON (see ANALYSIS_SCHEMA), possibly inside a code block or
+    surrounded by text. Raises ValueError if there's no JSON object or it doesn't fit the schema.
+    """
+    start, end = content.find('{'), content.rfind('}')
+    if start == -1 or end < start:
+        raise ValueError("The analysis isn't JSON.")
+    try:
+        data = json.loads(content[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"The analysis isn't valid JSON: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("The analysis isn't a JSON object.")
+    missing = [key for key in ANALYSIS_SCHEMA['required'] if key not in data]
+    if missing:
+        raise ValueError(f"The analysis is missing {', '.join(missing)}.")
+
+    capabilities = data['required_capabilities']
+    if not isinstance(capabilities, list) or not all(isinstance(capability, str) for capability in capabilities):
+        raise ValueError("required_capabilities must be a list of strings.")
+
+    complexity = str(data['complexity']).strip().lower()
+    if complexity not in ANALYSIS_SCHEMA['properties']['complexity']['enum']:
+        raise ValueError(f"Unknown complexity: {data['complexity']!r}")
+
+    # Not bool(), which would make "false" and "no" true
+    if not isinstance(data['needs_breakdown'], bool):
+        raise ValueError(f"needs_breakdown must be true or false, not {data['needs_breakdown']!r}")
+
+    if not isinstance(data['subtasks'], list):
+        raise ValueError("subtasks must be a list.")
+    subtask_schema = ANALYSIS_SCHEMA['properties']['subtasks']['items']
+    subtasks = []
+    for subtask in data['subtasks']:
+        if not isinstance(subtask, dict) or any(key not in subtask for key in subtask_schema['required']):
+            raise ValueError("Each subtask must have an id and a description.")
+        if not isinstance(subtask['description'], str) or not isinstance(subtask['id'], (str, int)):
+            raise ValueError("A subtask's id and description must be strings.")
+        depends_on = subtask.get('depends_on') or []
+        if not isinstance(depends_on, list):
+            raise ValueError("A subtask's depends_on must be a list of ids.")
+        subtasks.append({
+            'id': str(subtask['id']),
+            'description': subtask['description'],
+            'depends_on': [str(dependency) for dependency in depends_on],
+        })
+
+    needs_breakdown = data['needs_breakdown'] and bool(subtasks)
+    return {
+        'required_capabilities': [capability.strip() for capability in capabilities if capability.strip()],
+        'complexity': complexity,
+        'needs_breakdown': needs_breakdown,
+        'subtasks': subtasks if needs_breakdown else [],
+    }
+
+
+def parse_legacy_analysis(content: str) -> Dict:
+    """
+    Parse a task analysis answered as lines of "Label: value" (capabilities, complexity, whether to
+    break it down), followed by one subtask per line.
+    """
+    lines = [line.strip() for line in content.split('\n') if line.strip()]
+
+    def value(i):
+        return lines[i].split(':', 1)[1].strip() if i < len(lines) and ':' in lines[i] else ''
+
+    needs_breakdown = 'yes' in value(2).lower()
+    return {
+        'required_capabilities': [capability for capability in re.split(r',\s*', value(0)) if capability],
+        'complexity': value(1).lower() or 'simple',
+        'needs_breakdown': needs_breakdown,
+        'subtasks': lines[4:] if needs_breakdown else [],
+    }
+
+
+class AnalysisCache:
+    """
+    Task analyses by normalized task description, kept for `ttl` seconds. When several threads
+    ask for the analysis of the same task at once, it's only computed once.
+    """
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (time computed, Future of the analysis)
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(description: str) -> str:
+        return ' '.join(description.lower().split())
+
+    def get(self, description: str, compute: Callable[[], Dict]) -> Dict:
+        """
+        The cached analysis of a task, or compute() if there's none (or it expired).
+        """
+        key = self.key(description)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (not entry[1].done() or time.time() - entry[0] < self.ttl):
+                self.hits += 1
+                future = entry[1]
+                owner = False
+            else:
+                self.misses += 1
+                future = Future()
+                self._entries[key] = (time.time(), future)
+                owner = True
+                if len(self._entries) > self.max_entries:
+                    oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                    del self._entries[oldest]
+
+        if owner:
+            try:
+                future.set_result(compute())
+            except Exception as e:
+                with self._lock:
+                    if self._entries.get(key, (None, None))[1] is future:
+                        del self._entries[key]  # Not cached, so it's retried next time
+                future.set_exception(e)
+        return future.result()
+
+    def invalidate(self, description: str = None):
+        """
+        Forget the analysis of a task, or of every task.
+        """
+        with self._lock:
+            if description is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self.key(description), None)
+
+
+def normalize_subtasks(subtasks: List) -> Dict[str, Dict]:
+    """
+    Turn subtasks (descriptions, or dicts with 'description' and optionally 'id' and 'depends_on')
+    into progress entries by id, in their original order. Raises ValueError for unknown
+    dependencies and dependency cycles.
+    """
+    nodes = {}
+    for i, subtask in enumerate(subtasks):
+        if isinstance(subtask, str):
+            subtask = {'description': subtask}
+        subtask_id = str(subtask.get('id', i + 1))
+        if subtask_id in nodes:
+            raise ValueError(f"Duplicate subtask id: {subtask_id}")
+        nodes[subtask_id] = {
+            'id': subtask_id,
+            'description': subtask['description'],
+            'depends_on': [str(dependency) for dependency in subtask.get('depends_on', [])],
+            'status': 'pending',
+            'result': None,
+        }
+
+    for node in nodes.values():
+        for dependency in node['depends_on']:
+            if dependency not in nodes:
+                raise ValueError(f"Subtask {node['id']} depends on unknown subtask {dependency}")
+
+    # Every subtask must be reachable by completing its dependencies first
+    remaining = {subtask_id: len(node['depends_on']) for subtask_id, node in nodes.items()}
+    dependents = {subtask_id: [] for subtask_id in nodes}
+    for node in nodes.values():
+        for dependency in node['depends_on']:
+            dependents[dependency].append(node['id'])
+    ready = [subtask_id for subtask_id, count in remaining.items() if count == 0]
+    reached = 0
+    while ready:
+        subtask_id = ready.pop()
+        reached += 1
+        for dependent in dependents[subtask_id]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+    if reached != len(nodes):
+        raise ValueError("Subtask dependencies form a cycle.")
+
+    return nodes
+
+
+class SubtaskExecutor:
+    """
+    Runs a graph of subtasks on a bounded thread pool. A subtask starts as soon as every subtask
+    it depends on has completed, so independent subtasks run at the same time. If a subtask
+    fails, the subtasks that depend on it are skipped.
+    """
+
+    def __init__(self, run_subtask: Callable[[Dict, Dict], str], max_workers: int = 4):
+        self.run_subtask = run_subtask  # (subtask, {dependency id: result}) -> result
+        self.max_workers = max_workers
+
+    def run(self, subtasks: List, progress: Optional[Dict] = None) -> Dict[str, Dict]:
+        """
+        Run the subtasks and return their entries by id, in their original order. Entries are
+        put in `progress` right away and updated as each subtask starts, completes or fails.
+        """
+        nodes = normalize_subtasks(subtasks)
+        if progress is not None:
+            progress.update(nodes)
+
+        remaining = {subtask_id: len(node['depends_on']) for subtask_id, node in nodes.items()}
+        dependents = {subtask_id: [] for subtask_id in nodes}
+        for node in nodes.values():
+            for dependency in node['depends_on']:
+                dependents[dependency].append(node['id'])
+        ready = deque(subtask_id for subtask_id, count in remaining.items() if count == 0)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='subtask') as pool:
+            running = {}
+            while ready or running:
+                while ready:
+                    node = nodes[ready.popleft()]
+                    node['status'] = 'running'
+                    dependency_results = {dependency: nodes[dependency]['result'] for dependency in node['depends_on']}
+                    running[pool.submit(self.run_subtask, node, dependency_results)] = node['id']
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = nodes[running.pop(future)]
+                    try:
+                        node['result'] = future.result()
+                        node['status'] = 'completed'
+                    except Exception as e:
+                        node['result'] = f"Subtask failed: {e}"
+                        node['status'] = 'failed'
+                        self._skip_dependents(node, nodes, dependents)
+                        continue
+
+                    for dependent in dependents[node['id']]:
+                        remaining[dependent] -= 1
+                        if remaining[dependent] == 0 and nodes[dependent]['status'] == 'pending':
+                            ready.append(dependent)
+
+        return nodes
+
+    def _skip_dependents(self, node: Dict, nodes: Dict[str, Dict], dependents: Dict[str, List[str]]):
+        for dependent in dependents[node['id']]:
+            if nodes[dependent]['status'] == 'pending':
+                nodes[dependent]['status'] = 'skipped'
+                nodes[dependent]['result'] = f"Skipped because subtask {node['id']} failed."
+                self._skip_dependents(nodes[dependent], nodes, dependents)
+
+
+class AgentIndex:
+    """
+    Capabilities and roles of a lead agent's team, for finding the agents that can do a task without
+    looking at every agent. Each capability is given a bit, so an agent's capabilities are one
+    integer, and each capability knows which agents have it.
+
+    Agents' scores (from user feedback and task history) are kept up to date as records are
+    appended, only looking at the records added since the last time.
+
+    Agents tell the indexes of their teams when their capabilities, role or managed agents
+    change, and the team is indexed again on the next selection. Agents that can't (anything
+    but an Agent) need a call to refresh() after they change.
+    """
+
+    def __init__(self, lead_agent: Agent):
+        self.lead_agent = lead_agent
+        self.agents = []
+        self._scores = {}  # id(agent) -> [feedback list, feedback seen, history list, history seen, score]
+        self.refresh()
+
+    def refresh(self):
+        self._stale = False  # First, so changes made while indexing aren't missed
+        for agent in self.agents:
+            self._unwatch(agent)
+        self.agents = [self.lead_agent] + list(self.lead_agent.managed_agents)
+        self._bits = {}  # capability -> bit
+        self._positions = {}  # id(agent) -> position
+        self._agent_bits = []  # position -> capability bits
+        self._with_capability = {}  # capability -> positions of the agents that have it
+        self._with_role = {}  # role -> positions of the agents with it
+        for position, agent in enumerate(self.agents):
+            self._watch(agent)
+            bits = 0
+            for capability in agent.capabilities:
+                bit = self._bits.setdefault(capability, 1 << len(self._bits))
+                bits |= bit
+                self._with_capability.setdefault(capability, set()).add(position)
+            self._positions[id(agent)] = position
+            self._agent_bits.append(bits)
+            self._with_role.setdefault(agent.role, set()).add(position)
+
+    def invalidate(self):
+        """
+        Index the team again before the next selection.
+        """
+        self._stale = True
+
+    def _watch(self, agent: Agent):
+        indexes = getattr(agent, 'indexes', None)
+        if indexes is not None:
+            indexes.add(self)
+
+    def _unwatch(self, agent: Agent):
+        indexes = getattr(agent, 'indexes', None)
+        if indexes is not None:
+            indexes.discard(self)
+
+    def candidates(self, required_capabilities: List[str], roles: List[str] = None) -> List[Agent]:
+        """
+        The agents that have every required capability, and one of `roles` (if given), in team order.
+        """
+        if self._stale:
+            self.refresh()
+
+        positions = None
+        if required_capabilities:
+            try:
+                sets = sorted((self._with_capability[capability] for capability in set(required_capabilities)), key=len)
+            except KeyError:
+                return []  # Nobody has one of them
+            positions = sets[0].intersection(*sets[1:])
+        if roles is not None:
+            with_roles = set().union(*(self._with_role.get(role, ()) for role in roles))
+            positions = with_roles if positions is None else positions & with_roles
+        if positions is None:
+            return list(self.agents)
+        return [self.agents[position] for position in sorted(positions)]
+
+    def matching_capabilities(self, agent: Agent, required_capabilities: List[str]) -> int:
+        """
+        How many of the required capabilities the agent has.
+        """
+        position = self._positions.get(id(agent))
+        if position is None:
+            return len(set(agent.capabilities) & set(required_capabilities))
+        required = 0
+        for capability in required_capabilities:
+            required |= self._bits.get(capability, 0)
+        return bin(self._agent_bits[position] & required).count('1')
+
+    def score(self, agent: Agent) -> float:
+        """
+        The agent's score: +1 for each positive and -1 for each negative piece of user feedback,
+        and +0.5 for each completed task. Records dropped from bounded histories still count.
+        """
+        entry = self._scores.get(id(agent))
+        if (
+            entry is None
+            or entry[0] is not agent.user_feedback
+            or entry[2] is not agent.task_history
+            or self._appended(agent.user_feedback) < entry[1]
+            or self._appended(agent.task_history) < entry[3]
+        ):
+            # New, replaced or shortened records are scored from the start
+            entry = self._scores[id(agent)] = [agent.user_feedback, 0, agent.task_history, 0, 0.0]
+
+        new_feedback, entry[1] = self._new_records(agent.user_feedback, entry[1])
+        for feedback in new_feedback:
+            feedback = feedback['feedback'].lower()
+            if 'positive' in feedback:
+                entry[4] += 1
+            elif 'negative' in feedback:
+                entry[4] -= 1
+
+        new_tasks, entry[3] = self._new_records(agent.task_history, entry[3])
+        for task in new_tasks:
+            if task.get('status') == 'completed':
+                entry[4] += 0.5
+
+        return entry[4]
+
+    def _appended(self, records: List) -> int:
+        # Bounded histories (see BoundedList) count appends, as their length stops growing
+        return getattr(records, 'appended', len(records))
+
+    def _new_records(self, records: List, seen: int):
+        # The records appended since `seen` were counted, and how many have been counted now
+        appended = self._appended(records)
+        new = min(appended - seen, len(records))
+        return records[len(records) - new:], appended
+
+
 class TaskAssignmentSystem:
     def __init__(self, lead_agent: Agent, openrouter_client: OpenRouterClient):
         self.lead_agent = lead_agent
@@ -17,67 +436,82 @@ class TaskAssignmentSystem:
         self.openrouter_client = openrouter_client
         self.task_progress = {}
 
+        # Settings
+        self.max_concurrent_subtasks = int(os.getenv('INTERPRETER_MAX_CONCURRENT_SUBTASKS', '0')) or None  # None: one per agent
+        self.iteration_delay = 0  # Seconds to wait between iterations
+
+        self.agent_index = AgentIndex(lead_agent)
+        self.knowledge_store = KnowledgeStore()
+        self.analysis_cache = AnalysisCache(ttl=float(os.getenv('INTERPRETER_ANALYSIS_TTL', '3600')))
+
+        self._agents_available = threading.Condition()
+        self._task_ids = itertools.count()
+
     def analyze_task(self, task: Dict) -> Dict:
         """
         Analyze the task using AI to determine required capabilities, complexity, and subtasks.
+        Analyses are cached by task description, so they're shared by every step, iteration and
+        agent working on the task. The returned analysis is shared too, so don't modify it.
+        """
+        return self.analysis_cache.get(task['description'], lambda: self._analyze_task(task))
+
+    def invalidate_analysis(self, task: Dict = None):
+        """
+        Make the next analysis of a task (or of every task, if none is given) ask the AI again.
         """
+        self.analysis_cache.invalidate(task['description'] if task is not None else None)
+
+    def _analyze_task(self, task: Dict) -> Dict:
         prompt = f"""
         Analyze the following task and provide:
         1. A list of required capabilities
         2. The complexity level (simple, moderate, complex)
         3. Whether it needs to be broken down into subtasks
-        4. If subtasks are needed, provide a list of subtasks
+        4. If subtasks are needed, provide a list of subtasks, with the ids of the subtasks each one depends on
+
+        Answer with only a JSON object that follows this JSON schema:
+        {json.dumps(ANALYSIS_SCHEMA)}
 
         Task: {task['description']}
         """
         
         response = self.openrouter_client.chat_completion([
-            {"role": "system", "content": "You are a task analysis AI."},
+            {"role": "system", "content": "You are a task analysis AI. You answer in JSON."},
             {"role": "user", "content": prompt}
         ])
 
         # Parse the AI response to extract the required information
         analysis = response['choices'][0]['message']['content']
-        lines = analysis.split('\n')
-        capabilities = lines[0].split(':')[1].strip().split(', ')
-        complexity = lines[1].split(':')[1].strip()
-        needs_breakdown = 'yes' in lines[2].lower()
-        subtasks = []
-        if needs_breakdown:
-            subtasks = [line.strip() for line in lines[4:] if line.strip()]
-
-        return {
-            'required_capabilities': capabilities,
-            'complexity': complexity,
-            'needs_breakdown': needs_breakdown,
-            'subtasks': subtasks
-        }
+        if '{' not in analysis:
+            return parse_legacy_analysis(analysis)  # From models that ignore the requested format
+        return parse_analysis(analysis)
 
-    def select_agents(self, task: Dict) -> List[Agent]:
+    def select_agents(self, task: Dict, analysis: Dict = None) -> List[Agent]:
         """
         Select the most appropriate agent(s) for the given task based on capabilities, roles, and task complexity.
         """
-        analysis = self.analyze_task(task)
+        if analysis is None:
+            analysis = self.analyze_task(task)
         required_capabilities = analysis['required_capabilities']
         complexity = analysis['complexity']
-        
-        suitable_agents = []
 
-        for agent in [self.lead_agent] + self.lead_agent.managed_agents:
-            capability_match = all(cap in agent.capabilities for cap in required_capabilities)
-            complexity_match = (complexity == 'complex' and agent.role == 'specialized') or \
-                               (complexity == 'moderate' and agent.role in ['specialized', 'general']) or \
-                               (complexity == 'simple')
-            
-            if capability_match and complexity_match and agent.status == 'idle':
-                suitable_agents.append(agent)
+        # Complex tasks need specialized agents, moderate ones specialized or general agents
+        roles = {'complex': ['specialized'], 'moderate': ['specialized', 'general']}.get(complexity)
+        if roles is None and complexity != 'simple':
+            return []
+
+        suitable_agents = [
+            agent for agent in self.agent_index.candidates(required_capabilities, roles)
+            if agent.status == 'idle'
+            and all(cap in agent.capabilities for cap in required_capabilities)  # Capabilities may have been removed since
+        ]
 
         # Sort suitable agents by role, number of matching capabilities, and user feedback
         suitable_agents.sort(key=lambda a: (
             a.role == 'specialized',  # Specialized agents first
             a.role == 'general',      # Then general agents
             a.role == 'lead',         # Lead agent last
-            len(set(a.capabilities) & set(required_capabilities)),  # Then by number of matching capabilities
+            self.agent_index.matching_capabilities(a, required_capabilities),  # Then by number of matching capabilities
             self.calculate_agent_score(a)  # Then by agent score based on user feedback
         ), reverse=True)
 
@@ -86,21 +520,9 @@ class TaskAssignmentSystem:
     def calculate_agent_score(self, agent: Agent) -> float:
         """
         Calculate a score for the agent based on user feedback and task history.
+        Only feedback and tasks added since the agent was last scored are looked at.
         """
-        score = 0
-        for feedback in agent.user_feedback:
-            # Implement a scoring system based on feedback
-            # This is a simple example, you may want to implement a more sophisticated system
-            if 'positive' in feedback['feedback'].lower():
-                score += 1
-            elif 'negative' in feedback['feedback'].lower():
-                score -= 1
-        
-        # Consider task history
-        successful_tasks = sum(1 for task in agent.task_history if task['status'] == 'completed')
-        score += successful_tasks * 0.5  # Add 0.5 points for each successful task
-
-        return score
+        return self.agent_index.score(agent)
 
     def assign_task(self, task: Dict) -> Agent:
         """
@@ -109,37 +531,114 @@ class TaskAssignmentSystem:
         analysis = self.analyze_task(task)
         
         if analysis['needs_breakdown']:
-            subtasks = analysis['subtasks']
-            results = []
-            for subtask in subtasks:
-                subtask_result = self.execute_task({'description': subtask})
-                results.append(subtask_result)
+            subtasks = self.execute_subtasks(analysis['subtasks'])
+            results = [subtask['result'] for subtask in subtasks.values()]
             return self.lead_agent.summarize_results(results)
 
-        selected_agents = self.select_agents(task)
-        
-        if not selected_agents:
-            return None
-
         # Assign to the most suitable agent
-        assigned_agent = selected_agents[0]
-        assigned_agent.assign_task(task)
-        
-        # Update agent status in the database
-        with db.session.begin():
-            agent_model = db.session.query(AgentModel).get(assigned_agent.id)
-            agent_model.status = 'working'
-            agent_model.current_task = json.dumps(task)
-            db.session.commit()
+        assigned_agent = self.claim_agent(task, analysis)
+        if not assigned_agent:
+            return None
+        try:
+            assigned_agent.assign_task(task)
+            
+            # Update agent status in the database
+            with db.session.begin():
+                agent_model = db.session.query(AgentModel).get(assigned_agent.id)
+                agent_model.status = 'working'
+                agent_model.current_task = json.dumps(task)
+                db.session.commit()
+        except BaseException:
+            # Otherwise the agent would stay claimed, and tasks waiting for it would wait forever
+            self.release_agent(assigned_agent)
+            raise
 
         return assigned_agent
 
+    def claim_agent(self, task: Dict, analysis: Dict) -> Optional[Agent]:
+        """
+        Mark the most suitable idle agent as working and return it. If every suitable agent is busy,
+        wait for one to be released. Returns None if no agent can take the task.
+        """
+        with self._agents_available:
+            while True:
+                selected_agents = self.select_agents(task, analysis)
+                if selected_agents:
+                    selected_agents[0].status = 'working'
+                    return selected_agents[0]
+                agents = [self.lead_agent] + self.lead_agent.managed_agents
+                if not any(agent.status == 'working' for agent in agents):
+                    return None
+                self._agents_available.wait()
+
+    def release_agent(self, agent: Agent):
+        """
+        Mark an agent as idle again, and wake up any subtasks waiting for one.
+        """
+        with self._agents_available:
+            agent.status = 'idle'
+            self._agents_available.notify_all()
+
+    def execute_subtasks(self, subtasks: List, task_id: str = None) -> Dict[str, Dict]:
+        """
+        Execute subtasks concurrently across idle agents. Each subtask is a description, or a dict
+        with 'description', 'id' and 'depends_on' (ids of subtasks that must complete first, whose
+        results it's given). Progress is kept in task_progress[task_id]['subtasks'] as it happens.
+        Returns each subtask's entry, with its 'status' and 'result', by id.
+        """
+        standalone = task_id is None
+        if standalone:
+            task_id = self.new_task_id()
+            self.task_progress[task_id] = {'status': 'in_progress', 'results': []}
+        progress = self.task_progress[task_id].setdefault('subtasks', {})
+
+        def run_subtask(subtask: Dict, dependency_results: Dict) -> str:
+            subtask_task = {'description': subtask['description']}
+            if dependency_results:
+                subtask_task['dependency_results'] = {
+                    progress[dependency]['description']: result
+                    for dependency, result in dependency_results.items()
+                }
+            return self.execute_task(subtask_task)
+
+        max_workers = self.max_concurrent_subtasks or len([self.lead_agent] + self.lead_agent.managed_agents)
+        nodes = SubtaskExecutor(run_subtask, max_workers=max_workers).run(subtasks, progress)
+
+        if standalone:
+            failed = any(node['status'] != 'completed' for node in nodes.values())
+            self.task_progress[task_id]['status'] = 'failed' if failed else 'completed'
+            self.task_progress[task_id]['results'] = [node['result'] for node in nodes.values()]
+        return nodes
+
+    def share_knowledge(self, agents: List[Agent], key: str, content: str) -> str:
+        """
+        Give content to several agents at once. It's written to the knowledge store once, and each
+        agent's knowledge base only keeps a reference to it (its hash). Returns the hash.
+        """
+        content_hash = self.knowledge_store.add([agent.id if agent.id is not None else agent.name for agent in agents], key, content)
+        for agent in agents:
+            agent.knowledge_base[key] = content_hash
+        return content_hash
+
+    def get_knowledge(self, agent: Agent, key: str) -> Optional[str]:
+        """
+        The content an agent was given under `key`, if it still references it.
+        """
+        content_hash = agent.knowledge_base.get(key)
+        return self.knowledge_store.get(content_hash) if content_hash else None
+
+    def new_task_id(self) -> str:
+        """
+        A unique task ID, even for tasks started at the same time on different threads.
+        """
+        return f"{time.time()}-{next(self._task_ids)}"
+
     def execute_task(self, task: Dict, iterations: int = 1) -> str:
         """
         Execute the task using the assigned agent(s) and facilitate inter-agent communication.
         Supports multiple iterations as defined by the user.
         """
-        task_id = str(time.time())  # Use timestamp as a simple task ID
+        task_id = self.new_task_id()
         self.task_progress[task_id] = {
             'total_iterations': iterations,
             'current_iteration': 0,
@@ -155,7 +654,10 @@ class TaskAssignmentSystem:
                 self.task_progress[task_id]['status'] = 'failed'
                 return "No suitable agent found for the task."
 
-            result = assigned_agent.complete_task()
+            try:
+                result = assigned_agent.complete_task()
+            finally:
+                self.release_agent(assigned_agent)
             
             # If the assigned agent is not the lead agent, have the lead agent review and possibly enhance the result
             if assigned_agent != self.lead_agent:
@@ -189,36 +691,31 @@ class TaskAssignmentSystem:
                 self.task_progress[task_id]['agent_evaluation'] = evaluation
                 self.task_progress[task_id]['agent_optimization'] = optimization
 
-            # Update the knowledge base and persistent knowledge base of all agents with the task result
-            for agent in [self.lead_agent] + self.lead_agent.managed_agents:
-                agent.update_knowledge_base(f"task_{task['description'][:50]}", result)
+            # Share the task result with all agents (stored once, referenced by each)
+            self.share_knowledge([self.lead_agent] + self.lead_agent.managed_agents, f"task_{task['description'][:50]}", result)
 
             # Update agent status, task history, and persistent knowledge base in the database
             with db.session.begin():
                 agent_model = db.session.query(AgentModel).get(assigned_agent.id)
                 agent_model.status = 'idle'
                 agent_model.current_task = None
-                task_history = json.loads(agent_model.task_history)
-                task_history.append({
+                agent_model.task_history = append_record(agent_model.task_history, {
                     'task': task,
                     'result': result,
                     'timestamp': time.time()
                 })
-                agent_model.task_history = json.dumps(task_history)
                 agent_model.persistent_knowledge_base = json.dumps(assigned_agent.persistent_knowledge_base)
                 if assigned_agent.role == 'lead':
-                    self_critiques = json.loads(agent_model.self_critiques)
-                    self_critiques.append({
+                    agent_model.self_critiques = append_record(agent_model.self_critiques, {
                         'task_result': result,
                         'critique': critique,
                         'timestamp': time.time()
                     })
-                    agent_model.self_critiques = json.dumps(self_critiques)
                 db.session.commit()
 
-            # If this is not the last iteration, wait for a short time before the next iteration
-            if i < iterations - 1:
-                time.sleep(5)  # Wait for 5 seconds between iterations
+            # If this is not the last iteration, wait before the next iteration if configured to
+            if i < iterations - 1 and self.iteration_delay:
+                time.sleep(self.iteration_delay)
 
         self.task_progress[task_id]['status'] = 'completed'
         return self.task_progress[task_id]['results'][-1]  # Return the last result
@@ -275,7 +772,7 @@ class TaskAssignmentSystem:
         Coordinate a task that requires multiple agents to complete.
         Supports multiple iterations as defined by the user.
         """
-        task_id = str(time.time())  # Use timestamp as a simple task ID
+        task_id = self.new_task_id()
         self.task_progress[task_id] = {
             'total_iterations': iterations,
             'current_iteration': 0,
@@ -290,11 +787,9 @@ class TaskAssignmentSystem:
             if not analysis['needs_breakdown']:
                 return self.execute_task(task)
 
-            subtasks = analysis['subtasks']
-            results = []
-            for subtask in subtasks:
-                subtask_result = self.execute_task({'description': subtask})
-                results.append(subtask_result)
+            # Independent subtasks run at the same time, on whichever agents are idle
+            subtasks = self.execute_subtasks(analysis['subtasks'], task_id)
+            results = [subtask['result'] for subtask in subtasks.values()]
 
             # Have the lead agent coordinate and synthesize the results
             coordination_prompt = f"""
@@ -320,10 +815,15 @@ class TaskAssignmentSystem:
             critique = self.lead_agent.self_critique(final_result, self.openrouter_client)
             self.task_progress[task_id]['critique'] = critique
 
-            # Evaluate and optimize all involved agents
-            for agent in self.lead_agent.managed_agents:
+            # Evaluate and optimize all involved agents, in parallel (the client limits how many requests are in flight)
+            def evaluate_and_optimize(agent):
                 evaluation = self.lead_agent.evaluate_agent(agent, self.openrouter_client)
-                optimization = self.lead_agent.optimize_agent(agent, evaluation, self.openrouter_client)
+                return evaluation, self.lead_agent.optimize_agent(agent, evaluation, self.openrouter_client)
+
+            agents = list(self.lead_agent.managed_agents)
+            with ThreadPoolExecutor(max_workers=max(1, self.max_concurrent_subtasks or len(agents))) as executor:
+                outcomes = list(executor.map(evaluate_and_optimize, agents))
+            for agent, (evaluation, optimization) in zip(agents, outcomes):
                 if 'agent_evaluations' not in self.task_progress[task_id]:
                     self.task_progress[task_id]['agent_evaluations'] = {}
                 if 'agent_optimizations' not in self.task_progress[task_id]:
@@ -337,31 +837,27 @@ class TaskAssignmentSystem:
                 'result': final_result,
                 'timestamp': time.time()
             })
-            self.lead_agent.update_knowledge_base(f"multi_agent_task_{task['description'][:50]}", final_result)
+            self.share_knowledge([self.lead_agent], f"multi_agent_task_{task['description'][:50]}", final_result)
 
             # Update lead agent's task history, persistent knowledge base, and self-critiques in the database
             with db.session.begin():
                 lead_agent_model = db.session.query(AgentModel).get(self.lead_agent.id)
-                task_history = json.loads(lead_agent_model.task_history)
-                task_history.append({
+                lead_agent_model.task_history = append_record(lead_agent_model.task_history, {
                     'task': task,
                     'result': final_result,
                     'timestamp': time.time()
                 })
-                lead_agent_model.task_history = json.dumps(task_history)
                 lead_agent_model.persistent_knowledge_base = json.dumps(self.lead_agent.persistent_knowledge_base)
-                self_critiques = json.loads(lead_agent_model.self_critiques)
-                self_critiques.append({
+                lead_agent_model.self_critiques = append_record(lead_agent_model.self_critiques, {
                     'task_result': final_result,
                     'critique': critique,
                     'timestamp': time.time()
                 })
-                lead_agent_model.self_critiques = json.dumps(self_critiques)
                 db.session.commit()
 
-            # If this is not the last iteration, wait for a short time before the next iteration
-            if i < iterations - 1:
-                time.sleep(5)  # Wait for 5 seconds between iterations
+            # If this is not the last iteration, wait before the next iteration if configured to
+            if i < iterations - 1 and self.iteration_delay:
+                time.sleep(self.iteration_delay)
 
         self.task_progress[task_id]['status'] = 'completed'
         return self.task_progress[task_id]['results'][-1]  # Return the last result
@@ -416,18 +912,16 @@ class TaskAssignmentSystem:
         })
 
         # Update the lead agent's knowledge base with the feedback
-        self.lead_agent.update_knowledge_base(f"feedback_task_{task_id}", feedback)
+        self.share_knowledge([self.lead_agent], f"feedback_task_{task_id}", feedback)
 
         # Store the feedback in the database
         with db.session.begin():
             lead_agent_model = db.session.query(AgentModel).get(self.lead_agent.id)
-            user_feedback = json.loads(lead_agent_model.user_feedback)
-            user_feedback.append({
+            lead_agent_model.user_feedback = append_record(lead_agent_model.user_feedback, {
                 'task_id': task_id,
                 'feedback': feedback,
                 'timestamp': time.time()
             })
-            lead_agent_model.user_feedback = json.dumps(user_feedback)
             db.session.commit()
 
         return True
@@ -0,0 +1,105 @@
+class BoundedList(list):
+    """
+    A list that keeps only its last `maxlen` items, like a ring buffer, but still slices and
+    serializes to JSON like a list. `appended` counts every item ever added, so readers can
+    tell what's new even once old items are dropped.
+    """
+
+    def __init__(self, items=(), maxlen=100):
+        super().__init__(items)
+        self.maxlen = maxlen
+        self.appended = len(self)
+        self._trim()
+
+    def append(self, item):
+        super().append(item)
+        self.appended += 1
+        self._trim()
+
+    def extend(self, items):
+        before = len(self)
+        super().extend(items)
+        self.appended += len(self) - before
+        self._trim()
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def insert(self, index, item):
+        super().insert(index, item)
+        self.appended += 1
+        self._trim()
+
+    def _trim(self):
+        if self.maxlen is not None and len(self) > self.maxlen:
+            del self[: len(self) - self.maxlen]
+
+
+class BoundedDict(dict):
+    """
+    A dict that keeps only its `maxlen` most recently set keys.
+    """
+
+    def __init__(self, items=(), maxlen=100):
+        super().__init__()
+        self.maxlen = maxlen
+        self.update(items)
+
+    def __setitem__(self, key, value):
+        self.pop(key, None)  # Setting a key again makes it the newest
+        super().__setitem__(key, value)
+        if self.maxlen is not None:
+            while len(self) > self.maxlen:
+                del self[next(iter(self))]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+
+class WatchedList(list):
+    """
+    A list that calls `on_change` after anything changes it, so whatever is derived from
+    its items knows to look again.
+    """
+
+    def __init__(self, items=(), on_change=None):
+        super().__init__(items)
+        self.on_change = on_change
+
+
+def _watched(name):
+    change = getattr(list, name)
+
+    def changed(self, *args, **kwargs):
+        result = change(self, *args, **kwargs)
+        if self.on_change is not None:
+            self.on_change()
+        return result
+
+    changed.__name__ = name
+    return changed
+
+
+for name in [
+    "append",
+    "extend",
+    "insert",
+    "remove",
+    "pop",
+    "clear",
+    "sort",
+    "reverse",
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+]:
+    setattr(WatchedList, name, _watched(name))
+del name
@@ -0,0 +1,40 @@
+import random
+
+
+def is_retryable(error):
+    # Rate limits, timeouts, dropped connections and server errors, from LiteLLM, requests,
+    # the Anthropic SDK, or anything shaped like them
+    status = getattr(error, "status_code", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+    if status == 429 or (isinstance(status, int) and status >= 500):
+        return True
+    name = type(error).__name__
+    return any(
+        kind in name
+        for kind in [
+            "RateLimit",
+            "Timeout",
+            "ConnectionError",
+            "ServiceUnavailable",
+            "InternalServerError",
+        ]
+    )
+
+
+def retry_after(error):
+    try:
+        return float(error.response.headers["retry-after"])
+    except:
+        return None
+
+
+def backoff_delay(error, attempt, backoff, max_backoff):
+    """
+    How long to wait before retrying: what the server asked for, or exponential backoff with
+    jitter (so clients that failed together don't retry together).
+    """
+    delay = retry_after(error)
+    if delay is None:
+        delay = min(backoff * 2**attempt, max_backoff) * random.uniform(0.5, 1)
+    return delay
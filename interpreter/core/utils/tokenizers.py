@@ -0,0 +1,97 @@
+import threading
+
+try:
+    import tiktoken
+except:
+    tiktoken = None  # Token counts fall back to estimates
+
+_lock = threading.Lock()
+_encodings = {}  # model -> encoding, or None if it couldn't be loaded
+
+# Without a tokenizer, this many characters count as a token
+CHARS_PER_TOKEN = 4
+
+
+def model_name(model):
+    # Models like "openai/gpt-4o" are known to tiktoken without the provider
+    return (model or "gpt-4").split("/")[-1]
+
+
+def register_encoding(model, encoding):
+    """
+    Uses `encoding` (anything with tiktoken's encode and decode) for a model.
+    """
+    with _lock:
+        _encodings[model_name(model)] = encoding
+
+
+def get_encoding(model=None):
+    """
+    Returns the tiktoken encoding for a model, loaded once per process and shared by every
+    thread. Unknown models get cl100k_base. Returns None if tiktoken, or its vocabulary
+    (which is downloaded on first use), isn't available.
+    """
+    name = model_name(model)
+    try:
+        return _encodings[name]
+    except KeyError:
+        pass
+    with _lock:
+        if name not in _encodings:
+            _encodings[name] = _load(name)
+        return _encodings[name]
+
+
+def _load(name):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(name)
+    except KeyError:
+        pass
+    except:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except:
+        return None
+
+
+def count_tokens(text, model=None):
+    """
+    Counts the tokens in a string, or estimates them if there's no tokenizer.
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def iter_chunks(text, tokens, overlap=0, model=None):
+    """
+    Yields chunks of `text` of up to `tokens` tokens, each starting `tokens - overlap`
+    tokens after the last.
+
+    The text is tokenized once, and each chunk is decoded from its slice of the tokens,
+    so nothing is re-tokenized. Without a tokenizer, chunks are cut by characters.
+    """
+    step = max(tokens - overlap, 1)
+
+    encoding = get_encoding(model)
+    if encoding is not None:
+        try:
+            ids = encoding.encode(text, disallowed_special=())
+        except:
+            encoding = None
+
+    if encoding is None:
+        for i in range(0, len(text), step * CHARS_PER_TOKEN):
+            yield text[i : i + tokens * CHARS_PER_TOKEN]
+            if i + tokens * CHARS_PER_TOKEN >= len(text):
+                return
+        return
+
+    for i in range(0, len(ids), step):
+        yield encoding.decode(ids[i : i + tokens])
+        if i + tokens >= len(ids):
+            return  # The rest is already in this chunk
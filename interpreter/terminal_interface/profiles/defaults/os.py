@@ -59,6 +59,7 @@ computer.clipboard.view() # Returns contents of clipboard
 computer.os.get_selected_text() # Use frequently. If editing text, the user often wants this
 
 {{
+# cache
 import platform
 if platform.system() == 'Darwin':
         print('''
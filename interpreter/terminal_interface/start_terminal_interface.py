@@ -574,6 +574,8 @@ Use """ to write multi-line messages.
         interpreter.plain_text_display = True
         interpreter.chat(stdin_input)
     else:
+        # Start the Python kernel while the user types their first message
+        interpreter.computer.terminal.warm_pool.start()
         interpreter.chat()
 
 
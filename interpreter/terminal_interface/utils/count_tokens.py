@@ -1,5 +1,6 @@
+from ...core.utils.tokenizers import get_encoding
+
 try:
-    import tiktoken
     from litellm import cost_per_token
 except:
     # Non-essential feature
@@ -11,20 +12,11 @@ def count_tokens(text="", model="gpt-4"):
     Count the number of tokens in a string
     """
     try:
-        # Fix bug where models starting with openai/ for example can't find tokenizer
-        if "/" in model:
-            model = model.split("/")[-1]
-
-        # At least give an estimate if we can't find the tokenizer
-        try:
-            encoder = tiktoken.encoding_for_model(model)
-        except KeyError:
-            print(
-                f"Could not find tokenizer for {model}. Defaulting to gpt-4 tokenizer."
-            )
-            encoder = tiktoken.encoding_for_model("gpt-4")
-
-        return len(encoder.encode(text))
+        # The tokenizer is loaded once and shared (unknown models get the gpt-4 tokenizer)
+        encoding = get_encoding(model)
+        if encoding is None:
+            return 0
+        return len(encoding.encode(text, disallowed_special=()))
     except:
         # Non-essential feature
         return 0
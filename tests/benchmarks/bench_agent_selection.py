@@ -0,0 +1,123 @@
+"""
+TaskAssignmentSystem.select_agents: the original scan of every agent vs. AgentIndex.
+
+5,000 synthetic agents with 3-8 of 300 capabilities, and 200 pieces of feedback and 200 past
+tasks each. Analyses are passed in, so no LLM is called. The index is timed cold (scoring each
+agent's records for the first time) and warm, with a new record appended to every candidate
+between selections, like a running system would. Warm selections must take under a
+millisecond.
+
+    python tests/benchmarks/bench_agent_selection.py
+"""
+
+import random
+import time
+
+from interpreter.core.agent import Agent
+from interpreter.core.task_assignment import TaskAssignmentSystem
+
+
+class SyntheticAgent(Agent):
+    def __init__(self, rng, i, capabilities):
+        super().__init__(f"agent{i}")
+        self.id = i
+        self.role = "lead" if i == 0 else rng.choice(["general", "specialized"])
+        self.status = "idle"
+        self.capabilities = rng.sample(capabilities, rng.randint(3, 8))
+        self.managed_agents = []
+        self.user_feedback = [
+            {"feedback": rng.choice(["Positive, thanks", "negative: too slow", "ok"])}
+            for _ in range(200)
+        ]
+        self.task_history = [
+            {"status": rng.choice(["completed", "failed"])} for _ in range(200)
+        ]
+
+
+def original_select_agents(lead_agent, analysis):
+    required_capabilities = analysis["required_capabilities"]
+    complexity = analysis["complexity"]
+    suitable_agents = []
+    for agent in [lead_agent] + lead_agent.managed_agents:
+        capability_match = all(
+            cap in agent.capabilities for cap in required_capabilities
+        )
+        complexity_match = (
+            (complexity == "complex" and agent.role == "specialized")
+            or (complexity == "moderate" and agent.role in ["specialized", "general"])
+            or (complexity == "simple")
+        )
+        if capability_match and complexity_match and agent.status == "idle":
+            suitable_agents.append(agent)
+
+    def score(agent):
+        score = 0
+        for feedback in agent.user_feedback:
+            if "positive" in feedback["feedback"].lower():
+                score += 1
+            elif "negative" in feedback["feedback"].lower():
+                score -= 1
+        return (
+            score
+            + sum(1 for task in agent.task_history if task["status"] == "completed")
+            * 0.5
+        )
+
+    suitable_agents.sort(
+        key=lambda a: (
+            a.role == "specialized",
+            a.role == "general",
+            a.role == "lead",
+            len(set(a.capabilities) & set(required_capabilities)),
+            score(a),
+        ),
+        reverse=True,
+    )
+    return suitable_agents
+
+
+def main():
+    rng = random.Random(0)
+    capabilities = [f"capability_{i}" for i in range(300)]
+    agents = [SyntheticAgent(rng, i, capabilities) for i in range(5000)]
+    lead_agent = agents[0]
+    lead_agent.managed_agents = agents[1:]
+    system = TaskAssignmentSystem(lead_agent, openrouter_client=None)
+
+    analyses = [
+        {
+            "required_capabilities": rng.sample(capabilities, rng.randint(1, 2)),
+            "complexity": rng.choice(["simple", "moderate", "complex"]),
+        }
+        for _ in range(200)
+    ]
+
+    start = time.perf_counter()
+    expected = [
+        original_select_agents(lead_agent, analysis) for analysis in analyses[:20]
+    ]
+    original = (time.perf_counter() - start) / 20
+
+    for analysis, agents_expected in zip(analyses, expected):
+        assert system.select_agents(None, analysis) == agents_expected
+
+    start = time.perf_counter()
+    for analysis in analyses:
+        system.select_agents(None, analysis)
+    cold = (time.perf_counter() - start) / len(analyses)
+
+    start = time.perf_counter()
+    for analysis in analyses:
+        for agent in system.select_agents(None, analysis):
+            agent.task_history.append({"status": "completed"})
+    indexed = (time.perf_counter() - start) / len(analyses)
+
+    print(f"{'agents':>7} {'original':>12} {'index, cold':>12} {'index':>12}")
+    print(
+        f"{len(agents):>7} {original * 1000:>10.2f}ms {cold * 1000:>10.3f}ms {indexed * 1000:>10.3f}ms"
+    )
+    assert indexed < 0.001, f"Warm selections took {indexed * 1000:.3f}ms"
+
+
+if __name__ == "__main__":
+    main()
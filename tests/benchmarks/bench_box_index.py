@@ -0,0 +1,131 @@
+"""
+Icon box filtering in point.find_icon: the original per-box loops vs. BoxIndex.
+
+Synthetic 1080p and 4K screens with 5,000 contour boxes and 2,000 OCR text blocks.
+Times the "inside text" and "touches text" filters and the overlap merge.
+
+    python tests/benchmarks/bench_box_index.py
+"""
+
+import random
+import time
+
+from interpreter.core.computer.display.point.box_index import (
+    BoxIndex,
+    boxes_to_array,
+    combine_boxes,
+)
+
+CONTOURS = 5000
+TEXT_BLOCKS = 2000
+
+
+def synthetic_screen(width, height):
+    boxes = [
+        {
+            "x": random.randint(0, width - 60),
+            "y": random.randint(0, height - 60),
+            "width": random.randint(10, 60),
+            "height": random.randint(10, 60),
+        }
+        for _ in range(CONTOURS)
+    ]
+    blocks = [
+        {
+            "left": random.randint(0, width - 200),
+            "top": random.randint(0, height - 20),
+            "width": random.randint(20, 200),
+            "height": random.randint(10, 20),
+        }
+        for _ in range(TEXT_BLOCKS)
+    ]
+    return boxes, blocks
+
+
+def original_filters(boxes, blocks):
+    boxes = [
+        box
+        for box in boxes
+        if not any(
+            t["left"] <= box["x"] <= t["left"] + t["width"]
+            and t["top"] <= box["y"] <= t["top"] + t["height"]
+            and t["left"] <= box["x"] + box["width"] <= t["left"] + t["width"]
+            and t["top"] <= box["y"] + box["height"] <= t["top"] + t["height"]
+            for t in blocks
+        )
+    ]
+    return [
+        box
+        for box in boxes
+        if not any(
+            max(t["left"], box["x"])
+            < min(t["left"] + t["width"], box["x"] + box["width"])
+            and max(t["top"], box["y"])
+            < min(t["top"] + t["height"], box["y"] + box["height"])
+            for t in blocks
+        )
+    ]
+
+
+def indexed_filters(boxes, blocks):
+    index = BoxIndex(blocks, keys=("left", "top", "width", "height"))
+    inside = index.contains(boxes_to_array(boxes))
+    boxes = [box for box, is_text in zip(boxes, inside) if not is_text]
+    touches = index.intersects(boxes_to_array(boxes))
+    return [box for box, is_text in zip(boxes, touches) if not is_text]
+
+
+def original_combine(boxes):
+    while True:
+        combined_boxes = []
+        for box in boxes:
+            for c in combined_boxes:
+                if (
+                    box["x"] < c["x"] + c["width"]
+                    and box["x"] + box["width"] > c["x"]
+                    and box["y"] < c["y"] + c["height"]
+                    and box["y"] + box["height"] > c["y"]
+                ):
+                    c["x"] = min(box["x"], c["x"])
+                    c["y"] = min(box["y"], c["y"])
+                    c["width"] = (
+                        max(box["x"] + box["width"], c["x"] + c["width"]) - c["x"]
+                    )
+                    c["height"] = (
+                        max(box["y"] + box["height"], c["y"] + c["height"]) - c["y"]
+                    )
+                    break
+            else:
+                combined_boxes.append(box.copy())
+        if len(combined_boxes) == len(boxes):
+            return combined_boxes
+        boxes = combined_boxes
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    random.seed(0)
+    print(f"{'screen':>8} {'step':>8} {'original s':>11} {'indexed s':>10} {'same':>5}")
+    for label, width, height in [("1080p", 1920, 1080), ("4K", 3840, 2160)]:
+        boxes, blocks = synthetic_screen(width, height)
+
+        expected, original_time = timed(original_filters, boxes, blocks)
+        result, indexed_time = timed(indexed_filters, boxes, blocks)
+        print(
+            f"{label:>8} {'filter':>8} {original_time:>11.3f} {indexed_time:>10.3f} {str(result == expected):>5}"
+        )
+
+        expected, original_time = timed(original_combine, [b.copy() for b in boxes])
+        result, indexed_time = timed(combine_boxes, boxes)
+        print(
+            f"{label:>8} {'combine':>8} {original_time:>11.3f} {indexed_time:>10.3f} {str(result == expected):>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Per-turn trimming overhead: tokentrim vs. the incremental ContextTrimmer.
+
+Simulates a conversation of N messages that grows by one message per turn and
+times how long each turn spends trimming the history to the context window.
+
+    python tests/benchmarks/bench_context_trimmer.py
+"""
+
+import random
+import statistics
+import time
+
+import tokentrim as tt
+
+from interpreter.core.llm.utils.context_trimmer import ContextTrimmer
+
+WORDS = (
+    "the quick brown fox jumps over a lazy dog while print return import def".split()
+)
+
+
+def random_message(i):
+    role = "user" if i % 2 == 0 else "assistant"
+    content = " ".join(random.choices(WORDS, k=random.randint(20, 200)))
+    return {"role": role, "content": content}
+
+
+def time_turns(trim, history, turns=10):
+    timings = []
+    for i in range(turns):
+        history.append(random_message(len(history)))
+        start = time.perf_counter()
+        trim(history)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    random.seed(0)
+    system_message = "You are Open Interpreter."
+    max_tokens = 128000
+
+    print(f"{'history':>8} {'tokentrim ms/turn':>18} {'ContextTrimmer ms/turn':>23}")
+    for size in [100, 1000, 10000]:
+        history = [random_message(i) for i in range(size)]
+
+        baseline = time_turns(
+            lambda m: tt.trim(
+                list(m), system_message=system_message, max_tokens=max_tokens
+            ),
+            list(history),
+        )
+
+        trimmer = ContextTrimmer(model="gpt-4o")
+        trimmer.trim(history, system_message=system_message, max_tokens=max_tokens)
+        incremental = time_turns(
+            lambda m: trimmer.trim(
+                m, system_message=system_message, max_tokens=max_tokens
+            ),
+            list(history),
+        )
+
+        print(
+            f"{size:>8} {statistics.median(baseline) * 1000:>18.2f} {statistics.median(incremental) * 1000:>23.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
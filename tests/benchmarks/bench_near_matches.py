@@ -0,0 +1,83 @@
+"""
+"Did you mean" suggestions for Files.edit: the original sliding-window difflib search vs. TextIndex.
+
+Synthetic Python source files of 100 KB to 10 MB. The phrase is a function body with a typo
+in it, as an LLM might misremember it. The original search is only timed on 100 KB; beyond
+that its time grows linearly, so it's extrapolated.
+
+    python tests/benchmarks/bench_near_matches.py
+"""
+
+import difflib
+import random
+import time
+
+from interpreter.core.computer.files.text_index import TextIndex
+
+
+def original_search(original_text, filedata, n=3):
+    words = filedata.split()
+    original_words = original_text.split()
+    len_original = len(original_words)
+
+    matches = []
+    for i in range(len(words) - len_original + 1):
+        phrase = " ".join(words[i : i + len_original])
+        similarity = difflib.SequenceMatcher(None, original_text, phrase).ratio()
+        matches.append((similarity, phrase))
+
+    matches.sort(reverse=True)
+    return [match[1] for match in matches[:n]]
+
+
+def synthetic_source(size, seed=0):
+    rng = random.Random(seed)
+    names = ["value", "result", "items", "total", "index", "config", "buffer", "node"]
+    lines = []
+    length = 0
+    f = 0
+    while length < size:
+        a, b, c = rng.sample(names, 3)
+        function = [
+            f"def handle_{f}({a}, {b}):",
+            f'    """Handles case {f}."""',
+            f"    {c} = [{a}[i] + {b} for i in range({rng.randint(2, 99)})]",
+            f"    if len({c}) > {rng.randint(0, 50)}:",
+            f"        return sum({c}) * {rng.randint(0, 9)}",
+            f"    return {c}",
+            "",
+        ]
+        lines += function
+        length += sum(len(line) + 1 for line in function)
+        f += 1
+    return "\n".join(lines), lines
+
+
+def main():
+    print(f"{'size':>8} {'original':>12} {'index':>10} {'found':>7}")
+    for size in [100_000, 1_000_000, 10_000_000]:
+        text, lines = synthetic_source(size)
+        target = (len(lines) // 7 * 2 // 3) * 7  # A function two thirds of the way in
+        phrase = "\n".join(lines[target : target + 5]).replace("return", "retrun", 1)
+
+        start = time.perf_counter()
+        matches = TextIndex(text).near_matches(phrase)
+        indexed = time.perf_counter() - start
+        found = matches and matches[0]["line"] == target + 1
+
+        if size <= 100_000:
+            start = time.perf_counter()
+            original_search(phrase, text)
+            original = time.perf_counter() - start
+            original_per_byte = original / size
+            original = f"{original:.2f}s"
+        else:
+            original = f"~{original_per_byte * size:.0f}s"
+
+        print(
+            f"{size // 1000:>6}KB {original:>12} {indexed:>9.3f}s {str(bool(found)):>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
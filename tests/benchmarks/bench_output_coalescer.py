@@ -0,0 +1,67 @@
+"""
+Websocket frames and event loop CPU per 1,000 streamed tokens, with and without output batching.
+
+Tokens are produced by a thread (like the interpreter's respond thread) and each output
+is JSON encoded and "sent" the way the websocket endpoint does it.
+
+    python tests/benchmarks/bench_output_coalescer.py
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+from interpreter.core.output_coalescer import OutputCoalescer
+
+TOKENS = 2000
+TOKEN_INTERVAL = 0.001  # Seconds between tokens from the LLM
+END = "end"
+
+
+def produce(loop, queue):
+    for i in range(TOKENS):
+        chunk = {"role": "assistant", "type": "message", "content": f"tok{i} "}
+        loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        time.sleep(TOKEN_INTERVAL)
+    loop.call_soon_threadsafe(queue.put_nowait, END)
+
+
+async def run(coalescer):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    threading.Thread(target=produce, args=(loop, queue)).start()
+
+    frames = 0
+    start_wall = time.perf_counter()
+    start_cpu = time.thread_time()  # The event loop thread only
+    output = await queue.get()
+    while output is not END:
+        next_output = None
+        if coalescer is not None:
+            output, next_output = await coalescer.collect(output, queue.get_nowait)
+        json.dumps(output)  # What send_text would encode
+        frames += 1
+        output = next_output if next_output is not None else await queue.get()
+    wall = time.perf_counter() - start_wall
+    cpu = time.thread_time() - start_cpu
+    return frames, wall, cpu
+
+
+def main():
+    print(
+        f"{'mode':>16} {'frames':>8} {'frames/s':>10} {'frames/1k tokens':>17} {'loop CPU ms/1k tokens':>22}"
+    )
+    for label, coalescer in [
+        ("unbatched", None),
+        ("10ms window", OutputCoalescer(window=0.01)),
+        ("30ms window", OutputCoalescer(window=0.03)),
+    ]:
+        frames, wall, cpu = asyncio.run(run(coalescer))
+        print(
+            f"{label:>16} {frames:>8} {frames / wall:>10.0f} {frames * 1000 / TOKENS:>17.0f} {cpu * 1000 * 1000 / TOKENS:>22.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
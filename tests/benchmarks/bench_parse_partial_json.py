@@ -0,0 +1,71 @@
+"""
+Streaming a large code block through tool call argument parsing:
+parse_partial_json (re-parses everything per delta) vs. PartialJsonParser.
+
+    python tests/benchmarks/bench_parse_partial_json.py
+"""
+
+import json
+import random
+import time
+
+from interpreter.core.llm.utils.parse_partial_json import (
+    PartialJsonParser,
+    parse_partial_json,
+)
+
+
+def make_arguments(size):
+    random.seed(0)
+    lines = []
+    while sum(len(line) + 1 for line in lines) < size:
+        lines.append(
+            "    " * random.randint(0, 3)
+            + f'value_{len(lines)} = compute("{random.random()}")  # step'
+        )
+    return json.dumps({"language": "python", "code": "\n".join(lines)})
+
+
+def deltas(arguments, delta_size=4):
+    # Roughly one token per delta, like a real stream
+    return [arguments[i : i + delta_size] for i in range(0, len(arguments), delta_size)]
+
+
+def bench_full_reparse(arguments):
+    accumulated = ""
+    for delta in deltas(arguments):
+        accumulated += delta
+        parse_partial_json(accumulated)
+
+
+def bench_incremental(arguments):
+    # Mirrors how run_tool_calling_llm uses it
+    parser = PartialJsonParser()
+    accumulated = ""
+    yielded_code_length = 0
+    for delta in deltas(arguments):
+        accumulated += delta
+        parser.feed(accumulated[parser.consumed :])
+        yielded_code_length += len(parser.text_since("code", yielded_code_length))
+
+
+def main():
+    for size in [5_000, 20_000, 50_000]:
+        arguments = make_arguments(size)
+
+        start = time.perf_counter()
+        bench_incremental(arguments)
+        incremental = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bench_full_reparse(arguments)
+        full_reparse = time.perf_counter() - start
+
+        print(
+            f"{size // 1000:>3} KB code block, {len(deltas(arguments))} deltas: "
+            f"parse_partial_json {full_reparse:.2f}s, PartialJsonParser {incremental * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
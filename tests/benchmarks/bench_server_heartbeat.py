@@ -0,0 +1,88 @@
+"""
+Heartbeat latency while a chat completion streams from the same server.
+
+Starts the AsyncInterpreter server with a fake LLM that blocks for 50ms per chunk,
+streams a completion from /openai/chat/completions, and meanwhile polls /heartbeat
+from several clients. If the completion ran on the event loop, each heartbeat would
+wait for the whole completion to finish.
+
+    python tests/benchmarks/bench_server_heartbeat.py
+"""
+
+import json
+import statistics
+import threading
+import time
+import urllib.request
+
+from interpreter.core.async_core import AsyncInterpreter
+
+PORT = 8123
+CHUNKS = 60
+HEARTBEAT_CLIENTS = 8
+
+
+def fake_chat(message=None, stream=False, display=False):
+    for i in range(CHUNKS):
+        time.sleep(0.05)  # Waiting on the LLM
+        yield {"role": "assistant", "type": "message", "content": f"token{i} "}
+
+
+def stream_completion():
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{PORT}/openai/chat/completions",
+        data=json.dumps(
+            {"messages": [{"role": "user", "content": "Hi"}], "stream": True}
+        ).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        for _ in response:
+            pass
+
+
+def poll_heartbeat(latencies, done):
+    while not done.is_set():
+        start = time.perf_counter()
+        urllib.request.urlopen(f"http://127.0.0.1:{PORT}/heartbeat").read()
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.01)
+
+
+def measure(streaming):
+    latencies = []
+    done = threading.Event()
+    pollers = [
+        threading.Thread(target=poll_heartbeat, args=(latencies, done))
+        for _ in range(HEARTBEAT_CLIENTS)
+    ]
+    for poller in pollers:
+        poller.start()
+    if streaming:
+        stream_completion()
+    else:
+        time.sleep(CHUNKS * 0.05)
+    done.set()
+    for poller in pollers:
+        poller.join()
+    return latencies
+
+
+def main():
+    interpreter = AsyncInterpreter()
+    interpreter.chat = fake_chat
+    interpreter.server.port = PORT
+    threading.Thread(target=interpreter.server.run, daemon=True).start()
+    time.sleep(2)
+
+    print(f"{'':>22} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for label, streaming in [("idle", False), ("while streaming", True)]:
+        latencies = sorted(measure(streaming))
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(
+            f"{label:>22} {statistics.median(latencies) * 1000:>8.1f} {p99 * 1000:>8.1f} {latencies[-1] * 1000:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
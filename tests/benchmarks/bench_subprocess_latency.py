@@ -0,0 +1,72 @@
+"""
+Latency of running `echo hi` in a shell, with the event-driven output pump
+vs. the previous sleep-polling loop (reproduced below as LegacyPollingShell).
+
+    python tests/benchmarks/bench_subprocess_latency.py
+"""
+
+import queue
+import statistics
+import threading
+import time
+
+from interpreter.core.computer.terminal.languages.shell import Shell
+
+
+class LegacyPollingShell(Shell):
+    """
+    The previous implementation: one reader thread per stream, and a consumer
+    that polls the queue with sleeps and waits 0.6s after the end marker.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.use_selector = False
+
+    def signal_end_of_execution(self):
+        self.done.set()
+
+    def stream_output(self):
+        while True:
+            if not self.output_queue.empty():
+                yield self.output_queue.get()
+            else:
+                time.sleep(0.1)
+            try:
+                output = self.output_queue.get(timeout=0.3)
+                yield output
+            except queue.Empty:
+                if self.done.is_set():
+                    for _ in range(3):
+                        if not self.output_queue.empty():
+                            yield self.output_queue.get()
+                        time.sleep(0.2)
+                    break
+
+
+def measure(language, runs):
+    list(language.run("echo warmup"))  # Process startup isn't what we're measuring
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = list(language.run("echo hi"))
+        timings.append(time.perf_counter() - start)
+        assert any("hi" in str(chunk.get("content")) for chunk in output), output
+    language.terminate()
+    timings.sort()
+    return timings
+
+
+def main():
+    for name, language, runs in [
+        ("sleep polling", LegacyPollingShell(), 30),
+        ("event-driven", Shell(), 300),
+    ]:
+        timings = measure(language, runs)
+        p50 = statistics.median(timings) * 1000
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+        print(f"{name:>14}: p50 {p50:8.1f} ms   p99 {p99:8.1f} ms   ({runs} runs)")
+
+
+if __name__ == "__main__":
+    main()
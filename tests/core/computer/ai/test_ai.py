@@ -0,0 +1,137 @@
+import random
+import string
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from interpreter.core.computer.ai.ai import Ai, MapReduce
+
+
+class RateLimitError(Exception):
+    def __init__(self):
+        super().__init__("rate limited")
+        self.status_code = 429
+        self.response = SimpleNamespace(headers={"retry-after": "0"})
+
+
+class StandInLlm:
+    """
+    Answers the map query with the length of each chunk, and the reduce query
+    with the sum of the lengths it's given.
+    """
+
+    def __init__(self, delay=0.01, rate_limited_calls=0, answer_size=0):
+        self.model = "stand-in"
+        self.delay = delay
+        self.answer_size = answer_size  # Pads answers, to make reducing hard
+        # Shared by the copies each call runs on
+        self.stats = SimpleNamespace(
+            lock=threading.Lock(),
+            calls=[],
+            rate_limited_calls=rate_limited_calls,
+            running=0,
+            most_running=0,
+        )
+
+    def run(self, messages):
+        system, text = messages[0]["content"], messages[1]["content"]
+        stats = self.stats
+        with stats.lock:
+            stats.calls.append(system)
+            if stats.rate_limited_calls:
+                stats.rate_limited_calls -= 1
+                raise RateLimitError()
+            stats.running += 1
+            stats.most_running = max(stats.most_running, stats.running)
+        try:
+            time.sleep(self.delay)
+            if system == "MAP":
+                total = len(text)
+            else:
+                total = sum(
+                    int(line.split(":")[1])
+                    for line in text.split("\n")
+                    if line.startswith("total:")
+                )
+            yield {
+                "role": "assistant",
+                "type": "message",
+                "content": f"total:{total}\n",
+            }
+            yield {
+                "role": "assistant",
+                "type": "message",
+                "content": "." * self.answer_size,
+            }
+        finally:
+            with stats.lock:
+                stats.running -= 1
+
+
+def make_ai(llm, **settings):
+    ai = Ai(SimpleNamespace(interpreter=SimpleNamespace(llm=llm)))
+    ai.map_reduce = MapReduce(backoff=0, **settings)
+    return ai
+
+
+class TestMapReduce(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.text = "".join(rng.choice(string.ascii_letters) for _ in range(200000))
+
+    def test_query_maps_and_reduces_to_one_answer(self):
+        llm = StandInLlm()
+        ai = make_ai(llm, max_concurrency=3)
+        ai.chunk_size, ai.overlap = 2000, 0
+
+        answer = ai.query(self.text, "MAP", "REDUCE")
+
+        self.assertEqual(answer.split("\n")[0], f"total:{len(self.text)}")
+        self.assertLessEqual(llm.stats.most_running, 3)
+        self.assertGreater(llm.stats.most_running, 1)
+
+    def test_reduce_terminates_when_answers_dont_fit_together(self):
+        llm = StandInLlm(delay=0, answer_size=20000)
+        ai = make_ai(llm)
+        ai.chunk_size, ai.overlap = 2000, 0
+
+        answer = ai.query(self.text, "MAP", "REDUCE")
+
+        self.assertTrue(answer.startswith(f"total:{len(self.text)}"))
+        # Pairing halves each level, so there are fewer reduce calls than map calls
+        self.assertEqual(llm.stats.calls.count("MAP"), 25)
+        self.assertLess(llm.stats.calls.count("REDUCE"), 25)
+
+    def test_rate_limits_are_retried(self):
+        llm = StandInLlm(rate_limited_calls=5)
+        ai = make_ai(llm, max_retries=5)
+        self.assertEqual(ai.query("hello", "MAP").split("\n")[0], "total:5")
+        self.assertEqual(ai.map_reduce.retries, 5)
+
+    def test_other_errors_are_raised(self):
+        class BrokenLlm(StandInLlm):
+            def run(self, messages):
+                raise ValueError("bad request")
+
+        ai = make_ai(BrokenLlm())
+        with self.assertRaises(ValueError):
+            ai.query("hello", "MAP")
+        self.assertEqual(ai.map_reduce.retries, 0)
+
+    def test_results_are_cached(self):
+        llm = StandInLlm(delay=0)
+        ai = make_ai(llm)
+        first = ai.query(self.text, "MAP", "REDUCE")
+        calls = len(llm.stats.calls)
+
+        self.assertEqual(ai.query(self.text, "MAP", "REDUCE"), first)
+        self.assertEqual(len(llm.stats.calls), calls)
+
+        # A different query isn't answered from the cache
+        ai.query(self.text, "MAP ", "REDUCE")
+        self.assertGreater(len(llm.stats.calls), calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import random
+import unittest
+
+from interpreter.core.computer.display.point.box_index import (
+    BoxIndex,
+    boxes_to_array,
+    combine_boxes,
+)
+
+
+def random_boxes(count, keys=("x", "y", "width", "height"), size=1920):
+    boxes = []
+    for _ in range(count):
+        width, height = random.randint(0, 120), random.randint(0, 60)
+        values = (
+            random.randint(0, size),
+            random.randint(0, size // 2),
+            width,
+            height,
+        )
+        boxes.append(dict(zip(keys, values)))
+    return boxes
+
+
+# The loops find_icon used before, to check the index gives the same answers
+
+
+def inside_text(box, blocks):
+    return any(
+        t["left"] <= box["x"] <= t["left"] + t["width"]
+        and t["top"] <= box["y"] <= t["top"] + t["height"]
+        and t["left"] <= box["x"] + box["width"] <= t["left"] + t["width"]
+        and t["top"] <= box["y"] + box["height"] <= t["top"] + t["height"]
+        for t in blocks
+    )
+
+
+def touches_text(box, blocks):
+    return any(
+        max(t["left"], box["x"]) < min(t["left"] + t["width"], box["x"] + box["width"])
+        and max(t["top"], box["y"])
+        < min(t["top"] + t["height"], box["y"] + box["height"])
+        for t in blocks
+    )
+
+
+def original_combine_boxes(icons_bounding_boxes):
+    while True:
+        combined_boxes = []
+        for box in icons_bounding_boxes:
+            for combined_box in combined_boxes:
+                if (
+                    box["x"] < combined_box["x"] + combined_box["width"]
+                    and box["x"] + box["width"] > combined_box["x"]
+                    and box["y"] < combined_box["y"] + combined_box["height"]
+                    and box["y"] + box["height"] > combined_box["y"]
+                ):
+                    combined_box["x"] = min(box["x"], combined_box["x"])
+                    combined_box["y"] = min(box["y"], combined_box["y"])
+                    combined_box["width"] = (
+                        max(
+                            box["x"] + box["width"],
+                            combined_box["x"] + combined_box["width"],
+                        )
+                        - combined_box["x"]
+                    )
+                    combined_box["height"] = (
+                        max(
+                            box["y"] + box["height"],
+                            combined_box["y"] + combined_box["height"],
+                        )
+                        - combined_box["y"]
+                    )
+                    break
+            else:
+                combined_boxes.append(box.copy())
+        if len(combined_boxes) == len(icons_bounding_boxes):
+            break
+        else:
+            icons_bounding_boxes = combined_boxes
+    return combined_boxes
+
+
+class TestBoxIndex(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+
+    def test_matches_original_filters(self):
+        for _ in range(5):
+            boxes = random_boxes(400)
+            blocks = random_boxes(150, keys=("left", "top", "width", "height"))
+            index = BoxIndex(blocks, keys=("left", "top", "width", "height"))
+
+            array = boxes_to_array(boxes)
+            self.assertEqual(
+                list(index.contains(array)), [inside_text(b, blocks) for b in boxes]
+            )
+            self.assertEqual(
+                list(index.intersects(array)), [touches_text(b, blocks) for b in boxes]
+            )
+
+    def test_edges_touching(self):
+        index = BoxIndex(
+            [{"left": 0, "top": 0, "width": 10, "height": 10}],
+            keys=("left", "top", "width", "height"),
+        )
+        array = boxes_to_array(
+            [
+                {"x": 0, "y": 0, "width": 10, "height": 10},  # Same box
+                {"x": 10, "y": 0, "width": 5, "height": 5},  # Shares an edge
+            ]
+        )
+
+        self.assertEqual(list(index.contains(array)), [True, False])
+        self.assertEqual(list(index.intersects(array)), [True, False])
+
+    def test_empty(self):
+        index = BoxIndex([])
+        self.assertEqual(
+            list(index.contains(boxes_to_array(random_boxes(3)))), [False] * 3
+        )
+        self.assertEqual(
+            len(BoxIndex(random_boxes(3)).intersects(boxes_to_array([]))), 0
+        )
+
+    def test_combine_matches_original(self):
+        for count in [0, 1, 50, 500]:
+            boxes = random_boxes(count)
+            for box in boxes:
+                box["center_x"] = box["x"] + box["width"] / 2
+
+            expected = original_combine_boxes([b.copy() for b in boxes])
+            self.assertEqual(combine_boxes(boxes), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
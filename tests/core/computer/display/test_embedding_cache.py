@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from interpreter.core.computer.display.point.embedding_cache import (
+    EmbeddingCache,
+    perceptual_hash,
+)
+
+
+def draw_icon(shape, color="black"):
+    icon = Image.new("RGB", (32, 32), "white")
+    draw = ImageDraw.Draw(icon)
+    if shape == "circle":
+        draw.ellipse((4, 4, 28, 28), fill=color)
+    else:
+        draw.rectangle((4, 12, 28, 20), fill=color)
+    return icon
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "icons.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip_and_hit_rate(self):
+        cache = EmbeddingCache(self.path)
+        cache.set_many({"a": np.arange(4), "b": np.ones(4)})
+
+        found = cache.get_many(["a", "b", "c"])
+
+        self.assertEqual(set(found), {"a", "b"})
+        np.testing.assert_array_equal(found["a"], np.arange(4, dtype=np.float32))
+        self.assertEqual(found["a"].dtype, np.float32)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3)
+
+    def test_shared_between_instances(self):
+        EmbeddingCache(self.path).set_many({"a": np.ones(8)})
+
+        # Like another session or process opening the same file
+        other = EmbeddingCache(self.path)
+
+        self.assertIn("a", other)
+        self.assertEqual(len(other), 1)
+        np.testing.assert_array_equal(other["a"], np.ones(8))
+
+    def test_evicts_least_recently_used(self):
+        # Room for about 10 embeddings of 100 floats
+        cache = EmbeddingCache(self.path, max_bytes=10 * 400)
+        cache.set_many({f"old{i}": np.zeros(100) for i in range(10)})
+        cache.get_many(["old0"])  # Recently used, so it's kept
+
+        cache.set_many({f"new{i}": np.zeros(100) for i in range(5)})
+
+        self.assertLessEqual(cache.stats()["bytes"], 10 * 400)
+        self.assertIn("old0", cache)
+        self.assertNotIn("old1", cache)
+        self.assertIn("new4", cache)
+
+    def test_perceptual_hash(self):
+        icon = draw_icon("circle")
+        antialiased = icon.copy()
+        antialiased.putpixel((16, 4), (200, 200, 200))
+        noise = np.random.default_rng(0).integers(-3, 4, size=(32, 32, 3))
+        noisy = Image.fromarray(
+            np.clip(np.asarray(icon) + noise, 0, 255).astype(np.uint8)
+        )
+
+        self.assertEqual(perceptual_hash(icon), perceptual_hash(antialiased))
+        self.assertEqual(perceptual_hash(icon), perceptual_hash(noisy))
+        self.assertNotEqual(perceptual_hash(icon), perceptual_hash(draw_icon("bar")))
+        self.assertNotEqual(
+            perceptual_hash(icon), perceptual_hash(draw_icon("circle", "red"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+
+import numpy as np
+
+from interpreter.core.computer.display.frames import (
+    FramePipeline,
+    dirty_rectangles,
+    tile_hashes,
+)
+
+
+def find_rectangles(image):
+    # Stand-in for contour detection: one box per distinct non-zero value
+    boxes = []
+    for value in np.unique(image):
+        if value == 0:
+            continue
+        ys, xs = np.nonzero(image == value)
+        boxes.append(
+            {
+                "x": int(xs.min()),
+                "y": int(ys.min()),
+                "width": int(xs.max() - xs.min() + 1),
+                "height": int(ys.max() - ys.min() + 1),
+                "value": int(value),
+            }
+        )
+    return boxes
+
+
+def draw(rectangles, width=1920, height=1080):
+    image = np.zeros((height, width), dtype=np.uint8)
+    for value, (x, y, w, h) in rectangles.items():
+        image[y : y + h, x : x + w] = value
+    return image
+
+
+def as_set(boxes):
+    return {
+        (box["value"], box["x"], box["y"], box["width"], box["height"]) for box in boxes
+    }
+
+
+class TestFramePipeline(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.rectangles = {
+            value: (
+                int(rng.integers(0, 1800)),
+                int(rng.integers(0, 1000)),
+                int(rng.integers(10, 100)),
+                int(rng.integers(10, 60)),
+            )
+            for value in range(1, 60)
+        }
+
+    def analyse(self, pipeline, image):
+        calls = []
+
+        def analyze(crop):
+            calls.append(crop.shape)
+            return find_rectangles(crop)
+
+        return pipeline.boxes("rectangles", image, analyze), calls
+
+    def test_dirty_rectangles_groups_touching_tiles(self):
+        changed = np.zeros((4, 6), dtype=bool)
+        changed[0, 0] = changed[0, 1] = changed[1, 1] = True
+        changed[3, 5] = True
+        rectangles = dirty_rectangles(changed, 10, 55, 35)
+        self.assertEqual(sorted(rectangles), [(0, 0, 20, 20), (50, 30, 55, 35)])
+
+    def test_tile_hashes_only_change_where_pixels_change(self):
+        image = draw(self.rectangles)
+        changed = image.copy()
+        changed[500, 700] += 1
+        difference = tile_hashes(image) != tile_hashes(changed)
+        self.assertEqual(list(zip(*np.nonzero(difference))), [(500 // 64, 700 // 64)])
+
+    def test_matches_full_analysis_over_a_sequence(self):
+        pipeline = FramePipeline()
+        frames = [dict(self.rectangles)]
+
+        # A window moves, a new one appears, nothing changes, one disappears
+        moved = dict(frames[-1])
+        x, y, w, h = moved[5]
+        moved[5] = (min(x + 130, 1800), y, w, h)
+        frames.append(moved)
+        added = dict(moved)
+        added[200] = (900, 400, 80, 30)
+        frames.append(added)
+        frames.append(dict(added))
+        removed = dict(added)
+        del removed[17]
+        frames.append(removed)
+
+        for rectangles in frames:
+            image = draw(rectangles)
+            boxes, _ = self.analyse(pipeline, image)
+            self.assertEqual(as_set(boxes), as_set(find_rectangles(image)))
+
+        # Much less than every pixel of every frame was analysed
+        self.assertLess(pipeline.pixels_analysed, pipeline.pixels_seen * 0.4)
+
+    def test_unchanged_frame_skips_the_analysis(self):
+        pipeline = FramePipeline()
+        image = draw(self.rectangles)
+        first, calls = self.analyse(pipeline, image)
+        self.assertEqual(len(calls), 1)
+
+        second, calls = self.analyse(pipeline, image.copy())
+        self.assertEqual(calls, [])
+        self.assertEqual(as_set(first), as_set(second))
+
+    def test_large_changes_and_new_sizes_analyse_the_whole_frame(self):
+        pipeline = FramePipeline()
+        self.analyse(pipeline, draw(self.rectangles))
+
+        _, calls = self.analyse(pipeline, 255 - draw(self.rectangles))
+        self.assertEqual(calls, [(1080, 1920)])
+
+        _, calls = self.analyse(pipeline, draw(self.rectangles, width=1000, height=800))
+        self.assertEqual(calls, [(800, 1000)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 from unittest import mock
 
@@ -22,17 +24,39 @@ class TestFiles(unittest.TestCase):
 
     def test_edit_original_text_in_filedata(self):
         # Arrange
-        mock_open = mock.mock_open(read_data="foobar")
-        mock_write = mock_open.return_value.write
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "file")
+            with open(path, "w") as file:
+                file.write("foobar")
 
-        # Act
-        with mock.patch("interpreter.core.computer.files.files.open", mock_open):
-            self.files.edit("example/filepath/file", "foobar", "foobarbaz")
+            # Act
+            self.files.edit(path, "foobar", "foobarbaz")
 
-        # Assert
-        mock_open.assert_any_call("example/filepath/file", "r")
-        mock_open.assert_any_call("example/filepath/file", "w")
-        mock_write.assert_called_once_with("foobarbaz")
+            # Assert
+            with open(path) as file:
+                self.assertEqual(file.read(), "foobarbaz")
+            self.assertEqual(os.listdir(directory), ["file"])  # No temporary file left
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "Needs symlinks")
+    def test_edit_through_symlink(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, "target")
+            link = os.path.join(directory, "link")
+            with open(target, "w") as file:
+                file.write("foobar")
+            os.chmod(target, 0o640)
+            os.symlink(target, link)
+
+            # Act
+            self.files.edit(link, "bar", "baz")
+
+            # Assert
+            self.assertTrue(os.path.islink(link))
+            with open(target) as file:
+                self.assertEqual(file.read(), "foobaz")
+            self.assertEqual(os.stat(target).st_mode & 0o777, 0o640)
+            self.assertEqual(sorted(os.listdir(directory)), ["link", "target"])
 
     def test_edit_original_text_not_in_filedata(self):
         # Arrange
@@ -44,8 +68,8 @@ class TestFiles(unittest.TestCase):
                 self.files.edit("example/filepath/file", "barbaz", "foobarbaz")
 
         # Assert
-        mock_open.assert_any_call("example/filepath/file", "r")
+        mock_open.assert_any_call(os.path.realpath("example/filepath/file"), "r")
         self.assertEqual(
             str(context_manager.exception),
-            "Original text not found. Did you mean one of these? foobar",
+            "Original text not found. Did you mean one of these? foobar (line 1)",
         )
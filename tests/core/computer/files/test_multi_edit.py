@@ -0,0 +1,88 @@
+import io
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from interpreter.core.computer.files.files import Files
+from interpreter.core.computer.files.multi_edit import apply_edits
+
+
+def edit(text, edits, chunk_size):
+    destination = io.StringIO()
+    results = apply_edits(io.StringIO(text), destination, edits, chunk_size)
+    return destination.getvalue(), results
+
+
+class TestApplyEdits(unittest.TestCase):
+    def test_matches_str_replace_across_chunk_boundaries(self):
+        random.seed(0)
+        text = "".join(random.choice("ab\n") for _ in range(2000))
+        for chunk_size in [1, 2, 3, 7, 64, 5000]:
+            result, [(count, matches)] = edit(text, [("aab", "X", None)], chunk_size)
+            self.assertEqual(result, text.replace("aab", "X"))
+            self.assertEqual(count, text.count("aab"))
+            self.assertEqual(
+                [match["offset"] for match in matches][:3],
+                [i for i in range(len(text)) if text.startswith("aab", i)][:3],
+            )
+
+    def test_several_edits_and_occurrences(self):
+        text = "one two\nthree two\ntwo one"
+        edits = [("two", "2", 2), ("one", "1", None), ("three two\n", "3+2 ", None)]
+        for chunk_size in [1, 4, 100]:
+            result, results = edit(text, edits[:2], chunk_size)
+            self.assertEqual(result, "1 two\nthree 2\ntwo 1")
+            self.assertEqual(results[0], (3, [{"offset": 14, "line": 2}]))
+            self.assertEqual(results[1][0], 2)
+            self.assertEqual([match["line"] for match in results[1][1]], [1, 3])
+
+            result, results = edit(text, [edits[1], edits[2]], chunk_size)
+            self.assertEqual(result, "1 two\n3+2 two 1")
+            self.assertEqual(results[1][1], [{"offset": 8, "line": 2}])
+
+    def test_overlapping_edits_are_refused(self):
+        with self.assertRaises(ValueError):
+            edit("foobar", [("foob", "x", None), ("obar", "y", None)], 2)
+
+
+class TestEditMany(unittest.TestCase):
+    def setUp(self):
+        self.files = Files(mock.Mock())
+        self.files.chunk_size = 5
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "file.txt")
+        with open(self.path, "w") as file:
+            file.write("alpha beta\ngamma beta\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self):
+        with open(self.path) as file:
+            return file.read()
+
+    def test_edits_in_place(self):
+        results = self.files.edit_many(
+            self.path, [("beta", "BETA", 2), ("alpha", "ALPHA")]
+        )
+        self.assertEqual(self.read(), "ALPHA beta\ngamma BETA\n")
+        self.assertEqual(results[0]["count"], 2)
+        self.assertEqual(results[0]["matches"], [{"offset": 17, "line": 2}])
+        self.assertEqual(os.listdir(self.directory.name), ["file.txt"])
+
+    def test_leaves_file_untouched_if_an_edit_fails(self):
+        for edits in [
+            [("alpha", "ALPHA"), ("delta", "DELTA")],
+            [("beta", "BETA", 3)],
+            [("alpha be", "x"), ("beta", "y")],
+        ]:
+            with self.assertRaises(ValueError):
+                self.files.edit_many(self.path, edits)
+            self.assertEqual(self.read(), "alpha beta\ngamma beta\n")
+            self.assertEqual(os.listdir(self.directory.name), ["file.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import random
+import unittest
+
+from interpreter.core.computer.files import text_index
+from interpreter.core.computer.files.text_index import TextIndex
+
+
+def synthetic_source(functions, seed=0):
+    rng = random.Random(seed)
+    names = ["value", "result", "items", "total", "index", "config", "buffer"]
+    lines = []
+    for f in range(functions):
+        a, b = rng.sample(names, 2)
+        lines += [
+            f"def function_{f}({a}, {b}):",
+            f"    {a} = {b} + {f}",
+            f"    return {a} * {rng.randint(0, 9)}",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+class TestTextIndex(unittest.TestCase):
+    def test_small_texts_match_the_sliding_window_search(self):
+        text = "the quick brown fox\njumps over the lazy dog"
+        matches = TextIndex(text).near_matches("jumps ovr the", n=2)
+        self.assertEqual(matches[0]["text"], "jumps over the")
+        self.assertEqual(matches[0]["line"], 2)
+
+    def test_finds_the_region_in_a_large_file(self):
+        text = synthetic_source(5000)
+        index = TextIndex(text)
+        self.assertGreater(len(index.words), text_index.brute_force_words)
+
+        # A near copy of function 3210's body, with a typo
+        lines = text.split("\n")
+        line = lines.index([l for l in lines if l.startswith("def function_3210(")][0])
+        original = "\n".join(lines[line : line + 3]).replace("return", "retrun")
+
+        matches = index.near_matches(original, n=3)
+        self.assertEqual(matches[0]["line"], line + 1)
+        self.assertGreater(matches[0]["score"], 0.9)
+        self.assertEqual(len(matches), 3)
+        starts = [match["line"] for match in matches]
+        self.assertEqual(len(set(starts)), 3)
+
+    def test_misspelled_words_still_find_a_region(self):
+        text = (
+            synthetic_source(2000)
+            + "\nunusual_identifier_name = compute_everything()\n"
+        )
+        matches = TextIndex(text).near_matches(
+            "unusual_identifer_name = compute_everythin()"
+        )
+        self.assertEqual(
+            matches[0]["text"], "unusual_identifier_name = compute_everything()"
+        )
+        self.assertEqual(matches[0]["line"], text.count("\n"))
+
+    def test_empty_inputs(self):
+        self.assertEqual(TextIndex("").near_matches("anything"), [])
+        self.assertEqual(TextIndex("something").near_matches("  "), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
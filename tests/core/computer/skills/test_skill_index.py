@@ -0,0 +1,107 @@
+import os
+import tempfile
+import time
+import unittest
+
+from interpreter.core.computer.skills.skill_index import SkillIndex, words
+
+
+class TestSkillIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "skills")
+        os.makedirs(self.path)
+        self.write(
+            "send_weekly_report.py",
+            'import json\n\nCALLS = []\n\ndef send_weekly_report(to, week=1):\n    """\n    Emails the weekly sales report.\n    """\n    CALLS.append(to)\n    return "sent to " + to\n',
+        )
+        self.write(
+            "resize_images.py",
+            'def resize_images(folder, width=800):\n    """Resizes every image in a folder, for email."""\n    return width\n',
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, code):
+        with open(os.path.join(self.path, name), "w") as f:
+            f.write(code)
+
+    def test_words(self):
+        self.assertEqual(
+            words("sendWeekly_report2 PDF"), ["send", "weekly", "report2", "pdf"]
+        )
+
+    def test_search_ranks_names_above_docstrings(self):
+        index = SkillIndex(self.path)
+        results = index.search("email report")
+        self.assertEqual(
+            [function["name"] for function in results],
+            ["send_weekly_report", "resize_images"],
+        )
+        self.assertEqual(results[0]["signature"], "(to, week=1)")
+        self.assertEqual(results[0]["docstring"], "Emails the weekly sales report.")
+        self.assertEqual(index.search("images")[0]["name"], "resize_images")
+        self.assertEqual(index.search("calendar"), [])
+
+    def test_index_is_persisted_and_only_changed_files_are_parsed(self):
+        index = SkillIndex(self.path)
+        index.refresh()
+        self.assertEqual(index.parsed, 2)
+        self.assertTrue(
+            os.path.exists(os.path.join(self.directory.name, "skills_index.json"))
+        )
+
+        index = SkillIndex(self.path)
+        index.refresh()
+        self.assertEqual(index.parsed, 0)
+
+        time.sleep(0.01)
+        self.write("resize_images.py", "def resize_images(folder):\n    pass\n")
+        self.assertEqual(index.search("resize")[0]["signature"], "(folder)")
+        self.assertEqual(index.parsed, 1)
+
+        os.remove(os.path.join(self.path, "resize_images.py"))
+        self.assertEqual(index.search("resize"), [])
+
+    def test_stubs_run_skill_files_on_first_call(self):
+        self.write("broken.py", "def broken(:\n")
+        self.write("setup_only.py", "SETUP_RAN = True\n")
+        code, broken = SkillIndex(self.path).stub_code()
+        self.assertEqual(broken, [os.path.join(self.path, "broken.py")])
+
+        kernel = {}
+        exec(code, kernel)
+        self.assertTrue(kernel["SETUP_RAN"])
+        self.assertTrue(kernel["resize_images"]._skill_stub)
+        self.assertIn("Resizes every image", kernel["resize_images"].__doc__)
+
+        loads = []
+        load_skill = kernel["_load_skill"]
+        kernel["_load_skill"] = lambda path: loads.append(path) or load_skill(path)
+        self.assertEqual(kernel["resize_images"]("a"), 800)
+        self.assertEqual(kernel["resize_images"]("b", width=10), 10)
+        # Run once, then called directly
+        self.assertEqual(loads, [os.path.join(self.path, "resize_images.py")])
+        self.assertFalse(hasattr(kernel["resize_images"], "_skill_stub"))
+
+    def test_files_that_define_more_than_functions_run_right_away(self):
+        self.write(
+            "geometry.py",
+            "import math\n\nclass Point:\n    pass\n\nRADIUS = 2\n\n"
+            "def distance(a, b):\n    return math.dist(a, b)\n",
+        )
+        code, broken = SkillIndex(self.path).stub_code()
+
+        kernel = {}
+        exec(code, kernel)
+        self.assertIn("Point", kernel)
+        self.assertEqual(kernel["RADIUS"], 2)
+        self.assertEqual(kernel["CALLS"], [])
+        self.assertFalse(hasattr(kernel["distance"], "_skill_stub"))
+        self.assertEqual(kernel["send_weekly_report"]("ann"), "sent to ann")
+        self.assertEqual(kernel["CALLS"], ["ann"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from interpreter.core.computer.terminal.terminal import Terminal
+
+
+class FakeLanguage:
+    name = "Fake"
+    aliases = ["fake"]
+    start_cmd = ["fake"]
+    instances = []
+
+    def __init__(self, computer):
+        self.computer = computer
+        self.started = False
+        self.terminated = False
+        FakeLanguage.instances.append(self)
+
+    def start_process(self):
+        time.sleep(0.05)
+        self.started = True
+
+    def run(self, code):
+        yield {"type": "console", "format": "output", "content": code}
+
+    def stop(self):
+        pass
+
+    def terminate(self):
+        self.terminated = True
+
+
+class TestLanguagePool(unittest.TestCase):
+    def setUp(self):
+        FakeLanguage.instances = []
+        self.terminal = Terminal(mock.MagicMock(verbose=False))
+        self.terminal.languages = [FakeLanguage]
+        self.pool = self.terminal.warm_pool
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def wait_for_warm(self, count=1):
+        deadline = time.time() + 5
+        while self.pool.stats()["warm"].get("Fake", 0) < count:
+            if time.time() > deadline:
+                self.fail("Pool never warmed up")
+            time.sleep(0.01)
+
+    def test_not_started_creates_instances_on_demand(self):
+        list(self.terminal._streaming_run("fake", "hi"))
+
+        self.assertEqual(self.pool.hits + self.pool.misses, 0)
+        self.assertFalse(FakeLanguage.instances[0].started)
+
+    def test_hands_out_warm_instance_and_refills(self):
+        self.pool.start(["fake"])
+        self.wait_for_warm()
+        warm = FakeLanguage.instances[0]
+
+        list(self.terminal._streaming_run("fake", "hi"))
+
+        self.assertIs(self.terminal._active_languages["fake"], warm)
+        self.assertTrue(warm.started)
+        self.assertEqual(self.pool.hits, 1)
+
+        # A replacement is started for the next reset
+        self.wait_for_warm()
+        self.assertEqual(self.pool.spawns, 2)
+        self.assertIsNotNone(self.pool.stats()["average_spawn_time"])
+
+    def test_miss_falls_back_to_a_new_instance(self):
+        self.pool.start(["fake"])
+
+        # Ask before the warm instance is ready
+        list(self.terminal._streaming_run("fake", "hi"))
+
+        self.assertEqual(self.pool.misses, 1)
+        self.assertIn("fake", self.terminal._active_languages)
+
+    def test_shutdown_terminates_warm_instances(self):
+        self.pool.start(["fake"])
+        self.wait_for_warm()
+
+        self.pool.shutdown()
+
+        self.assertTrue(FakeLanguage.instances[0].terminated)
+        self.pool.start(["fake"])
+        self.assertEqual(self.pool.stats()["warm"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import platform
+import time
+import unittest
+
+from interpreter.core.computer.terminal.languages.shell import Shell
+
+
+def output_of(chunks):
+    return "".join(
+        chunk["content"] for chunk in chunks if chunk.get("format") == "output"
+    )
+
+
+@unittest.skipIf(platform.system() == "Windows", "Uses a POSIX shell")
+class TestSubprocessLanguage(unittest.TestCase):
+    def setUp(self):
+        self.shell = Shell()
+        self.shell.start_cmd = ["bash"]
+
+    def tearDown(self):
+        self.shell.terminate()
+
+    def test_returns_as_soon_as_code_finishes(self):
+        list(self.shell.run("echo warmup"))
+
+        start = time.perf_counter()
+        output = output_of(self.shell.run("echo hi"))
+
+        self.assertIn("hi", output)
+        # The old polling loop always took over a second
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_collects_stderr_before_finishing(self):
+        output = output_of(self.shell.run("echo out; echo err 1>&2; echo out2"))
+
+        for text in ["out", "err", "out2"]:
+            self.assertIn(text, output)
+
+    def test_restarts_after_exit(self):
+        list(self.shell.run("exit 3"))
+
+        self.assertIn("back", output_of(self.shell.run("echo back")))
+
+    def test_reader_threads_fallback(self):
+        self.shell.use_selector = False
+
+        self.assertIn("err", output_of(self.shell.run("echo err 1>&2")))
@@ -0,0 +1,94 @@
+import base64
+import io
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from interpreter.core.computer.vision.vision import Vision
+
+
+class FakeReader:
+    def __init__(self):
+        self.calls = []
+
+    def readtext(self, image):
+        self.calls.append(("readtext", [image.shape]))
+        self.image = image
+        return [(None, f"{image.shape[1]}x{image.shape[0]}", 1.0)]
+
+    def readtext_batched(self, images):
+        self.calls.append(("readtext_batched", [image.shape for image in images]))
+        return [[(None, f"{image.shape[1]}x{image.shape[0]}", 1.0)] for image in images]
+
+
+def png(width, height, color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestVisionOcr(unittest.TestCase):
+    def setUp(self):
+        self.vision = Vision(computer=None)
+        self.vision.easyocr = FakeReader()
+
+    def test_reads_base64_and_lmc_in_memory(self):
+        data = base64.b64encode(png(40, 20, "white")).decode()
+        with mock.patch.object(
+            tempfile, "NamedTemporaryFile", side_effect=AssertionError("temp file")
+        ):
+            self.assertEqual(self.vision.ocr(base_64=data), "40x20")
+            lmc = {"type": "image", "format": "base64.png", "content": data}
+            self.assertEqual(self.vision.ocr(lmc=lmc), "40x20")
+
+        # The second read came from the cache
+        self.assertEqual(len(self.vision.easyocr.calls), 1)
+
+    def test_accepts_arrays_and_pil_images(self):
+        array = np.zeros((10, 30, 3), dtype=np.uint8)
+        self.assertEqual(self.vision.ocr(image=array), "30x10")
+        self.assertEqual(self.vision.ocr(pil_image=Image.fromarray(array)), "30x10")
+        self.assertEqual(len(self.vision.easyocr.calls), 1)
+
+    def test_color_images_are_read_as_bgr(self):
+        # EasyOCR converts color arrays to grayscale as BGR, like files it reads
+        self.vision.ocr(base_64=base64.b64encode(png(4, 4, "red")).decode())
+        self.assertEqual(self.vision.easyocr.image[0, 0].tolist(), [0, 0, 255])
+
+        self.vision.ocr(pil_image=Image.new("RGB", (4, 4), "blue"))
+        self.assertEqual(self.vision.easyocr.image[0, 0].tolist(), [255, 0, 0])
+
+    def test_batches_same_sized_images_and_dedupes(self):
+        images = [
+            png(40, 20, "white"),
+            png(40, 20, "black"),
+            png(40, 20, "white"),
+            np.zeros((5, 5, 3), dtype=np.uint8),
+        ]
+        self.assertEqual(
+            self.vision.ocr_many(images), ["40x20", "40x20", "40x20", "5x5"]
+        )
+        self.assertEqual(
+            sorted(self.vision.easyocr.calls),
+            [
+                ("readtext", [(5, 5, 3)]),
+                ("readtext_batched", [(20, 40, 3), (20, 40, 3)]),
+            ],
+        )
+
+    def test_cache_is_bounded(self):
+        self.vision.ocr_cache_size = 2
+        for color in ["red", "green", "blue"]:
+            self.vision.ocr(base_64=base64.b64encode(png(8, 8, color)).decode())
+        self.assertEqual(len(self.vision._ocr_cache), 2)
+
+        # The oldest was evicted, so it's read again
+        self.vision.ocr(base_64=base64.b64encode(png(8, 8, "red")).decode())
+        self.assertEqual(len(self.vision.easyocr.calls), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
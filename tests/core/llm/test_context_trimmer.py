@@ -0,0 +1,118 @@
+import unittest
+from unittest import mock
+
+from interpreter.core.llm.utils import context_trimmer
+from interpreter.core.llm.utils.context_trimmer import ContextTrimmer
+
+
+class WhitespaceEncoding:
+    """One token per word, so tests don't need tiktoken's downloaded vocabularies."""
+
+    def __init__(self):
+        self.encode_calls = 0
+
+    def encode(self, text, disallowed_special=()):
+        self.encode_calls += 1
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+def make_trimmer():
+    trimmer = ContextTrimmer(model="gpt-4")
+    trimmer._encoding = WhitespaceEncoding()
+    return trimmer
+
+
+def user(content):
+    return {"role": "user", "content": content}
+
+
+class TestContextTrimmer(unittest.TestCase):
+    def test_fits_untouched(self):
+        trimmer = make_trimmer()
+        messages = [user("one two"), user("three")]
+
+        trimmed = trimmer.trim(messages, system_message="sys", max_tokens=100)
+
+        self.assertEqual(trimmed[0], {"role": "system", "content": "sys"})
+        self.assertEqual(trimmed[1:], messages)
+
+    def test_drops_oldest_messages(self):
+        trimmer = make_trimmer()
+        # Each message costs 3 overhead + 1 (role) + 5 (content) = 9 tokens
+        messages = [user(f"m{i} a b c d") for i in range(10)]
+
+        trimmed = trimmer.trim(messages, max_tokens=3 + 9 * 4)
+
+        self.assertEqual(trimmed, messages[-4:])
+
+    def test_only_new_messages_are_tokenized(self):
+        trimmer = make_trimmer()
+        messages = [user(f"message {i}") for i in range(50)]
+        trimmer.trim(messages, system_message="sys", max_tokens=10000)
+        calls_after_first_turn = trimmer.encoding.encode_calls
+
+        messages.append(user("a new message"))
+        trimmer.trim(messages, system_message="sys", max_tokens=10000)
+
+        # The new message's content and role
+        self.assertEqual(trimmer.encoding.encode_calls - calls_after_first_turn, 2)
+
+    def test_only_messages_after_the_last_user_message_are_looked_at(self):
+        trimmer = make_trimmer()
+        messages = []
+        for i in range(100):
+            messages += [
+                user(f"question {i}"),
+                {"role": "assistant", "content": f"answer {i}"},
+            ]
+        trimmer.trim(messages, max_tokens=10000)
+
+        messages += [
+            user("another question"),
+            {"role": "assistant", "content": "an answer"},
+        ]
+        with mock.patch.object(
+            context_trimmer, "message_key", wraps=context_trimmer.message_key
+        ) as message_key:
+            trimmed = trimmer.trim(messages, max_tokens=3 + 7 * 3)
+
+        # Last turn's question and answer, the two new messages, and two spot checks
+        self.assertEqual(message_key.call_count, 6)
+        self.assertEqual(trimmed, messages[-3:])
+
+    def test_replaced_history_is_recounted(self):
+        trimmer = make_trimmer()
+        trimmer.trim([user("a"), user("b"), user("c")], max_tokens=10000)
+
+        messages = [user("one two three four five")] * 3 + [user("d")]
+        trimmed = trimmer.trim(messages, max_tokens=3 + 5 + 9)
+
+        self.assertEqual(trimmed, messages[-2:])
+
+    def test_mutated_message_is_recounted(self):
+        trimmer = make_trimmer()
+        messages = [user("short")]
+        self.assertEqual(trimmer.count_messages(messages), 3 + 1 + 1 + 3)
+
+        messages[0]["content"] = "much longer than before"
+        self.assertEqual(trimmer.count_messages(messages), 3 + 1 + 4 + 3)
+
+    def test_budget_growth_restores_older_messages(self):
+        trimmer = make_trimmer()
+        messages = [user(f"m{i} a b c d") for i in range(10)]
+
+        self.assertEqual(len(trimmer.trim(messages, max_tokens=3 + 9 * 2)), 2)
+        self.assertEqual(len(trimmer.trim(messages, max_tokens=3 + 9 * 6)), 6)
+
+    def test_oversized_last_message_is_shortened(self):
+        trimmer = make_trimmer()
+        messages = [user("x " * 100)]
+
+        trimmed = trimmer.trim(messages, max_tokens=20)
+
+        self.assertEqual(len(trimmed), 1)
+        self.assertIn("...", trimmed[0]["content"])
+        self.assertLess(len(trimmed[0]["content"]), len(messages[0]["content"]))
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from interpreter.core.llm.utils import convert_to_openai_messages as conversion
+from interpreter.core.llm.utils.convert_to_openai_messages import (
+    ConversionCache,
+    convert_to_openai_messages,
+)
+
+
+def make_interpreter():
+    interpreter = mock.Mock()
+    interpreter.user_message_template = "{content}"
+    interpreter.always_apply_user_message_template = False
+    interpreter.code_output_sender = "assistant"
+    interpreter.code_output_template = "Code output: {content}"
+    interpreter.empty_code_output_template = "No output"
+    interpreter.debug = False
+    return interpreter
+
+
+class TestConversionCache(unittest.TestCase):
+    def setUp(self):
+        self.interpreter = make_interpreter()
+        self.cache = ConversionCache()
+        self.messages = [
+            {"role": "user", "type": "message", "content": "Plot something"},
+            {"role": "assistant", "type": "code", "format": "python", "content": "1+1"},
+            {"role": "computer", "type": "console", "format": "output", "content": "2"},
+            {
+                "role": "computer",
+                "type": "image",
+                "format": "base64.png",
+                "content": "aGk=",
+            },
+        ]
+
+    def convert(self, messages):
+        return convert_to_openai_messages(
+            messages,
+            function_calling=True,
+            vision=True,
+            shrink_images=False,
+            interpreter=self.interpreter,
+            cache=self.cache,
+        )
+
+    def test_cached_conversion_matches_uncached(self):
+        expected = convert_to_openai_messages(
+            self.messages,
+            function_calling=True,
+            vision=True,
+            shrink_images=False,
+            interpreter=self.interpreter,
+        )
+
+        self.assertEqual(self.convert(self.messages), expected)
+        self.assertEqual(self.convert(self.messages), expected)
+        self.assertEqual(self.cache.hits, len(self.messages))
+
+    def test_unchanged_history_is_converted_once(self):
+        self.convert(self.messages)
+        self.messages.append({"role": "user", "type": "message", "content": "Thanks"})
+
+        with mock.patch.object(
+            conversion, "convert_message", wraps=conversion.convert_message
+        ) as convert_message:
+            self.convert(self.messages)
+
+        # The new message, plus the old user message which lost its "last user message" status
+        self.assertEqual(convert_message.call_count, 2)
+
+    def test_returned_messages_can_be_mutated(self):
+        first = self.convert(self.messages)
+        first[1].pop("function_call")
+        first[3]["content"].append({"type": "text", "text": "extra"})
+
+        second = self.convert(self.messages)
+
+        self.assertIn("function_call", second[1])
+        self.assertEqual(len(second[3]["content"]), 2)
+
+    def test_path_image_is_reconverted_when_file_changes(self):
+        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
+            f.write(b"first")
+        try:
+            messages = [
+                {"role": "user", "type": "image", "format": "path", "content": f.name}
+            ]
+            first = self.convert(messages)
+
+            with open(f.name, "wb") as image_file:
+                image_file.write(b"second!")
+            os.utime(f.name, ns=(0, 0))
+            second = self.convert(messages)
+
+            self.assertNotEqual(
+                first[0]["content"][0]["image_url"]["url"],
+                second[0]["content"][0]["image_url"]["url"],
+            )
+        finally:
+            os.remove(f.name)
+
+    def test_eviction_respects_byte_budget(self):
+        cache = ConversionCache(max_bytes=100)
+        cache.set("a", {"role": "user", "content": "x" * 60})
+        cache.set("b", {"role": "user", "content": "y" * 60})
+
+        self.assertNotIn("a", cache)
+        self.assertIn("b", cache)
+        self.assertEqual(len(cache), 1)
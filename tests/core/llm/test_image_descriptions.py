@@ -0,0 +1,158 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from interpreter.core.llm.utils.image_descriptions import ImageDescriptions
+
+
+class FakeVision:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most_running = 0
+
+    def track(self, kind, lmc):
+        with self.lock:
+            self.calls.append((kind, lmc["content"]))
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+
+    def query(self, lmc):
+        self.track("query", lmc)
+        return "a picture of " + lmc["content"]
+
+    def ocr(self, lmc):
+        self.track("ocr", lmc)
+        return "text in " + lmc["content"]
+
+
+def image(content):
+    return {
+        "role": "computer",
+        "type": "image",
+        "format": "base64.png",
+        "content": content,
+    }
+
+
+class TestImageDescriptions(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.vision = FakeVision(delay=0.05)
+        self.llm = SimpleNamespace(
+            vision_renderer=self.vision.query,
+            interpreter=SimpleNamespace(computer=SimpleNamespace(vision=self.vision)),
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def service(self, **kwargs):
+        return ImageDescriptions(self.llm, path=self.directory.name, **kwargs)
+
+    def test_describes_concurrently_and_dedupes(self):
+        service = self.service(max_workers=4)
+        results = service.describe_many([image("cat"), image("dog"), image("cat")])
+
+        self.assertEqual(
+            results,
+            [
+                ("a picture of cat", "text in cat"),
+                ("a picture of dog", "text in dog"),
+                ("a picture of cat", "text in cat"),
+            ],
+        )
+        self.assertEqual(len(self.vision.calls), 4)
+        self.assertGreater(self.vision.most_running, 1)
+
+    def test_prefetch_makes_describe_instant(self):
+        service = self.service()
+        service.prefetch(image("cat"))
+        time.sleep(0.3)
+        self.assertTrue(service.is_ready(image("cat")))
+
+        start = time.time()
+        self.assertEqual(
+            service.describe(image("cat")), ("a picture of cat", "text in cat")
+        )
+        self.assertLess(time.time() - start, 0.05)
+        self.assertEqual(len(self.vision.calls), 2)
+
+    def test_descriptions_persist_between_instances(self):
+        first = self.service()
+        first.describe(image("cat"))
+        first.shutdown()
+        time.sleep(0.05)  # The result is saved by a callback
+
+        second = self.service()
+        self.assertTrue(second.is_ready(image("cat")))
+        self.assertEqual(
+            second.describe(image("cat")), ("a picture of cat", "text in cat")
+        )
+        self.assertEqual(len(self.vision.calls), 2)
+        self.assertFalse(
+            [
+                name
+                for _, _, names in os.walk(self.directory.name)
+                for name in names
+                if name.endswith(".tmp")
+            ]
+        )
+
+    def test_images_are_hashed_once(self):
+        service = self.service()
+        path = os.path.join(self.directory.name, "screenshot.png")
+        with open(path, "wb") as f:
+            f.write(b"first")
+        on_disk = {
+            "role": "computer",
+            "type": "image",
+            "format": "path",
+            "content": path,
+        }
+
+        with mock.patch(
+            "interpreter.core.llm.utils.image_descriptions.hashlib.sha256",
+            wraps=hashlib.sha256,
+        ) as sha256:
+            for _ in range(3):
+                service.key(image("cat"))
+                first_key = service.key(on_disk)
+            self.assertEqual(sha256.call_count, 2)
+
+            # A changed file is hashed again
+            with open(path, "wb") as f:
+                f.write(b"second, longer")
+            self.assertNotEqual(service.key(on_disk), first_key)
+            self.assertEqual(sha256.call_count, 3)
+
+    def test_failures_are_raised_and_not_cached(self):
+        def broken(lmc):
+            raise ImportError("no moondream")
+
+        self.llm.vision_renderer = broken
+        service = self.service()
+        with self.assertRaises(ImportError):
+            service.describe(image("cat"))
+        time.sleep(0.05)
+        self.assertFalse(service.is_ready(image("cat")))
+
+        # A different renderer describes the same image separately
+        self.llm.vision_renderer = self.vision.query
+        self.assertEqual(
+            service.describe(image("cat")), ("a picture of cat", "text in cat")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
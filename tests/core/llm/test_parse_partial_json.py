@@ -0,0 +1,83 @@
+import json
+import random
+import unittest
+
+from interpreter.core.llm.utils.parse_partial_json import (
+    PartialJsonParser,
+    parse_partial_json,
+)
+
+
+def feed_in_pieces(document, seed=0):
+    rng = random.Random(seed)
+    parser = PartialJsonParser()
+    streamed = {}
+    i = 0
+    while i < len(document):
+        size = rng.randint(1, 8)
+        for key, text in parser.feed(document[i : i + size]).items():
+            streamed[key] = streamed.get(key, "") + text
+        i += size
+    return parser, streamed
+
+
+class TestPartialJsonParser(unittest.TestCase):
+    def test_matches_json_loads(self):
+        arguments = {
+            "language": "python",
+            "code": 'print("hi")\n\tpath = "C:\\\\Users" # café 😀',
+            "timeout": 5,
+            "options": {"env": ["A", "}"], "shell": None},
+        }
+        for document in [json.dumps(arguments), json.dumps(arguments, indent=2)]:
+            for seed in range(20):
+                parser, streamed = feed_in_pieces(document, seed)
+
+                self.assertFalse(parser.failed)
+                self.assertEqual(parser.value, arguments)
+                self.assertEqual(streamed["code"], arguments["code"])
+                self.assertEqual(streamed["language"], "python")
+
+    def test_partial_string_is_available_while_streaming(self):
+        parser = PartialJsonParser()
+        parser.feed('{"language": "python", "code": "import o')
+
+        self.assertEqual(parser.completed, {"language"})
+        self.assertEqual(parser.get("code"), "import o")
+        self.assertEqual(
+            parser.value, parse_partial_json('{"language": "python", "code": "import o')
+        )
+
+        self.assertEqual(parser.feed('s\\nprint(1)"}'), {"code": "s\nprint(1)"})
+        self.assertEqual(parser.get("code"), "import os\nprint(1)")
+        self.assertEqual(parser.text_since("code", 9), "\nprint(1)")
+
+    def test_escape_split_across_feeds(self):
+        parser = PartialJsonParser()
+        parser.feed('{"code": "a\\')
+        parser.feed("u00")
+        parser.feed('e9"}')
+
+        self.assertEqual(parser.get("code"), "aé")
+
+    def test_malformed_unicode_escape(self):
+        for document in ['{"code": "a\\uZZZZ"}', '{"code": "a\\ud83d\\uZZZZ"}']:
+            parser = PartialJsonParser()
+            parser.feed(document)
+
+            self.assertTrue(parser.failed)
+
+    def test_raw_newlines_are_kept(self):
+        # LLMs often put literal newlines in their JSON strings
+        parser = PartialJsonParser()
+        parser.feed('{"code": "a\nb"}')
+
+        self.assertEqual(parser.get("code"), "a\nb")
+
+    def test_not_json(self):
+        parser = PartialJsonParser()
+        parser.feed("print('hello')")
+
+        self.assertTrue(parser.failed)
+        self.assertIsNone(parser.value)
+        self.assertEqual(parser.feed("more"), {})
@@ -0,0 +1,96 @@
+import asyncio
+import unittest
+
+from interpreter.core.acknowledgements import AckWindow
+
+
+class TestAckWindow(unittest.TestCase):
+    def test_keeps_several_outputs_in_flight(self):
+        sent = []
+
+        async def transmit(output):
+            sent.append(output["id"])
+
+        async def main():
+            window = AckWindow(transmit, size=3, timeout=10)
+            for i in range(3):
+                await window.send(i, {"id": i})
+
+            # The window is full, so the fourth output waits for an acknowledgement
+            fourth = asyncio.ensure_future(window.send(3, {"id": 3}))
+            await asyncio.sleep(0.05)
+            self.assertFalse(fourth.done())
+
+            self.assertTrue(window.ack(1))
+            await asyncio.wait_for(fourth, 1)
+            for i in [0, 2, 3]:
+                window.ack(i)
+            await window.join()
+            return window
+
+        window = asyncio.run(main())
+
+        self.assertEqual(sent, [0, 1, 2, 3])
+        self.assertEqual(window.acknowledged, 4)
+        self.assertEqual(len(window), 0)
+
+    def test_retransmits_then_gives_up(self):
+        sent = []
+        failed = []
+
+        async def transmit(output):
+            sent.append(output["id"])
+
+        async def main():
+            window = AckWindow(
+                transmit, timeout=0.01, retries=2, on_failure=failed.append
+            )
+            await window.send("a", {"id": "a"})
+            await window.join()
+            return window
+
+        window = asyncio.run(main())
+
+        self.assertEqual(sent, ["a", "a", "a"])
+        self.assertEqual(failed, [{"id": "a"}])
+        self.assertEqual(window.retransmitted, 2)
+
+    def test_acknowledgement_during_send(self):
+        async def main():
+            async def transmit(output):
+                # The client acknowledges before send() returns
+                window.ack(output["id"])
+
+            window = AckWindow(transmit, timeout=0.01, retries=0)
+            await window.send("a", {"id": "a"})
+            await window.join()
+            return window
+
+        window = asyncio.run(main())
+
+        self.assertEqual(window.acknowledged, 1)
+        self.assertEqual(window.failed, 0)
+
+    def test_close_returns_unacknowledged_outputs(self):
+        async def transmit(output):
+            pass
+
+        async def main():
+            window = AckWindow(transmit, timeout=10)
+            for i in range(3):
+                await window.send(i, {"id": i})
+            window.ack(1)
+            return window.close()
+
+        self.assertEqual(asyncio.run(main()), [{"id": 0}, {"id": 2}])
+
+    def test_unknown_ids_are_ignored(self):
+        async def main():
+            window = AckWindow(lambda output: asyncio.sleep(0))
+            return window.ack("never-sent")
+
+        self.assertFalse(asyncio.run(main()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,10 @@
+import asyncio
 import os
+import threading
+import time
 from unittest import TestCase, mock
 
-from interpreter.core.async_core import Server, AsyncInterpreter
+from interpreter.core.async_core import AsyncInterpreter, Server, stream_in_thread
 
 
 class TestServerConstruction(TestCase):
@@ -46,3 +49,121 @@ class TestServerConstruction(TestCase):
             s = Server(AsyncInterpreter())
             self.assertEqual(s.host, fake_host)
             self.assertEqual(s.port, fake_port)
+
+
+    def test_sessions_are_served_by_the_same_server(self):
+        interpreter = AsyncInterpreter()
+        with mock.patch("interpreter.core.async_core.Server") as server:
+            session = interpreter.server.sessions.get("a")
+        server.assert_not_called()
+        self.assertIs(session.server, interpreter.server)
+        self.assertEqual(session.id, "a")
+
+
+class TestStreamInThread(TestCase):
+    """
+    Tests that blocking generators are streamed without blocking the event loop.
+    """
+
+    def test_event_loop_stays_responsive(self):
+        def slow_generator():
+            for i in range(5):
+                time.sleep(0.1)  # Like waiting on the LLM or running code
+                yield i
+
+        async def heartbeat(latencies, done):
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                latencies.append(time.perf_counter() - start)
+
+        async def main():
+            latencies = []
+            done = asyncio.Event()
+            heartbeat_task = asyncio.ensure_future(heartbeat(latencies, done))
+            items = [item async for item in stream_in_thread(slow_generator)]
+            done.set()
+            await heartbeat_task
+            return items, latencies
+
+        items, latencies = asyncio.run(main())
+
+        self.assertEqual(items, [0, 1, 2, 3, 4])
+        # Iterating on the event loop would stall these for 100ms at a time
+        self.assertLess(max(latencies), 0.08)
+
+    def test_applies_backpressure_and_closes_early(self):
+        produced = []
+        closed = threading.Event()
+
+        def fast_generator():
+            try:
+                for i in range(1000):
+                    produced.append(i)
+                    yield i
+            finally:
+                closed.set()
+
+        async def main():
+            chunks = stream_in_thread(fast_generator, max_buffered=4)
+            try:
+                async for item in chunks:
+                    await asyncio.sleep(0.05)
+                    break
+            finally:
+                await chunks.aclose()
+
+        asyncio.run(main())
+
+        self.assertTrue(closed.wait(2))
+        self.assertLess(len(produced), 10)
+
+    def test_raises_generator_errors(self):
+        def failing_generator():
+            yield 1
+            raise RuntimeError("boom")
+
+        async def main():
+            return [item async for item in stream_in_thread(failing_generator)]
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(main())
+
+    def test_waits_for_a_worker_slot(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+
+        async def main():
+            chunks = stream_in_thread(lambda: iter([1]), worker_slots=slots)
+            task = asyncio.ensure_future(chunks.__anext__())
+            await asyncio.sleep(0.2)
+            self.assertFalse(task.done())
+            slots.release()
+            return await task
+
+        self.assertEqual(asyncio.run(main()), 1)
+
+    def test_stops_when_the_event_loop_is_closed(self):
+        closed = threading.Event()
+        errors = []
+
+        def generator():
+            try:
+                for i in range(1000):
+                    time.sleep(0.01)
+                    yield i
+            finally:
+                closed.set()
+
+        loop = asyncio.new_event_loop()
+        chunks = stream_in_thread(generator, max_buffered=1)
+        self.assertEqual(loop.run_until_complete(chunks.__anext__()), 0)
+        loop.close()  # Without closing the stream
+
+        excepthook = threading.excepthook
+        threading.excepthook = errors.append
+        try:
+            self.assertTrue(closed.wait(2))
+        finally:
+            threading.excepthook = excepthook
+        self.assertEqual(errors, [])
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from interpreter.core.knowledge_store import KnowledgeStore
+
+
+class TestKnowledgeStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = KnowledgeStore(
+            os.path.join(self.directory.name, "knowledge.sqlite")
+        )
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def count(self, table):
+        return self.store.connection.execute(
+            f"SELECT COUNT(*) FROM {table}"
+        ).fetchone()[0]
+
+    def test_content_is_stored_once_and_referenced_per_agent(self):
+        content = "A long result. " * 1000
+        first = self.store.add(range(50), "task_a", content)
+        second = self.store.add([1, 2], "task_b", content)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.count("knowledge"), 1)
+        self.assertEqual(self.count("knowledge_refs"), 52)
+        self.assertEqual(self.store.get(first), content)
+        self.assertIsNone(self.store.get("missing"))
+
+    def test_latest_and_references(self):
+        self.store.add(["lead"], "plan", "first")
+        self.store.add(["lead", "helper"], "plan", "second")
+        self.assertEqual(self.store.latest("lead", "plan"), "second")
+        self.assertEqual(self.store.latest("helper", "plan"), "second")
+        self.assertIsNone(self.store.latest("helper", "other"))
+        self.assertEqual(
+            [reference["key"] for reference in self.store.references("lead")],
+            ["plan", "plan"],
+        )
+
+    def test_concurrent_adds(self):
+        threads = [
+            threading.Thread(
+                target=self.store.add, args=([i], "key", f"content {i % 5}")
+            )
+            for i in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.count("knowledge"), 5)
+        self.assertEqual(self.count("knowledge_refs"), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,232 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from interpreter.core.llm_client import LLMClient
+from interpreter.core.openrouter_client import OpenRouterClient
+
+
+class MockServer:
+    """
+    A local HTTP server that answers every request with its path and body, after `delay`
+    seconds, or with `failures` error statuses first. Records what it saw.
+    """
+
+    def __init__(self):
+        self.delay = 0
+        self.failures = []  # Statuses to answer with before succeeding
+        self.hits = 0
+        self.ports = set()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive
+
+            def log_message(self, *args):
+                pass
+
+            def handle_request(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                with mock.lock:
+                    mock.hits += 1
+                    mock.ports.add(self.client_address[1])
+                    mock.active += 1
+                    mock.max_active = max(mock.max_active, mock.active)
+                    status = mock.failures.pop(0) if mock.failures else 200
+                try:
+                    time.sleep(mock.delay)
+                finally:
+                    with mock.lock:
+                        mock.active -= 1
+
+                content = json.dumps({"path": self.path, "body": body}).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client timed out
+
+            do_GET = do_POST = handle_request
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestLLMClient(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer()
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.server.close()
+
+    def client(self, provider=None, **kwargs):
+        # A provider of its own, as the concurrency limit is shared by a provider's clients
+        provider_class = type(
+            "Client", (LLMClient,), {"provider": provider or self.id()}
+        )
+        kwargs.setdefault("backoff", 0.01)
+        client = provider_class(**kwargs)
+        self.clients.append(client)
+        return client
+
+    def test_reuses_connections(self):
+        client = self.client(max_concurrency=1)
+        for i in range(5):
+            response = client.request(
+                "POST", self.server.url + "/chat", json_data={"n": i}
+            )
+            self.assertEqual(response, {"path": "/chat", "body": {"n": i}})
+        self.assertEqual(self.server.hits, 5)
+        self.assertEqual(len(self.server.ports), 1)
+
+    def test_retries_rate_limits_and_server_errors(self):
+        self.server.failures = [429, 503]
+        client = self.client(max_retries=2)
+        response = client.request("GET", self.server.url + "/models")
+        self.assertEqual(response["path"], "/models")
+        self.assertEqual(self.server.hits, 3)
+        self.assertEqual(client.retries, 2)
+
+    def test_gives_up_after_max_retries(self):
+        self.server.failures = [503, 503]
+        client = self.client(max_retries=1)
+        with self.assertRaises(requests.HTTPError):
+            client.request("GET", self.server.url + "/models")
+        self.assertEqual(self.server.hits, 2)
+
+    def test_client_errors_are_not_retried(self):
+        self.server.failures = [400]
+        client = self.client(max_retries=3)
+        with self.assertRaises(requests.HTTPError):
+            client.request("GET", self.server.url + "/models")
+        self.assertEqual(self.server.hits, 1)
+
+    def test_timeout(self):
+        self.server.delay = 0.5
+        client = self.client(timeout=0.1, max_retries=0)
+        with self.assertRaises(requests.Timeout):
+            client.request("GET", self.server.url + "/slow")
+
+    def test_async_calls_respect_the_concurrency_limit(self):
+        self.server.delay = 0.05
+        client = self.client(max_concurrency=2)
+
+        async def main():
+            return await asyncio.gather(
+                *(
+                    client.run_async(
+                        client.request, "POST", self.server.url + "/chat", {"n": i}
+                    )
+                    for i in range(8)
+                )
+            )
+
+        responses = asyncio.run(main())
+        self.assertEqual(
+            [response["body"]["n"] for response in responses], list(range(8))
+        )
+        self.assertEqual(self.server.hits, 8)
+        self.assertEqual(self.server.max_active, 2)
+
+    def test_clients_of_a_provider_share_its_limit(self):
+        self.server.delay = 0.05
+        clients = [self.client(provider="shared", max_concurrency=2) for _ in range(3)]
+        self.assertIs(clients[0].limit, clients[2].limit)
+
+        async def main():
+            await asyncio.gather(
+                *(
+                    client.run_async(
+                        client.request, "POST", self.server.url + "/chat", {"n": i}
+                    )
+                    for i, client in enumerate(clients * 2)
+                )
+            )
+
+        asyncio.run(main())
+        self.assertEqual(self.server.hits, 6)
+        self.assertEqual(self.server.max_active, 2)
+
+    def test_identical_requests_are_coalesced(self):
+        self.server.delay = 0.2
+        client = self.client()
+
+        async def main():
+            return await asyncio.gather(
+                *(
+                    client.run_async(
+                        client.request,
+                        "POST",
+                        self.server.url + "/chat",
+                        {"prompt": "hi"},
+                    )
+                    for _ in range(4)
+                )
+            )
+
+        responses = asyncio.run(main())
+        self.assertEqual(self.server.hits, 1)
+        self.assertEqual(client.coalesced, 3)
+        self.assertTrue(all(response == responses[0] for response in responses))
+        # Each caller gets its own copy
+        self.assertEqual(len({id(response) for response in responses}), 4)
+
+    def test_coalescing_can_be_turned_off(self):
+        self.server.delay = 0.1
+        client = self.client()
+        client.coalesce = False
+
+        async def main():
+            await asyncio.gather(
+                *(
+                    client.run_async(
+                        client.request,
+                        "POST",
+                        self.server.url + "/chat",
+                        {"prompt": "hi"},
+                    )
+                    for _ in range(3)
+                )
+            )
+
+        asyncio.run(main())
+        self.assertEqual(self.server.hits, 3)
+
+    def test_openrouter_client(self):
+        client = OpenRouterClient(max_concurrency=4)
+        self.clients.append(client)
+        client.BASE_URL = self.server.url
+        client.set_api_key("key")
+
+        response = asyncio.run(
+            client.achat_completion([{"role": "user", "content": "hi"}])
+        )
+        self.assertEqual(response["path"], "/chat/completions")
+        self.assertEqual(response["body"]["model"], client.default_model)
+
+
+if __name__ == "__main__":
+    unittest.main()
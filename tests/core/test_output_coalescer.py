@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+
+from interpreter.core.output_coalescer import OutputCoalescer, can_merge
+
+
+def token(content, type="message", role="assistant"):
+    return {"role": role, "type": type, "content": content}
+
+
+class TestOutputCoalescer(unittest.TestCase):
+    def collect_all(self, outputs, coalescer):
+        async def main():
+            queue = asyncio.Queue()
+            for output in outputs:
+                queue.put_nowait(output)
+
+            sent = []
+            output = None
+            while output is not None or not queue.empty():
+                if output is None:
+                    output = queue.get_nowait()
+                output, output_after = await coalescer.collect(output, queue.get_nowait)
+                sent.append(output)
+                output = output_after
+            return sent
+
+        return asyncio.run(main())
+
+    def test_merges_tokens_of_the_same_message(self):
+        outputs = [
+            {"role": "assistant", "type": "message", "start": True},
+            token("Hel"),
+            token("lo"),
+            token("!"),
+            {"role": "assistant", "type": "message", "end": True},
+            {"role": "assistant", "type": "code", "format": "python", "start": True},
+            token("print(1)", type="code"),
+        ]
+
+        sent = self.collect_all(outputs, OutputCoalescer(window=0.01))
+
+        self.assertEqual(
+            sent,
+            [
+                {"role": "assistant", "type": "message", "start": True},
+                token("Hello!"),
+                {"role": "assistant", "type": "message", "end": True},
+                {
+                    "role": "assistant",
+                    "type": "code",
+                    "format": "python",
+                    "start": True,
+                },
+                token("print(1)", type="code"),
+            ],
+        )
+
+    def test_respects_byte_budget(self):
+        outputs = [token("abcd") for _ in range(5)]
+
+        sent = self.collect_all(outputs, OutputCoalescer(window=1, max_bytes=8))
+
+        self.assertEqual(
+            [output["content"] for output in sent], ["abcdabcd"] * 2 + ["abcd"]
+        )
+
+    def test_waits_for_the_window(self):
+        async def main():
+            coalescer = OutputCoalescer(window=0.05)
+            queue = asyncio.Queue()
+            asyncio.get_running_loop().call_later(0.01, queue.put_nowait, token("b"))
+            return await coalescer.collect(token("a"), queue.get_nowait)
+
+        self.assertEqual(asyncio.run(main()), (token("ab"), None))
+
+    def test_does_not_merge_different_messages(self):
+        self.assertFalse(can_merge(token("a"), token("b", type="code")))
+        self.assertFalse(can_merge(token("a"), token("b", role="user")))
+        self.assertFalse(can_merge(token("a"), dict(token("b"), id="x")))
+        self.assertFalse(can_merge(token("a"), b"bytes"))
+        self.assertTrue(can_merge(token("a"), token("b")))
+
+
+if __name__ == "__main__":
+    unittest.main()
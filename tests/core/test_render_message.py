@@ -0,0 +1,72 @@
+import unittest
+from unittest import mock
+
+from interpreter.core.render_message import RenderCache, render_message
+
+
+def make_interpreter():
+    interpreter = mock.Mock()
+    interpreter.verbose = False
+    interpreter.debug = False
+    interpreter.custom_instructions = "Be brief."
+    interpreter.computer.save_skills = True
+    interpreter.computer.run.return_value = [
+        {"type": "console", "format": "output", "content": "Darwin"}
+    ]
+    interpreter.render_cache = RenderCache()
+    return interpreter
+
+
+class TestRenderMessage(unittest.TestCase):
+    def test_uncached_blocks_run_every_time(self):
+        interpreter = make_interpreter()
+
+        for _ in range(3):
+            rendered = render_message(interpreter, "OS: {{print('Darwin')}}")
+
+        self.assertEqual(rendered, "OS: Darwin")
+        self.assertEqual(interpreter.computer.run.call_count, 3)
+        self.assertEqual(len(interpreter.render_cache), 0)
+
+    def test_cached_block_runs_once(self):
+        interpreter = make_interpreter()
+        message = "OS: {{\n# cache\nprint('Darwin')\n}}"
+
+        for _ in range(3):
+            rendered = render_message(interpreter, message)
+
+        self.assertEqual(rendered, "OS: Darwin")
+        self.assertEqual(interpreter.computer.run.call_count, 1)
+        self.assertEqual(interpreter.render_cache.hits, 2)
+        self.assertTrue(interpreter.computer.save_skills)
+
+    def test_dependency_change_invalidates(self):
+        interpreter = make_interpreter()
+        message = "{{\n# cache: depends=custom_instructions\nprint('Darwin')\n}}"
+
+        render_message(interpreter, message)
+        render_message(interpreter, message)
+        interpreter.custom_instructions = "Be verbose."
+        render_message(interpreter, message)
+
+        self.assertEqual(interpreter.computer.run.call_count, 2)
+
+    @mock.patch("interpreter.core.render_message.time.time")
+    def test_ttl_expiry(self, mock_time):
+        interpreter = make_interpreter()
+        message = "{{\n# cache: ttl=10\nprint('Darwin')\n}}"
+
+        mock_time.return_value = 100
+        render_message(interpreter, message)
+        mock_time.return_value = 105
+        render_message(interpreter, message)
+        mock_time.return_value = 111
+        render_message(interpreter, message)
+
+        self.assertEqual(interpreter.computer.run.call_count, 2)
+
+    def test_static_message_skips_computer(self):
+        interpreter = make_interpreter()
+
+        self.assertEqual(render_message(interpreter, "  Hello  "), "Hello")
+        interpreter.computer.run.assert_not_called()
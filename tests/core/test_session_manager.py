@@ -0,0 +1,190 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from interpreter.core.session_manager import SessionManager, copy_settings
+
+
+class FakeInterpreter:
+    def __init__(self):
+        self.messages = []
+        self.auto_run = False
+        self.context_mode = False
+        self.last_start_time = 0
+        self.respond_thread = None
+        self.stop_event = threading.Event()
+        self.llm = mock.Mock(spec=[])
+        self.llm.model = "gpt-4o"
+        self.computer = mock.Mock()
+
+
+class TestSessionManager(unittest.TestCase):
+    def setUp(self):
+        self.storage = tempfile.TemporaryDirectory()
+        self.base = FakeInterpreter()
+        self.manager = SessionManager(
+            self.base, max_sessions=2, idle_timeout=60, storage_path=self.storage.name
+        )
+
+    def tearDown(self):
+        self.manager.shutdown()
+        self.storage.cleanup()
+
+    def test_sessions_are_isolated(self):
+        a = self.manager.get("a")
+        b = self.manager.get("b")
+
+        a.messages.append({"role": "user", "type": "message", "content": "hi"})
+
+        self.assertIsNot(a, b)
+        self.assertIsNot(a.computer, b.computer)
+        self.assertEqual(b.messages, [])
+        self.assertIs(self.manager.get("a"), a)
+        self.assertIs(a.worker_slots, self.manager.worker_slots)
+
+    def test_new_sessions_copy_settings(self):
+        self.base.auto_run = True
+        self.base.llm.model = "some-other-model"
+        self.base.messages.append({"role": "user", "type": "message", "content": "x"})
+
+        session = self.manager.get("a")
+
+        self.assertTrue(session.auto_run)
+        self.assertEqual(session.llm.model, "some-other-model")
+        self.assertEqual(session.messages, [])
+
+    def test_least_recently_used_session_is_evicted_and_restored(self):
+        a = self.manager.get("a")
+        a.messages.append({"role": "user", "type": "message", "content": "hi"})
+        a.messages.append({"role": "user", "type": "image", "content": b"\x89PNG"})
+        a.auto_run = True
+        self.manager.get("b")
+        self.manager.get("c")
+
+        self.assertNotIn("a", self.manager.sessions)
+        a.computer.terminate.assert_called_once()
+        self.assertTrue(os.path.exists(os.path.join(self.storage.name, "a.json")))
+
+        restored = self.manager.get("a")
+
+        self.assertIsNot(restored, a)
+        self.assertEqual(restored.messages, a.messages)
+        self.assertTrue(restored.auto_run)
+        self.assertEqual(self.manager.restored, 1)
+
+    def test_corrupt_saved_session_starts_fresh(self):
+        with open(os.path.join(self.storage.name, "a.json"), "w") as f:
+            f.write('{"id": "a", "messages": [{"role": "us')
+
+        with mock.patch("builtins.print"):
+            session = self.manager.get("a")
+
+        self.assertEqual(session.messages, [])
+        self.assertEqual(self.manager.restored, 0)
+        self.assertEqual(self.manager.created, 1)
+
+    def test_failed_save_does_not_fail_other_sessions(self):
+        a = self.manager.get("a")
+        self.manager.get("b")
+        with mock.patch.object(
+            self.manager, "_save", side_effect=OSError("disk full")
+        ), mock.patch("builtins.print"):
+            c = self.manager.get("c")
+
+        self.assertEqual(c.id, "c")
+        # "a" couldn't be saved, so it's kept rather than lost
+        self.assertIn("a", self.manager.sessions)
+        a.computer.terminate.assert_not_called()
+
+    def test_saving_an_evicted_session_does_not_block_others(self):
+        a = self.manager.get("a")
+        a.messages.append({"role": "user", "type": "message", "content": "hi"})
+        saving = threading.Event()
+        finish_saving = threading.Event()
+        save = self.manager._save
+
+        def slow_save(session_id, session):
+            saving.set()
+            finish_saving.wait(5)
+            save(session_id, session)
+
+        self.manager.idle_timeout = 0.01
+        time.sleep(0.05)
+        with mock.patch.object(self.manager, "_save", side_effect=slow_save):
+            evicting = threading.Thread(target=self.manager.evict_idle)
+            evicting.start()
+            self.assertTrue(saving.wait(5))
+
+            self.manager.idle_timeout = 60
+            getting_b = threading.Thread(target=self.manager.get, args=("b",))
+            getting_b.start()
+            getting_b.join(1)
+            self.assertFalse(getting_b.is_alive())
+
+            # Asking for the session being saved waits for it, then restores it
+            restored = []
+            getting_a = threading.Thread(
+                target=lambda: restored.append(self.manager.get("a"))
+            )
+            getting_a.start()
+            getting_a.join(0.1)
+            self.assertTrue(getting_a.is_alive())
+
+            finish_saving.set()
+            evicting.join(5)
+            getting_a.join(5)
+
+        self.assertIsNot(restored[0], a)
+        self.assertEqual(restored[0].messages, a.messages)
+        a.computer.terminate.assert_called_once()
+
+    def test_busy_sessions_are_not_evicted(self):
+        self.manager.connect("a")
+        self.manager.get("b")
+        self.manager.get("c")
+
+        self.assertIn("a", self.manager.sessions)
+        self.assertNotIn("b", self.manager.sessions)
+
+    def test_idle_sessions_are_evicted(self):
+        self.manager.get("a")
+        self.manager.idle_timeout = 0.01
+        time.sleep(0.05)
+
+        self.manager.evict_idle()
+
+        self.assertEqual(self.manager.sessions, {})
+        self.assertEqual(self.manager.evicted, 1)
+
+    def test_rejects_unsafe_session_ids(self):
+        with self.assertRaises(ValueError):
+            self.manager.get("../../etc/passwd")
+
+    def test_delete_forgets_session(self):
+        self.manager.get("a").messages.append({"role": "user", "content": "hi"})
+        self.manager.evict("a")
+
+        self.manager.delete("a")
+
+        self.assertEqual(self.manager.get("a").messages, [])
+
+
+class TestCopySettings(unittest.TestCase):
+    def test_skips_conversation_state(self):
+        source = FakeInterpreter()
+        source.messages.append({"role": "user", "content": "hi"})
+        source.id = "base"
+        source._private = 1
+
+        target = copy_settings(source, FakeInterpreter())
+
+        self.assertEqual(target.messages, [])
+        self.assertFalse(hasattr(target, "id"))
+        self.assertFalse(hasattr(target, "_private"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,439 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from interpreter.core.agent import Agent
+from interpreter.core.task_assignment import (
+    AgentIndex,
+    AnalysisCache,
+    SubtaskExecutor,
+    TaskAssignmentSystem,
+    normalize_subtasks,
+    parse_analysis,
+)
+from interpreter.core.utils.history import BoundedList
+
+
+class StubOpenRouterClient:
+    """
+    Answers task analyses from a table, and everything else after a delay.
+    """
+
+    def __init__(self, analyses, delay=0.2):
+        self.analyses = analyses
+        self.delay = delay
+        self.analysis_calls = 0
+
+    def chat_completion(self, messages, model=None):
+        prompt = messages[-1]["content"]
+        for description, analysis in self.analyses.items():
+            if (
+                "Analyze the following task" in prompt
+                and f"Task: {description}\n" in prompt
+            ):
+                self.analysis_calls += 1
+                return {"choices": [{"message": {"content": analysis}}]}
+        time.sleep(self.delay)
+        return {"choices": [{"message": {"content": "Reviewed."}}]}
+
+
+class StubAgent(Agent):
+    def __init__(self, name, role="general", work_time=0.2):
+        super().__init__(name)
+        self.id = name
+        self.name = name
+        self.role = role
+        self.status = "idle"
+        self.capabilities = ["research"]
+        self.managed_agents = []
+        self.user_feedback = []
+        self.task_history = []
+        self.persistent_knowledge_base = {}
+        self.knowledge_base = {}
+        self.work_time = work_time
+        self.tasks = []
+
+    def assign_task(self, task):
+        self.tasks.append(task)
+
+    def complete_task(self):
+        time.sleep(self.work_time)
+        return f"{self.name} did {self.tasks[-1]['description']}"
+
+    def summarize_results(self, results):
+        return " | ".join(results)
+
+    def self_critique(self, *args):
+        return "Fine."
+
+    def evaluate_agent(self, *args):
+        return "Good."
+
+    def optimize_agent(self, *args):
+        return "Nothing."
+
+    def update_knowledge_base(self, key, value):
+        pass
+
+
+def simple_analysis():
+    return "Capabilities: research\nComplexity: simple\nBreakdown: no\n"
+
+
+class TestSubtaskExecutor(unittest.TestCase):
+    def test_normalize_subtasks(self):
+        nodes = normalize_subtasks(
+            ["a", {"id": "x", "description": "b", "depends_on": [1]}]
+        )
+        self.assertEqual(list(nodes), ["1", "x"])
+        self.assertEqual(nodes["x"]["depends_on"], ["1"])
+        with self.assertRaises(ValueError):
+            normalize_subtasks(
+                [
+                    {"id": 1, "description": "a", "depends_on": [2]},
+                    {"id": 2, "description": "b", "depends_on": [1]},
+                ]
+            )
+        with self.assertRaises(ValueError):
+            normalize_subtasks([{"description": "a", "depends_on": [5]}])
+
+    def test_dependencies_run_first_and_failures_skip_dependents(self):
+        order = []
+        lock = threading.Lock()
+
+        def run_subtask(subtask, dependency_results):
+            with lock:
+                order.append(subtask["id"])
+            if subtask["id"] == "bad":
+                raise RuntimeError("broken")
+            return subtask["description"] + "".join(dependency_results.values())
+
+        progress = {}
+        nodes = SubtaskExecutor(run_subtask, max_workers=3).run(
+            [
+                {"id": "a", "description": "A"},
+                {"id": "b", "description": "B", "depends_on": ["a"]},
+                {"id": "c", "description": "C", "depends_on": ["a", "b"]},
+                {"id": "bad", "description": "X"},
+                {"id": "after_bad", "description": "Y", "depends_on": ["bad"]},
+            ],
+            progress,
+        )
+        self.assertIs(progress["c"], nodes["c"])
+        self.assertEqual(nodes["c"]["result"], "CABA")
+        self.assertLess(order.index("a"), order.index("b"))
+        self.assertLess(order.index("b"), order.index("c"))
+        self.assertEqual(nodes["bad"]["status"], "failed")
+        self.assertEqual(nodes["after_bad"]["status"], "skipped")
+        self.assertNotIn("after_bad", order)
+
+
+class TestAnalysis(unittest.TestCase):
+    def test_parse_analysis(self):
+        analysis = parse_analysis(
+            'Here you go:\n```json\n{"required_capabilities": ["python", " "], "complexity": "Complex", '
+            '"needs_breakdown": true, "subtasks": [{"id": "a", "description": "Profile"}, '
+            '{"id": "b", "description": "Optimize", "depends_on": ["a"]}]}\n```'
+        )
+        self.assertEqual(analysis["required_capabilities"], ["python"])
+        self.assertEqual(analysis["complexity"], "complex")
+        self.assertTrue(analysis["needs_breakdown"])
+        self.assertEqual(
+            analysis["subtasks"][1],
+            {"id": "b", "description": "Optimize", "depends_on": ["a"]},
+        )
+
+        valid = {
+            "required_capabilities": [],
+            "complexity": "simple",
+            "needs_breakdown": False,
+            "subtasks": [],
+        }
+        for bad in [
+            "no json",
+            "{oops}",
+            json.dumps(dict(valid, complexity="huge")),
+            json.dumps(dict(valid, required_capabilities="python")),
+            json.dumps(dict(valid, needs_breakdown="false")),
+            json.dumps(
+                dict(valid, needs_breakdown=True, subtasks=[{"description": "No id"}])
+            ),
+            json.dumps(
+                {
+                    key: value
+                    for key, value in valid.items()
+                    if key != "required_capabilities"
+                }
+            ),
+        ]:
+            with self.assertRaises(ValueError):
+                parse_analysis(bad)
+
+    def test_cache_expires_invalidates_and_computes_once_at_a_time(self):
+        cache = AnalysisCache(ttl=60)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"complexity": "simple"}
+
+        threads = [
+            threading.Thread(target=cache.get, args=("Write  the Report", compute))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(
+            cache.get("write the report", compute), {"complexity": "simple"}
+        )
+        self.assertEqual(len(calls), 1)
+
+        cache.invalidate("WRITE THE REPORT")
+        cache.get("write the report", compute)
+        self.assertEqual(len(calls), 2)
+
+        cache.ttl = 0
+        cache.get("write the report", compute)
+        self.assertEqual(len(calls), 3)
+
+        with self.assertRaises(ZeroDivisionError):
+            cache.get("other", lambda: 1 / 0)
+        self.assertEqual(
+            cache.get("other", compute), {"complexity": "simple"}
+        )  # Errors aren't cached
+
+
+class TestAgentIndex(unittest.TestCase):
+    def test_candidates_match_a_full_scan(self):
+        random.seed(0)
+        lead = StubAgent("lead", role="lead")
+        lead.capabilities = ["delegation"]
+        for i in range(300):
+            agent = StubAgent(
+                f"agent{i}", role=random.choice(["general", "specialized"])
+            )
+            agent.capabilities = random.sample([f"cap{j}" for j in range(20)], 4)
+            lead.managed_agents.append(agent)
+        index = AgentIndex(lead)
+
+        for _ in range(50):
+            required = random.sample(
+                [f"cap{j}" for j in range(21)], random.randint(0, 2)
+            )
+            roles = random.choice([None, ["specialized"], ["specialized", "general"]])
+            expected = [
+                agent
+                for agent in [lead] + lead.managed_agents
+                if all(cap in agent.capabilities for cap in required)
+                and (roles is None or agent.role in roles)
+            ]
+            self.assertEqual(index.candidates(required, roles), expected)
+
+        newcomer = StubAgent("newcomer")
+        newcomer.capabilities = ["cap99"]
+        lead.managed_agents.append(newcomer)
+        self.assertEqual(index.candidates(["cap99"]), [newcomer])
+        self.assertEqual(index.matching_capabilities(newcomer, ["cap99", "cap1"]), 1)
+
+    def test_changed_agents_are_reindexed(self):
+        lead = StubAgent("lead", role="lead")
+        lead.managed_agents = [StubAgent(f"agent{i}") for i in range(3)]
+        index = AgentIndex(lead)
+        self.assertEqual(index.candidates(["writing"]), [])
+        with mock.patch.object(index, "refresh") as refresh:
+            index.candidates(["writing"])
+        refresh.assert_not_called()  # Nothing changed
+
+        lead.managed_agents[0].capabilities.append("writing")
+        self.assertEqual(index.candidates(["writing"]), [lead.managed_agents[0]])
+
+        lead.managed_agents[2].role = "specialized"
+        self.assertEqual(
+            index.candidates([], ["specialized"]), [lead.managed_agents[2]]
+        )
+
+        # Same length and same last agent, different agent in the middle
+        replacement = StubAgent("replacement")
+        replacement.capabilities = ["writing"]
+        lead.managed_agents[1] = replacement
+        self.assertEqual(
+            index.candidates(["writing"]), [lead.managed_agents[0], replacement]
+        )
+
+    def test_scores_follow_appended_records(self):
+        lead = StubAgent("lead", role="lead")
+        index = AgentIndex(lead)
+        lead.user_feedback += [
+            {"feedback": "Positive!"},
+            {"feedback": "negative"},
+            {"feedback": "positive"},
+        ]
+        lead.task_history += [{"status": "completed"}, {"status": "failed"}]
+        self.assertEqual(index.score(lead), 1.5)
+
+        lead.task_history.append({"status": "completed"})
+        self.assertEqual(index.score(lead), 2)
+
+        lead.user_feedback = [{"feedback": "negative"}]
+        self.assertEqual(index.score(lead), 0)
+
+        lead.task_history = BoundedList(maxlen=2)
+        for _ in range(5):
+            lead.task_history.append({"status": "completed"})
+            index.score(lead)
+        self.assertEqual(
+            index.score(lead), 1.5
+        )  # -1 + 5 * 0.5, though only 2 tasks are kept
+
+
+class TestTaskAssignmentSystem(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch("interpreter.core.task_assignment.db"),
+            mock.patch("interpreter.core.task_assignment.AgentModel", create=True),
+        ]
+        self.db = db = patches[0].start()
+        patches[1].start()
+        for patch in patches:
+            self.addCleanup(patch.stop)
+        db.session.query.return_value.get.return_value = mock.Mock(
+            task_history="[]", self_critiques="[]", user_feedback="[]"
+        )
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        environment = mock.patch.dict(
+            os.environ,
+            {
+                "INTERPRETER_KNOWLEDGE_DB": os.path.join(
+                    directory.name, "knowledge.sqlite"
+                )
+            },
+        )
+        environment.start()
+        self.addCleanup(environment.stop)
+
+        self.lead = StubAgent("lead", role="lead")
+        self.lead.capabilities = []  # Only managed agents can do the subtasks
+        self.workers = [StubAgent(f"worker{i}") for i in range(4)]
+        self.lead.managed_agents = self.workers
+
+    def test_independent_subtasks_run_concurrently(self):
+        subtasks = [f"part {i}" for i in range(4)]
+        analyses = {
+            "big job": "Capabilities: research\nComplexity: complex\nBreakdown: yes\nSubtasks:\n"
+            + "\n".join(subtasks)
+        }
+        analyses.update({subtask: simple_analysis() for subtask in subtasks})
+        system = TaskAssignmentSystem(self.lead, StubOpenRouterClient(analyses))
+
+        start = time.time()
+        result = system.coordinate_multi_agent_task({"description": "big job"})
+        elapsed = time.time() - start
+
+        # Each subtask takes 0.4s (0.2s of work, 0.2s of review), so sequentially this is 1.6s+
+        self.assertLess(elapsed, 1.2)
+        self.assertEqual(result, "Reviewed.")
+        self.assertEqual(
+            sorted(len(worker.tasks) for worker in self.workers), [1, 1, 1, 1]
+        )
+        self.assertTrue(all(worker.status == "idle" for worker in self.workers))
+
+        progress = [
+            entry for entry in system.task_progress.values() if "subtasks" in entry
+        ][0]
+        self.assertEqual(
+            [subtask["status"] for subtask in progress["subtasks"].values()],
+            ["completed"] * 4,
+        )
+        self.assertIn("did part 0", progress["subtasks"]["1"]["result"])
+
+    def test_a_task_is_analyzed_once_across_iterations(self):
+        client = StubOpenRouterClient({"write docs": simple_analysis()}, delay=0)
+        system = TaskAssignmentSystem(self.lead, client)
+        self.workers[0].work_time = 0
+
+        system.execute_task({"description": "write docs"}, iterations=3)
+        system.select_agents({"description": "Write docs"})
+        self.assertEqual(client.analysis_calls, 1)
+
+        system.invalidate_analysis({"description": "write docs"})
+        system.select_agents({"description": "write docs"})
+        self.assertEqual(client.analysis_calls, 2)
+
+    def test_results_are_shared_by_reference(self):
+        client = StubOpenRouterClient({"write docs": simple_analysis()}, delay=0)
+        system = TaskAssignmentSystem(self.lead, client)
+        self.workers[0].work_time = 0
+
+        system.execute_task({"description": "write docs"}, iterations=2)
+
+        store = system.knowledge_store.connection
+        self.assertEqual(
+            store.execute("SELECT COUNT(*) FROM knowledge").fetchone()[0], 1
+        )
+        self.assertEqual(
+            store.execute("SELECT COUNT(*) FROM knowledge_refs").fetchone()[0], 10
+        )
+        for agent in [self.lead] + self.workers:
+            self.assertEqual(
+                system.get_knowledge(agent, "task_write docs"),
+                "worker0 did write docs | Reviewed.",
+            )
+
+    def test_an_agent_is_released_if_assigning_fails(self):
+        self.lead.managed_agents = self.workers[:1]
+        system = TaskAssignmentSystem(
+            self.lead, StubOpenRouterClient({"write docs": simple_analysis()}, delay=0)
+        )
+        self.workers[0].work_time = 0
+        failures = [RuntimeError("database is down")]
+
+        def begin():
+            if failures:
+                raise failures.pop()
+            return mock.MagicMock()
+
+        self.db.session.begin.side_effect = begin
+
+        with self.assertRaises(RuntimeError):
+            system.execute_task({"description": "write docs"})
+        self.assertEqual(self.workers[0].status, "idle")
+
+        # The next task gets the agent, instead of waiting for it forever
+        finished = threading.Event()
+        threading.Thread(
+            target=lambda: (
+                system.execute_task({"description": "write docs"}),
+                finished.set(),
+            ),
+            daemon=True,
+        ).start()
+        self.assertTrue(finished.wait(3))
+        self.assertEqual(len(self.workers[0].tasks), 2)
+
+    def test_subtasks_wait_for_an_idle_agent(self):
+        self.lead.managed_agents = self.workers[:1]
+        analyses = {f"part {i}": simple_analysis() for i in range(3)}
+        system = TaskAssignmentSystem(
+            self.lead, StubOpenRouterClient(analyses, delay=0)
+        )
+        system.max_concurrent_subtasks = 3
+
+        nodes = system.execute_subtasks([f"part {i}" for i in range(3)])
+
+        self.assertEqual([node["status"] for node in nodes.values()], ["completed"] * 3)
+        self.assertEqual(len(self.workers[0].tasks), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import json
+import unittest
+
+from interpreter.core.utils.history import BoundedDict, BoundedList, WatchedList
+
+
+class TestBoundedList(unittest.TestCase):
+    def test_keeps_the_last_items(self):
+        history = BoundedList(range(5), maxlen=3)
+        self.assertEqual(history, [2, 3, 4])
+        history.append(5)
+        history += [6, 7]
+        self.assertEqual(history, [5, 6, 7])
+        self.assertEqual(history[-2:], [6, 7])
+        self.assertEqual(history.appended, 8)
+        self.assertEqual(json.loads(json.dumps(history)), [5, 6, 7])
+
+
+class TestBoundedDict(unittest.TestCase):
+    def test_keeps_the_newest_keys(self):
+        knowledge = BoundedDict({"a": 1, "b": 2}, maxlen=2)
+        knowledge["a"] = 3  # Now the newest
+        knowledge["c"] = 4
+        self.assertEqual(knowledge, {"a": 3, "c": 4})
+        knowledge.setdefault("d", 5)
+        self.assertEqual(list(knowledge), ["c", "d"])
+
+
+class TestWatchedList(unittest.TestCase):
+    def test_reports_every_change(self):
+        changes = []
+        capabilities = WatchedList(["a"], on_change=lambda: changes.append(1))
+        capabilities.append("b")
+        capabilities += ["c"]
+        capabilities[0] = "d"
+        del capabilities[1]
+        capabilities.sort()
+        self.assertEqual(len(changes), 5)
+        self.assertEqual(capabilities, ["c", "d"])
+        self.assertIsInstance(capabilities, WatchedList)
+        self.assertEqual(json.loads(json.dumps(capabilities)), ["c", "d"])
+
+
+if __name__ == "__main__":
+    unittest.main()
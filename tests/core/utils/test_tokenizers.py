@@ -0,0 +1,108 @@
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from interpreter.core.computer.ai.ai import chunk_responses, split_into_chunks
+from interpreter.core.utils import tokenizers
+
+
+class CharacterEncoding:
+    """One token per character, so tests don't need tiktoken's downloaded vocabularies."""
+
+    def __init__(self):
+        self.encode_calls = 0
+        self.decode_calls = 0
+
+    def encode(self, text, disallowed_special=()):
+        self.encode_calls += 1
+        return [ord(character) for character in text]
+
+    def decode(self, ids):
+        self.decode_calls += 1
+        return "".join(chr(id) for id in ids)
+
+
+class TestTokenizers(unittest.TestCase):
+    def setUp(self):
+        self.encodings = mock.patch.object(tokenizers, "_encodings", {})
+        self.encodings.start()
+        self.encoding = CharacterEncoding()
+        tokenizers.register_encoding("test-model", self.encoding)
+
+    def tearDown(self):
+        self.encodings.stop()
+
+    def test_loads_each_encoding_once_across_threads(self):
+        loads = []
+
+        def encoding_for_model(name):
+            loads.append(name)
+            time.sleep(0.05)
+            return CharacterEncoding()
+
+        fake_tiktoken = SimpleNamespace(encoding_for_model=encoding_for_model)
+        with mock.patch.object(tokenizers, "tiktoken", fake_tiktoken):
+            results = []
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(
+                        tokenizers.get_encoding("openai/gpt-4o")
+                    )
+                )
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(loads, ["gpt-4o"])
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_unknown_models_fall_back_to_cl100k(self):
+        def encoding_for_model(name):
+            raise KeyError(name)
+
+        fake_tiktoken = SimpleNamespace(
+            encoding_for_model=encoding_for_model, get_encoding=lambda name: name
+        )
+        with mock.patch.object(tokenizers, "tiktoken", fake_tiktoken):
+            self.assertEqual(tokenizers.get_encoding("mystery"), "cl100k_base")
+
+    def test_counts_are_estimated_without_a_tokenizer(self):
+        with mock.patch.object(tokenizers, "tiktoken", None):
+            self.assertEqual(tokenizers.count_tokens("x" * 10, "no-tokenizer"), 3)
+        self.assertEqual(tokenizers.count_tokens("x" * 10, "test-model"), 10)
+
+    def test_chunks_tokenize_once_and_overlap(self):
+        text = "".join(chr(ord("a") + i % 26) for i in range(1000))
+        chunks = list(tokenizers.iter_chunks(text, 300, 50, "test-model"))
+
+        self.assertEqual(self.encoding.encode_calls, 1)
+        self.assertEqual([len(chunk) for chunk in chunks], [300, 300, 300, 250])
+        for i, chunk in enumerate(chunks):
+            self.assertEqual(chunk, text[i * 250 : i * 250 + 300])
+
+    def test_character_chunks_without_a_tokenizer(self):
+        text = "y" * 1000
+        with mock.patch.object(tokenizers, "tiktoken", None):
+            chunks = list(tokenizers.iter_chunks(text, 100, 25, "no-tokenizer"))
+        self.assertEqual([len(chunk) for chunk in chunks], [400, 400, 400])
+
+    def test_ai_helpers_share_the_registry(self):
+        llm = SimpleNamespace(model="test-model")
+        self.assertEqual(split_into_chunks("abcdef", 4, llm, 2), ["abcd", "cdef"])
+
+        self.encoding.encode_calls = 0
+        responses = ["a" * 3, "b" * 3, "c" * 5, "d" * 9]
+        self.assertEqual(
+            chunk_responses(responses, 8, llm),
+            ["aaa\n\nbbb", "ccccc", "ddddddddd"],
+        )
+        self.assertEqual(self.encoding.encode_calls, len(responses))
+
+
+if __name__ == "__main__":
+    unittest.main()